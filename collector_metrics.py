@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Collector self-instrumentation.
+
+Counters and latency histograms for each collector stage (probe, modem
+scrape, speed test, DB flush, ...), served as OpenMetrics text on
+http://<host>:METRICS_PORT/metrics.
+
+Stage timings take no locks: every stage is timed from a single thread
+(the probe loop, one job worker at a time, or the writer thread), so each
+histogram has exactly one writer. Plain counters can be bumped from any
+thread (e.g. DB connect failures from the probe loop and job workers) and
+are incremented under a lock. The /metrics handler only ever reads a
+slightly stale but consistent-enough snapshot.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # 0 disables the endpoint
+
+# Seconds; covers sub-ms probe bookkeeping up to multi-minute speed tests
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), list(self.counts)):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    def __init__(self):
+        self.stages = {}     # stage -> Histogram
+        self.failures = {}   # stage -> failure count
+        self.counters = {}   # (name, help) -> count
+        self.gauges = {}     # (name, help) -> callable returning {label value: number}
+        self.counter_fns = {}  # (name, help) -> callable returning {label value: running total}
+        self.counter_lock = threading.Lock()
+        self.started = time.time()
+
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Histogram()
+            self.failures[name] = 0
+        return self.stages[name]
+
+    @contextmanager
+    def timed(self, name):
+        """Time the enclosed block as one run of `name`; exceptions count as failures"""
+        histogram = self.stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.failures[name] += 1
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def fail(self, name):
+        self.stage(name)
+        self.failures[name] += 1
+
+    def inc(self, name, help_text, amount=1):
+        key = (name, help_text)
+        with self.counter_lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, help_text, fn):
+        self.gauges[(name, help_text)] = fn
+
+    def counter(self, name, help_text, fn):
+        """Labelled counter read from `fn`, for totals kept elsewhere"""
+        self.counter_fns[(name, help_text)] = fn
+
+    def render(self):
+        lines = [
+            '# TYPE collector_stage_seconds histogram',
+            '# UNIT collector_stage_seconds seconds',
+            '# HELP collector_stage_seconds Time spent in each collector stage.',
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            for bound, total in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'collector_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {total}')
+            lines.append(f'collector_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'collector_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += ['# TYPE collector_stage_failures counter',
+                  '# HELP collector_stage_failures Collector stage runs that raised.']
+        for stage, count in sorted(self.failures.items()):
+            lines.append(f'collector_stage_failures_total{{stage="{stage}"}} {count}')
+
+        with self.counter_lock:
+            counters = sorted(self.counters.items())
+        for (name, help_text), count in counters:
+            lines += [f'# TYPE {name} counter', f'# HELP {name} {help_text}', f'{name}_total {count}']
+
+        families = [(name, help_text, fn, 'counter') for (name, help_text), fn in self.counter_fns.items()]
+        families += [(name, help_text, fn, 'gauge') for (name, help_text), fn in self.gauges.items()]
+        for name, help_text, fn, kind in sorted(families, key=lambda family: family[0]):
+            lines += [f'# TYPE {name} {kind}', f'# HELP {name} {help_text}']
+            try:
+                values = fn()
+            except Exception:
+                continue
+            sample = f'{name}_total' if kind == 'counter' else name
+            for label, value in values.items():
+                labels = f'{{{label}}}' if label else ''
+                lines.append(f'{sample}{labels} {value}')
+
+        lines += ['# TYPE collector_start_time_seconds gauge',
+                  '# UNIT collector_start_time_seconds seconds',
+                  f'collector_start_time_seconds {self.started:.3f}',
+                  '# EOF']
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would drown the collector log
+
+
+def serve(port=METRICS_PORT):
+    """Serve /metrics from a daemon thread; returns the server or None if disabled"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint disabled, can't bind port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    print(f"Serving collector metrics on :{port}/metrics")
+    return server
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Downsampling of probe series for the dashboard charts.
+
+select() returns the indexes of the rows worth drawing, so the caller only
+formats those. Two modes:
+
+  minmax  the lowest and highest latency in each of points/2 time buckets;
+          with the client's chart width that is one bucket per pixel
+  lttb    Largest-Triangle-Three-Buckets over min/max preselected rows
+          (MinMaxLTTB), one point per bucket that follows the line's shape
+
+In both modes the worst loss or failure row of every bucket and the rows on
+either side of a gap in the data are kept too, so outages stay visible, as
+are any rows the caller marks to keep.
+"""
+import numpy as np
+
+MODES = ('minmax', 'lttb')
+GAP_MS = 15 * 60 * 1000  # Rows on either side of a longer gap are always kept
+LTTB_PRESELECT = 4       # min/max buckets per LTTB bucket when preselecting candidates
+
+
+def time_buckets(t, count):
+    """Bucket (0..count-1) of each timestamp, splitting the span evenly"""
+    span = t[-1] - t[0]
+    if span <= 0:
+        return np.zeros(len(t), dtype=np.int64)
+    return np.minimum(((t - t[0]) * (count / span)).astype(np.int64), count - 1)
+
+
+def bucket_argmax(buckets, values):
+    """Index of the largest value in each non-empty bucket (`buckets` must be
+    ascending, so each bucket is a contiguous run). NaNs count as smallest."""
+    values = np.nan_to_num(values, nan=-np.inf)
+    new_run = np.append(True, buckets[1:] != buckets[:-1])
+    run = np.cumsum(new_run) - 1
+    peaks = np.maximum.reduceat(values, np.flatnonzero(new_run))
+    # First row of each run that equals the run's maximum
+    matches = np.flatnonzero(values == peaks[run])
+    matched_runs = run[matches]
+    return matches[np.append(True, matched_runs[1:] != matched_runs[:-1])]
+
+
+def minmax(t, y, count):
+    buckets = time_buckets(t, count)
+    return np.concatenate([bucket_argmax(buckets, y), bucket_argmax(buckets, -y)])
+
+
+def lttb(t, y, count):
+    """LTTB down to `count` rows, choosing among the min/max rows of
+    count * LTTB_PRESELECT buckets instead of every row"""
+    candidates = np.union1d(minmax(t, y, count * LTTB_PRESELECT), [0, len(t) - 1])
+    inner = len(candidates) - 2
+    if inner <= count - 2:
+        return candidates
+    ct = (t[candidates] - t[0]).tolist()
+    cy = np.nan_to_num(y[candidates]).tolist()  # Failed probes have no latency
+
+    # Equal-count buckets over the candidates between the first and last row
+    starts = (np.arange(count - 2) * inner // (count - 2) + 1).tolist()
+    ends = starts[1:] + [inner + 1]
+    avg_t = [sum(ct[s:e]) / (e - s) for s, e in zip(starts, ends)] + [ct[-1]]
+    avg_y = [sum(cy[s:e]) / (e - s) for s, e in zip(starts, ends)] + [cy[-1]]
+
+    selected = [0]
+    at, ay = ct[0], cy[0]
+    for b, (start, end) in enumerate(zip(starts, ends)):
+        # Largest triangle between the last pick, this row and the next bucket's average
+        nt, ny = avg_t[b + 1], avg_y[b + 1]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((at - nt) * (cy[i] - ay) - (at - ct[i]) * (ny - ay))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        at, ay = ct[best], cy[best]
+    selected.append(inner + 1)
+    return candidates[selected]
+
+
+def select(t, y, severity, points, mode='minmax', keep=None):
+    """Ascending indexes of the rows to draw, about `points` of them.
+
+    t: epoch-ms timestamps (ascending); y: latency (NaN when missing);
+    severity: loss or failure score of each row, > 0 for rows worth keeping;
+    keep: optional boolean mask of rows that are always kept.
+    """
+    n = len(t)
+    if n <= points:
+        return np.arange(n)
+    buckets = max(1, points // 2)
+    picked = lttb(t, y, points) if mode == 'lttb' else minmax(t, y, buckets)
+
+    worst = bucket_argmax(time_buckets(t, buckets), severity)
+    worst = worst[severity[worst] > 0]
+    gaps = np.flatnonzero(np.diff(t) > GAP_MS)
+    kept = np.flatnonzero(keep) if keep is not None else []
+    return np.unique(np.concatenate([picked, worst, gaps, gaps + 1, kept, [0, n - 1]]).astype(np.int64))
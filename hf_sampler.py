@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""High-frequency probe sampling.
+
+Sends one echo request per target every 1/rate seconds from a single ICMP
+socket and records each reply into a fixed-size, array-backed ring buffer
+per target. Every `window` seconds the probes sent in that window are
+reduced to one aggregate (count, loss, min/max/mean, p50/p95/p99, jitter),
+so short loss bursts are visible without writing one row per probe.
+"""
+import math
+import socket
+import time
+from array import array
+from collections import deque
+from datetime import datetime
+
+from icmp_prober import build_echo_request, summarize
+
+
+class RingBuffer:
+    """Fixed-size per-target probe history indexed by probe number"""
+
+    def __init__(self, size):
+        self.size = size
+        self.rtt = array('d', [math.nan] * size)    # ms; NaN = no reply (yet)
+        self.out_of_order = array('b', [0] * size)
+        self.highest_reply = -1
+
+    def sent(self, number):
+        slot = number % self.size
+        self.rtt[slot] = math.nan
+        self.out_of_order[slot] = 0
+
+    def reply(self, number, rtt_ms):
+        slot = number % self.size
+        self.rtt[slot] = rtt_ms
+        if number < self.highest_reply:
+            self.out_of_order[slot] = 1
+        self.highest_reply = max(self.highest_reply, number)
+
+    def window(self, first, end):
+        """(rtts with None for lost, out-of-order count) for probes first..end-1"""
+        rtts = []
+        out_of_order = 0
+        for number in range(first, end):
+            slot = number % self.size
+            value = self.rtt[slot]
+            rtts.append(None if math.isnan(value) else round(value, 3))
+            out_of_order += self.out_of_order[slot]
+        return rtts, out_of_order
+
+
+class HighFrequencySampler:
+    """Drop-in replacement for ProbeScheduler.cycles() that yields one
+    aggregate per target every `window` seconds"""
+
+    def __init__(self, targets, backend, rate_hz=10, window=10, timeout=1.0, tz=None):
+        self.targets = [(name, self._resolve(address)) for name, address in targets]
+        self.backend = backend
+        self.interval = window
+        self.send_interval = 1.0 / rate_hz
+        self.timeout = timeout
+        self.tz = tz
+        size = int(math.ceil(rate_hz * (window + timeout))) * 2
+        self.rings = {name: RingBuffer(size) for name, _ in targets}
+        self.in_flight = {}   # seq -> (name, address, probe number, send time)
+        self.next_seq = 0
+        self.probe_number = 0
+
+    def _resolve(self, address):
+        if not address:
+            return None
+        try:
+            return socket.gethostbyname(address)
+        except OSError:
+            return None
+
+    def _send_tick(self):
+        for name, address in self.targets:
+            if not address:
+                continue
+            seq = self.next_seq
+            self.next_seq = (self.next_seq + 1) & 0xffff
+            self.rings[name].sent(self.probe_number)
+            try:
+                self.backend.send(build_echo_request(self.backend.ident, seq), address)
+            except OSError:
+                continue
+            self.in_flight[seq] = (name, address, self.probe_number, time.monotonic())
+        self.probe_number += 1
+
+    def _receive(self, timeout):
+        received = self.backend.recv(timeout)
+        if received is None:
+            return
+        arrived = time.monotonic()
+        packet, address = received
+        seq = self.backend.match(packet)
+        entry = self.in_flight.pop(seq, None)
+        if entry is None:
+            return
+        name, sent_to, number, sent_at = entry
+        if sent_to != address or arrived - sent_at > self.timeout:
+            return
+        self.rings[name].reply(number, (arrived - sent_at) * 1000)
+
+    def _expire(self, now):
+        for seq in [s for s, entry in self.in_flight.items() if now - entry[3] > self.timeout]:
+            del self.in_flight[seq]
+
+    def _aggregate(self, first, end):
+        results = {}
+        for name, _ in self.targets:
+            rtts, out_of_order = self.rings[name].window(first, end)
+            stats = summarize(rtts, out_of_order)
+            # Only the aggregate is stored, not every probe's RTT
+            stats['rtts'] = None
+            results[name] = stats
+        return results
+
+    def cycles(self):
+        start = time.monotonic()
+        next_send = start
+        window_end = start + self.interval
+        window_first = 0
+        window_started = datetime.now(self.tz)
+        closing = deque()  # (due time, first probe, end probe, window start timestamp)
+
+        while True:
+            now = time.monotonic()
+            if now >= window_end:
+                # Wait `timeout` for the window's last replies before aggregating
+                closing.append((window_end + self.timeout, window_first, self.probe_number, window_started))
+                window_first = self.probe_number
+                window_started = datetime.now(self.tz)
+                window_end += self.interval
+            if now >= next_send:
+                self._send_tick()
+                next_send += self.send_interval
+                if next_send < now:
+                    # Fell behind - skip missed ticks rather than bursting
+                    next_send = now + self.send_interval
+            if closing and now >= closing[0][0]:
+                _, first, end, timestamp_dt = closing.popleft()
+                self._expire(now)
+                yield timestamp_dt, self._aggregate(first, end)
+                continue
+
+            wake = min(next_send, window_end, closing[0][0] if closing else window_end)
+            self._receive(max(0, wake - time.monotonic()))
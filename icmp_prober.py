@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""In-process ICMP echo prober.
+
+Probes any number of targets from a single ICMP socket. Echo requests carry a
+sequence number that is unique per socket, so replies are demultiplexed back
+to their target by sequence instead of needing one socket (or one forked
+`ping`) per target.
+"""
+import heapq
+import os
+import random
+import select
+import socket
+import struct
+import time
+
+import latency_sketch
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+PAYLOAD_SIZE = 56  # Same as ping's default
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_echo_request(ident, seq):
+    payload = struct.pack('!d', time.time()).ljust(PAYLOAD_SIZE, b'\x00')
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, ident, seq) + payload
+
+
+def parse_echo_reply(packet, has_ip_header):
+    """Return (ident, seq) for an echo reply, None for any other packet"""
+    if has_ip_header:
+        packet = packet[(packet[0] & 0x0f) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+class SocketBackend:
+    """Real ICMP socket.
+
+    Prefers an unprivileged datagram socket (net.ipv4.ping_group_range) and
+    falls back to a raw socket, which needs root or CAP_NET_RAW. On datagram
+    sockets the kernel owns the echo identifier and strips the IP header.
+    """
+
+    def __init__(self):
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.raw = False
+        except PermissionError:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self.raw = True
+        self.sock.setblocking(False)
+        self.ident = os.getpid() & 0xffff
+
+    def send(self, packet, address):
+        self.sock.sendto(packet, (address, 0))
+
+    def recv(self, timeout):
+        """Return (packet, address) or None if nothing arrived within timeout"""
+        ready, _, _ = select.select([self.sock], [], [], max(0, timeout))
+        if not ready:
+            return None
+        packet, (address, _) = self.sock.recvfrom(2048)
+        return packet, address
+
+    def match(self, packet):
+        reply = parse_echo_reply(packet, self.raw)
+        if reply is None:
+            return None
+        ident, seq = reply
+        # Raw sockets see every echo reply on the host, not just ours
+        if self.raw and ident != self.ident:
+            return None
+        return seq
+
+    def close(self):
+        self.sock.close()
+
+
+class FakeBackend:
+    """Socket stand-in for tests and hosts without ICMP access.
+
+    Answers every echo request itself after `rtt_ms` (plus up to `jitter_ms`
+    of random delay) and drops a `loss` fraction of requests. Per-target
+    overrides can be given as {address: (rtt_ms, jitter_ms, loss)}.
+    """
+
+    def __init__(self, rtt_ms=1.0, jitter_ms=0.0, loss=0.0, targets=None, seed=None):
+        self.default = (rtt_ms, jitter_ms, loss)
+        self.targets = targets or {}
+        self.random = random.Random(seed)
+        self.pending = []
+        self.ident = os.getpid() & 0xffff
+
+    def send(self, packet, address):
+        rtt_ms, jitter_ms, loss = self.targets.get(address, self.default)
+        if self.random.random() < loss:
+            return
+        delay = (rtt_ms + self.random.uniform(0, jitter_ms)) / 1000
+        reply = bytes([ICMP_ECHO_REPLY]) + packet[1:]
+        heapq.heappush(self.pending, (time.monotonic() + delay, reply, address))
+
+    def recv(self, timeout):
+        deadline = time.monotonic() + max(0, timeout)
+        if not self.pending or self.pending[0][0] > deadline:
+            time.sleep(max(0, deadline - time.monotonic()))
+            return None
+        time.sleep(max(0, self.pending[0][0] - time.monotonic()))
+        _, packet, address = heapq.heappop(self.pending)
+        return packet, address
+
+    def match(self, packet):
+        reply = parse_echo_reply(packet, False)
+        return reply[1] if reply else None
+
+    def close(self):
+        self.pending = []
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0-100) of an already sorted list"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def summarize(rtts, out_of_order=0):
+    """Reduce per-packet RTTs (None = lost) to the stats we store"""
+    received = [r for r in rtts if r is not None]
+    sent = len(rtts)
+    stats = {
+        'rtts': rtts,
+        'sent': sent,
+        'received': len(received),
+        'packet_loss': round(100.0 * (sent - len(received)) / sent, 1) if sent else 100.0,
+        'avg': None,
+        'min': None,
+        'max': None,
+        'jitter': None,
+        'out_of_order': out_of_order,
+        'p50': None,
+        'p95': None,
+        'p99': None,
+    }
+    # Mergeable histogram of the replies; it is all the high-frequency sampler keeps of them
+    stats['sketch_keys'], stats['sketch_counts'] = latency_sketch.sketch(received)
+    if received:
+        ordered = sorted(received)
+        stats['avg'] = round(sum(received) / len(received), 3)
+        stats['min'] = round(ordered[0], 3)
+        stats['max'] = round(ordered[-1], 3)
+        for q in (50, 95, 99):
+            stats[f'p{q}'] = round(percentile(ordered, q), 3)
+        # Mean absolute difference between consecutive replies. Not RFC 3550's
+        # smoothed estimator (J += (|D| - J) / 16), which needs far more samples than a cycle has
+        if len(received) > 1:
+            diffs = [abs(b - a) for a, b in zip(received, received[1:])]
+            stats['jitter'] = round(sum(diffs) / len(diffs), 3)
+        else:
+            stats['jitter'] = 0.0
+    return stats
+
+
+class IcmpProber:
+    """Send `count` echo requests to every target, `interval` seconds apart,
+    and wait up to `timeout` seconds after the last send for replies.
+    """
+
+    def __init__(self, backend=None, count=5, interval=1.0, timeout=2.0):
+        self.backend = backend or SocketBackend()
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.next_seq = random.randrange(0x10000)
+
+    def _resolve(self, address):
+        if not address:
+            return None
+        try:
+            return socket.gethostbyname(address)
+        except OSError:
+            return None
+
+    def probe(self, targets):
+        """Probe [(name, address), ...] and return {name: stats}"""
+        resolved = [(name, self._resolve(address)) for name, address in targets]
+        rtts = {name: [None] * self.count for name, _ in resolved}
+        highest = {name: -1 for name, _ in resolved}
+        out_of_order = {name: 0 for name, _ in resolved}
+        in_flight = {}  # seq -> (name, address, packet index, send time)
+
+        start = time.monotonic()
+        deadline = start + (self.count - 1) * self.interval + self.timeout
+        sent = 0
+        while True:
+            now = time.monotonic()
+            if sent < self.count and now >= start + sent * self.interval:
+                for name, address in resolved:
+                    if address is None:
+                        continue
+                    seq = self.next_seq
+                    self.next_seq = (self.next_seq + 1) & 0xffff
+                    try:
+                        self.backend.send(build_echo_request(self.backend.ident, seq), address)
+                    except OSError:
+                        continue
+                    in_flight[seq] = (name, address, sent, time.monotonic())
+                sent += 1
+                continue
+            if now >= deadline or (sent == self.count and not in_flight):
+                break
+
+            wake = deadline if sent == self.count else min(deadline, start + sent * self.interval)
+            received = self.backend.recv(wake - now)
+            if received is None:
+                continue
+            arrived = time.monotonic()
+            packet, address = received
+            seq = self.backend.match(packet)
+            if seq not in in_flight or in_flight[seq][1] != address:
+                continue
+            name, _, index, sent_at = in_flight.pop(seq)
+            rtts[name][index] = round((arrived - sent_at) * 1000, 3)
+            if index < highest[name]:
+                out_of_order[name] += 1
+            highest[name] = max(highest[name], index)
+
+        return {name: summarize(rtts[name], out_of_order[name]) for name, _ in resolved}
+
+    def close(self):
+        self.backend.close()
+
+
+def make_backend(kind='socket'):
+    """Build a backend: 'socket' for real ICMP, 'fake' for the simulated one"""
+    if kind == 'fake':
+        return FakeBackend(rtt_ms=float(os.getenv('FAKE_RTT_MS', 15)),
+                           jitter_ms=float(os.getenv('FAKE_JITTER_MS', 2)),
+                           loss=float(os.getenv('FAKE_LOSS', 0)))
+    return SocketBackend()
+
+
+if __name__ == "__main__":
+    import sys
+
+    prober = IcmpProber(make_backend(os.getenv('PROBE_BACKEND', 'socket')))
+    targets = [(t, t) for t in (sys.argv[1:] or ['8.8.8.8'])]
+    for name, stats in prober.probe(targets).items():
+        print(f"{name}: avg={stats['avg']}ms min={stats['min']} max={stats['max']} "
+              f"jitter={stats['jitter']} loss={stats['packet_loss']}% ooo={stats['out_of_order']}")
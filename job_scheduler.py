@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Bounded background-job scheduler for the collector's slow jobs.
+
+Speed tests, modem scrapes and weather updates run on a small worker pool
+so they never stall the probe loop. A job that is still queued or running
+is not submitted again, so a slow modem or speedtest run can't pile up
+overlapping copies of itself.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobScheduler:
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.active = set()   # Names of jobs queued or running
+        self.queued = 0       # Submitted but not yet started
+        self.jobs = {}        # name -> stats
+
+    def submit(self, name, fn, *args):
+        """Queue fn(*args) under `name`; returns False if that job is already
+        queued or running"""
+        with self.lock:
+            if name in self.active:
+                self.jobs[name]['skipped'] += 1
+                return False
+            self.active.add(name)
+            self.queued += 1
+            self.jobs.setdefault(name, {'runs': 0, 'failures': 0, 'skipped': 0, 'running': False,
+                                        'last_duration': None, 'total_duration': 0.0})
+        self.executor.submit(self._run, name, fn, args)
+        return True
+
+    def _run(self, name, fn, args):
+        with self.lock:
+            self.queued -= 1
+            self.jobs[name]['running'] = True
+        start = time.monotonic()
+        failed = False
+        try:
+            fn(*args)
+        except Exception as e:
+            failed = True
+            print(f"Job {name} failed: {e}")
+        finally:
+            duration = time.monotonic() - start
+            with self.lock:
+                stats = self.jobs[name]
+                stats['running'] = False
+                stats['runs'] += 1
+                stats['failures'] += failed
+                stats['last_duration'] = duration
+                stats['total_duration'] += duration
+                self.active.discard(name)
+
+    def queue_depth(self):
+        with self.lock:
+            return self.queued
+
+    def stats(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.jobs.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Mergeable latency sketches (DDSketch-style log histograms).
+
+An RTT of x ms is counted under key ceil(log_gamma(x)), with
+gamma = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA), so any quantile read back
+is within SKETCH_ALPHA of the true value, relative to it. A sketch is stored
+as two int arrays: the keys in use, ascending, and their counts. Merging
+sketches is adding counts per key, which SQL does with unnest() and GROUP BY.
+
+SKETCH_ALPHA is part of the stored format. Keys built with another alpha do
+not mix, so changing it means rebuilding every sketch.
+"""
+import math
+
+SKETCH_ALPHA = 0.01
+GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+LOG_GAMMA = math.log(GAMMA)
+
+
+def key(rtt):
+    return math.ceil(math.log(rtt) / LOG_GAMMA)
+
+
+def value(key):
+    """Latency reported for a key; within SKETCH_ALPHA of everything counted under it"""
+    return 2 * GAMMA ** key / (GAMMA + 1)
+
+
+def sketch(rtts):
+    """(keys, counts) of the replies in `rtts` (None = lost), or (None, None)
+    when there were none"""
+    counts = {}
+    for rtt in rtts:
+        if rtt is not None and rtt > 0:
+            k = key(rtt)
+            counts[k] = counts.get(k, 0) + 1
+    if not counts:
+        return None, None
+    keys = sorted(counts)
+    return keys, [counts[k] for k in keys]
+
+
+def quantile(keys, counts, q):
+    """Latency at quantile q (0..1) of a sketch, or None if it is empty"""
+    rank = q * (sum(counts) - 1)
+    seen = 0
+    for k, count in zip(keys, counts):
+        seen += count
+        if seen > rank:
+            return value(k)
+    return None
+
+
+def cdf(keys, counts):
+    """[(latency, fraction of samples at or below it)], one point per key.
+    The latency is the key's upper bound."""
+    total = sum(counts)
+    points = []
+    seen = 0
+    for k, count in zip(keys, counts):
+        seen += count
+        points.append((GAMMA ** k, seen / total))
+    return points
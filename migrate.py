@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Apply pending SQL migrations from migrations/ in filename order.
+
+    python migrate.py                apply pending migrations
+    python migrate.py status         list applied and pending migrations
+    python migrate.py partition      convert the measurement tables to time-range partitions
+    python migrate.py maintain       create upcoming partitions and apply RETENTION_DAYS
+    python migrate.py pack-channels  move channel_codewords rows into channel_scrapes
+    python migrate.py sketches       build latency sketches for probe cycles stored before migration 013
+"""
+import psycopg2
+from psycopg2.extras import execute_values
+from datetime import timedelta
+from pathlib import Path
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import latency_sketch
+import partitions
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 5432)),
+    'database': os.getenv('DB_NAME', 'network_monitor'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+NODE_ID = os.getenv('NODE_ID', 'local')  # Same default as the collector; existing rows are filed under it
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+PACK_CHUNK = timedelta(days=1)  # channel_codewords time range moved per transaction
+SKETCH_BATCH = 5000             # probe_cycles rows sketched per transaction
+
+# Moves every channel row before the cutoff into one channel_scrapes row per scrape
+PACK_CHANNELS_SQL = """
+    WITH moved AS (
+        DELETE FROM public.channel_codewords WHERE "timestamp" < %s RETURNING *
+    )
+    INSERT INTO public.channel_scrapes ("timestamp", node_id, channel_ids, correctable, uncorrectable,
+                                        correctable_delta, uncorrectable_delta, interval_seconds)
+    SELECT "timestamp", node_id, array_agg(channel_id ORDER BY channel_id),
+           array_agg(correctable ORDER BY channel_id), array_agg(uncorrectable ORDER BY channel_id),
+           array_agg(correctable_delta ORDER BY channel_id), array_agg(uncorrectable_delta ORDER BY channel_id),
+           MAX(interval_seconds)
+    FROM moved
+    GROUP BY "timestamp", node_id
+    ORDER BY "timestamp"
+"""
+
+def get_db():
+    return psycopg2.connect(**DB_CONFIG)
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+def migrate():
+    conn = get_db()
+    cur = conn.cursor()
+    done = applied_versions(cur)
+    conn.commit()
+
+    pending = [p for p in sorted(MIGRATIONS_DIR.glob('*.sql')) if p.stem not in done]
+    if not pending:
+        print("Schema is up to date")
+    # Migrations that tag existing rows with a node read it from here
+    cur.execute("SELECT set_config('network_monitor.node_id', %s, false)", (NODE_ID,))
+    for path in pending:
+        print(f"Applying {path.name}...")
+        # Each migration runs in its own transaction
+        cur.execute(path.read_text())
+        cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (path.stem,))
+        conn.commit()
+    conn.close()
+
+def status():
+    conn = get_db()
+    cur = conn.cursor()
+    done = applied_versions(cur)
+    conn.commit()
+    conn.close()
+    for path in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        print(f"{'applied' if path.stem in done else 'pending'}  {path.name}")
+
+def partition():
+    conn = get_db()
+    for table in partitions.PARTITIONED_TABLES:
+        partitions.convert(conn, table)
+    partitions.maintain(conn)
+    conn.close()
+
+def maintain():
+    conn = get_db()
+    partitions.maintain(conn)
+    conn.close()
+
+def pack_channels():
+    """Move channel_codewords into channel_scrapes a day at a time, then drop
+    it. Each day commits on its own, so the tool can be stopped and rerun."""
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('public.channel_codewords')")
+    if cur.fetchone()[0] is None:
+        print("channel_codewords is already packed")
+        conn.close()
+        return
+    moved = 0
+    while True:
+        cur.execute('SELECT MIN("timestamp") FROM public.channel_codewords')
+        oldest = cur.fetchone()[0]
+        if oldest is None:
+            break
+        cur.execute(PACK_CHANNELS_SQL, (oldest + PACK_CHUNK,))
+        moved += cur.rowcount
+        conn.commit()
+        print(f"Packed channel rows before {oldest + PACK_CHUNK} ({moved} scrapes so far)")
+    cur.execute("DROP TABLE public.channel_codewords")
+    conn.commit()
+    conn.close()
+    print(f"Packed {moved} scrapes into channel_scrapes and dropped channel_codewords")
+
+def build_sketches():
+    """Sketch the stored RTTs of probe cycles that have none, a batch at a
+    time, and mark their hours for the rollup worker to merge. Each batch
+    commits on its own, so the tool can be stopped and rerun."""
+    conn = get_db()
+    cur = conn.cursor()
+    last_id = 0
+    built = 0
+    while True:
+        cur.execute("""
+            SELECT id, "timestamp", node_id, ping_rtts, cmts_rtts FROM public.probe_cycles
+            WHERE id > %s AND ping_sketch_keys IS NULL AND cmts_sketch_keys IS NULL
+              AND (ping_rtts IS NOT NULL OR cmts_rtts IS NOT NULL)
+            ORDER BY id LIMIT %s
+        """, (last_id, SKETCH_BATCH))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [(row_id, timestamp, *latency_sketch.sketch(ping_rtts or []), *latency_sketch.sketch(cmts_rtts or []))
+                  for row_id, timestamp, _, ping_rtts, cmts_rtts in rows]
+        execute_values(cur, """
+            UPDATE public.probe_cycles p SET ping_sketch_keys = v.ping_keys, ping_sketch_counts = v.ping_counts,
+                                             cmts_sketch_keys = v.cmts_keys, cmts_sketch_counts = v.cmts_counts
+            FROM (VALUES %s) AS v(id, ts, ping_keys, ping_counts, cmts_keys, cmts_counts)
+            WHERE p.id = v.id AND p."timestamp" = v.ts
+        """, values, template='(%s, %s, %s::integer[], %s::integer[], %s::integer[], %s::integer[])')
+        hours = {(node_id, timestamp.replace(minute=0, second=0, microsecond=0)) for _, timestamp, node_id, _, _ in rows}
+        execute_values(cur, "INSERT INTO public.rollup_dirty (source, node_id, hour) VALUES %s ON CONFLICT DO NOTHING",
+                       [('probe_cycles', node_id, hour) for node_id, hour in sorted(hours)])
+        conn.commit()
+        built += sum(1 for row in values if row[2] or row[4])
+        print(f"Sketched {built} probe cycles so far")
+    conn.close()
+    print(f"Built latency sketches for {built} probe cycles; the rollup worker merges them into the rollups")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "status":
+        status()
+    elif command == "partition":
+        partition()
+    elif command == "maintain":
+        maintain()
+    elif command == "pack-channels":
+        pack_channels()
+    elif command == "sketches":
+        build_sketches()
+    else:
+        migrate()
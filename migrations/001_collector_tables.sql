@@ -0,0 +1,20 @@
+-- Tables and columns the collector writes that predate the migrations
+-- directory and are missing from schema.sql.
+
+ALTER TABLE public.modem_signals ADD COLUMN IF NOT EXISTS uptime_seconds integer;
+
+CREATE TABLE IF NOT EXISTS public.modem_restarts (
+    id serial PRIMARY KEY,
+    "timestamp" timestamp without time zone NOT NULL,
+    detected_at timestamp without time zone NOT NULL,
+    uptime_seconds integer
+);
+
+CREATE INDEX IF NOT EXISTS idx_restarts_timestamp ON public.modem_restarts USING btree ("timestamp");
+
+CREATE TABLE IF NOT EXISTS public.weather_data (
+    "timestamp" timestamp PRIMARY KEY,
+    temperature real,
+    precipitation real,
+    weather_code integer
+);
@@ -0,0 +1,15 @@
+-- Per-packet RTTs and jitter from the in-process ICMP prober
+
+ALTER TABLE public.ping_tests
+    ADD COLUMN IF NOT EXISTS min_ping double precision,
+    ADD COLUMN IF NOT EXISTS max_ping double precision,
+    ADD COLUMN IF NOT EXISTS jitter double precision,
+    ADD COLUMN IF NOT EXISTS out_of_order smallint,
+    ADD COLUMN IF NOT EXISTS rtts double precision[];
+
+ALTER TABLE public.cmts_tests
+    ADD COLUMN IF NOT EXISTS min_ping double precision,
+    ADD COLUMN IF NOT EXISTS max_ping double precision,
+    ADD COLUMN IF NOT EXISTS jitter double precision,
+    ADD COLUMN IF NOT EXISTS out_of_order smallint,
+    ADD COLUMN IF NOT EXISTS rtts double precision[];
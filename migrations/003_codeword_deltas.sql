@@ -0,0 +1,64 @@
+-- Per-interval codeword deltas and rates (errors/sec), computed at ingest.
+-- Existing rows are backfilled from consecutive readings; a counter that
+-- went backwards is treated as a modem restart (counted from zero).
+
+ALTER TABLE public.modem_signals
+    ADD COLUMN IF NOT EXISTS correctable_delta bigint,
+    ADD COLUMN IF NOT EXISTS uncorrectable_delta bigint,
+    ADD COLUMN IF NOT EXISTS correctable_rate double precision,
+    ADD COLUMN IF NOT EXISTS uncorrectable_rate double precision,
+    ADD COLUMN IF NOT EXISTS interval_seconds real;
+
+ALTER TABLE public.channel_codewords
+    ADD COLUMN IF NOT EXISTS correctable_delta bigint,
+    ADD COLUMN IF NOT EXISTS uncorrectable_delta bigint,
+    ADD COLUMN IF NOT EXISTS correctable_rate double precision,
+    ADD COLUMN IF NOT EXISTS uncorrectable_rate double precision,
+    ADD COLUMN IF NOT EXISTS interval_seconds real;
+
+WITH prev AS (
+    SELECT id, correctable_codewords AS corr, uncorrectable_codewords AS uncorr,
+           LAG(correctable_codewords) OVER w AS prev_corr,
+           LAG(uncorrectable_codewords) OVER w AS prev_uncorr,
+           EXTRACT(EPOCH FROM timestamp - LAG(timestamp) OVER w) AS secs
+    FROM public.modem_signals
+    WHERE correctable_codewords IS NOT NULL
+    WINDOW w AS (ORDER BY timestamp)
+), deltas AS (
+    SELECT id, secs,
+           CASE WHEN corr < prev_corr THEN corr ELSE corr - prev_corr END AS corr_delta,
+           CASE WHEN uncorr < prev_uncorr THEN uncorr ELSE uncorr - prev_uncorr END AS uncorr_delta
+    FROM prev
+    WHERE prev_corr IS NOT NULL AND secs > 0
+)
+UPDATE public.modem_signals m
+SET correctable_delta = d.corr_delta,
+    uncorrectable_delta = d.uncorr_delta,
+    correctable_rate = d.corr_delta / d.secs,
+    uncorrectable_rate = d.uncorr_delta / d.secs,
+    interval_seconds = d.secs
+FROM deltas d
+WHERE m.id = d.id AND m.correctable_delta IS NULL;
+
+WITH prev AS (
+    SELECT id, correctable AS corr, uncorrectable AS uncorr,
+           LAG(correctable) OVER w AS prev_corr,
+           LAG(uncorrectable) OVER w AS prev_uncorr,
+           EXTRACT(EPOCH FROM timestamp - LAG(timestamp) OVER w) AS secs
+    FROM public.channel_codewords
+    WINDOW w AS (PARTITION BY channel_id ORDER BY timestamp)
+), deltas AS (
+    SELECT id, secs,
+           CASE WHEN corr < prev_corr THEN corr ELSE corr - prev_corr END AS corr_delta,
+           CASE WHEN uncorr < prev_uncorr THEN uncorr ELSE uncorr - prev_uncorr END AS uncorr_delta
+    FROM prev
+    WHERE prev_corr IS NOT NULL AND secs > 0
+)
+UPDATE public.channel_codewords c
+SET correctable_delta = d.corr_delta,
+    uncorrectable_delta = d.uncorr_delta,
+    correctable_rate = d.corr_delta / d.secs,
+    uncorrectable_rate = d.uncorr_delta / d.secs,
+    interval_seconds = d.secs
+FROM deltas d
+WHERE c.id = d.id AND c.correctable_delta IS NULL;
@@ -0,0 +1,14 @@
+-- Per-row sample count and latency percentiles. In high-frequency mode a
+-- row aggregates every probe sent in its window.
+
+ALTER TABLE public.ping_tests
+    ADD COLUMN IF NOT EXISTS sample_count smallint,
+    ADD COLUMN IF NOT EXISTS p50 double precision,
+    ADD COLUMN IF NOT EXISTS p95 double precision,
+    ADD COLUMN IF NOT EXISTS p99 double precision;
+
+ALTER TABLE public.cmts_tests
+    ADD COLUMN IF NOT EXISTS sample_count smallint,
+    ADD COLUMN IF NOT EXISTS p50 double precision,
+    ADD COLUMN IF NOT EXISTS p95 double precision,
+    ADD COLUMN IF NOT EXISTS p99 double precision;
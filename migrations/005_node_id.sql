@@ -0,0 +1,34 @@
+-- Tag every measurement with the collector that took it so several sites
+-- can share one database. Rows recorded before this migration belong to the
+-- original single collector: they get its NODE_ID, which migrate.py passes
+-- in as network_monitor.node_id ('local' when unset, like the collector), so
+-- the collector keeps writing under the node its history is filed under.
+-- weather_data is keyed by hour, not node, and is left as-is.
+
+DO $$
+DECLARE
+    node text := COALESCE(NULLIF(current_setting('network_monitor.node_id', true), ''), 'local');
+    tbl text;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['ping_tests', 'cmts_tests', 'speed_tests', 'modem_signals', 'channel_codewords', 'modem_restarts'] LOOP
+        -- A constant default fills existing rows without rewriting the table
+        EXECUTE format('ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS node_id text NOT NULL DEFAULT %L', tbl, node);
+    END LOOP;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_ping_node_timestamp ON public.ping_tests USING btree (node_id, "timestamp");
+CREATE INDEX IF NOT EXISTS idx_cmts_node_timestamp ON public.cmts_tests USING btree (node_id, "timestamp");
+CREATE INDEX IF NOT EXISTS idx_speed_node_timestamp ON public.speed_tests USING btree (node_id, "timestamp");
+CREATE INDEX IF NOT EXISTS idx_modem_node_timestamp ON public.modem_signals USING btree (node_id, "timestamp");
+CREATE INDEX IF NOT EXISTS idx_channel_node_timestamp ON public.channel_codewords USING btree (node_id, "timestamp");
+CREATE INDEX IF NOT EXISTS idx_restarts_node_timestamp ON public.modem_restarts USING btree (node_id, "timestamp");
+
+-- Batches accepted by POST /api/network/ingest. A retried batch_id is
+-- acknowledged without inserting its rows a second time.
+CREATE TABLE IF NOT EXISTS public.ingest_batches (
+    batch_id text PRIMARY KEY,
+    node_id text NOT NULL,
+    received_at timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+    row_count integer NOT NULL
+);
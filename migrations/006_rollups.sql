@@ -0,0 +1,105 @@
+-- Pre-aggregated 1-minute, 15-minute and 1-hour buckets of the measurement
+-- tables, maintained by rollup_worker.py.
+--
+-- Inserts into a source table record the (node, hour) they touched in
+-- rollup_dirty from a statement-level trigger, inside the inserting
+-- transaction. The worker recomputes only those hours, so late rows (spool
+-- replays, remote ingest) are picked up no matter how old their timestamps.
+
+CREATE TABLE IF NOT EXISTS public.rollup_dirty (
+    source text NOT NULL,
+    node_id text NOT NULL,
+    hour timestamp without time zone NOT NULL,
+    PRIMARY KEY (source, node_id, hour)
+);
+
+CREATE OR REPLACE FUNCTION public.mark_rollup_dirty() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO public.rollup_dirty (source, node_id, hour)
+    SELECT DISTINCT TG_TABLE_NAME, node_id, date_trunc('hour', "timestamp") FROM new_rows
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$;
+
+DO $$
+DECLARE
+    source text;
+BEGIN
+    FOREACH source IN ARRAY ARRAY['ping_tests', 'cmts_tests', 'modem_signals', 'channel_codewords'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON public.%I', source || '_rollup_dirty', source);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON public.%I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION public.mark_rollup_dirty()', source || '_rollup_dirty', source);
+    END LOOP;
+END
+$$;
+
+DO $$
+DECLARE
+    resolution text;
+BEGIN
+    FOREACH resolution IN ARRAY ARRAY['1m', '15m', '1h'] LOOP
+        -- One row per node, target and bucket. Status columns count cycles per classify_status().
+        EXECUTE format($f$
+            CREATE TABLE IF NOT EXISTS public.%I (
+                node_id text NOT NULL,
+                target text NOT NULL,
+                bucket timestamp without time zone NOT NULL,
+                samples integer NOT NULL,
+                ping_count integer NOT NULL,
+                ping_sum double precision,
+                ping_min double precision,
+                ping_max double precision,
+                loss_sum double precision,
+                loss_max double precision,
+                lossy integer NOT NULL,
+                failed integer NOT NULL,
+                high_latency integer NOT NULL,
+                packet_loss integer NOT NULL,
+                PRIMARY KEY (node_id, target, bucket)
+            )$f$, 'probe_rollup_' || resolution);
+
+        EXECUTE format($f$
+            CREATE TABLE IF NOT EXISTS public.%I (
+                node_id text NOT NULL,
+                bucket timestamp without time zone NOT NULL,
+                samples integer NOT NULL,
+                downstream_avg_snr double precision,
+                downstream_min_snr double precision,
+                downstream_avg_power double precision,
+                downstream_max_power double precision,
+                upstream_avg_power double precision,
+                correctable_codewords numeric,
+                uncorrectable_codewords numeric,
+                correctable_delta numeric,
+                uncorrectable_delta numeric,
+                PRIMARY KEY (node_id, bucket)
+            )$f$, 'modem_rollup_' || resolution);
+
+        EXECUTE format($f$
+            CREATE TABLE IF NOT EXISTS public.%I (
+                node_id text NOT NULL,
+                bucket timestamp without time zone NOT NULL,
+                channel_id integer NOT NULL,
+                correctable numeric,
+                uncorrectable numeric,
+                correctable_delta numeric,
+                uncorrectable_delta numeric,
+                PRIMARY KEY (node_id, bucket, channel_id)
+            )$f$, 'channel_rollup_' || resolution);
+
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON public.%I (bucket)', 'idx_probe_rollup_' || resolution || '_bucket', 'probe_rollup_' || resolution);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON public.%I (bucket)', 'idx_modem_rollup_' || resolution || '_bucket', 'modem_rollup_' || resolution);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON public.%I (bucket)', 'idx_channel_rollup_' || resolution || '_bucket', 'channel_rollup_' || resolution);
+    END LOOP;
+END
+$$;
+
+-- Existing history: every hour that has data is dirty, the worker works through it
+INSERT INTO public.rollup_dirty (source, node_id, hour)
+SELECT DISTINCT 'ping_tests', node_id, date_trunc('hour', "timestamp") FROM public.ping_tests
+UNION SELECT DISTINCT 'cmts_tests', node_id, date_trunc('hour', "timestamp") FROM public.cmts_tests
+UNION SELECT DISTINCT 'modem_signals', node_id, date_trunc('hour', "timestamp") FROM public.modem_signals
+UNION SELECT DISTINCT 'channel_codewords', node_id, date_trunc('hour', "timestamp") FROM public.channel_codewords
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,66 @@
+-- One row per probe cycle with a column group per target, replacing the
+-- separate ping_tests / cmts_tests rows that had to be joined on timestamp.
+-- A new target is added as another column group:
+--   ALTER TABLE probe_cycles ADD COLUMN <name>_rtt double precision, ...
+-- ping_tests and cmts_tests are kept as history but no longer written.
+
+CREATE TABLE IF NOT EXISTS public.probe_cycles (
+    id bigserial NOT NULL,
+    "timestamp" timestamp without time zone NOT NULL,
+    node_id text NOT NULL DEFAULT 'local',
+
+    ping_rtt double precision,
+    ping_loss double precision,
+    ping_status character varying(20),
+    ping_min double precision,
+    ping_max double precision,
+    ping_jitter double precision,
+    ping_out_of_order smallint,
+    ping_rtts double precision[],
+    ping_samples smallint,
+    ping_p50 double precision,
+    ping_p95 double precision,
+    ping_p99 double precision,
+
+    cmts_rtt double precision,
+    cmts_loss double precision,
+    cmts_status character varying(20),
+    cmts_min double precision,
+    cmts_max double precision,
+    cmts_jitter double precision,
+    cmts_out_of_order smallint,
+    cmts_rtts double precision[],
+    cmts_samples smallint,
+    cmts_p50 double precision,
+    cmts_p95 double precision,
+    cmts_p99 double precision,
+
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_probe_cycles_timestamp ON public.probe_cycles USING btree ("timestamp");
+CREATE INDEX IF NOT EXISTS idx_probe_cycles_node_timestamp ON public.probe_cycles USING btree (node_id, "timestamp");
+
+-- Backfill: pair each ping row with the CMTS row of the same cycle
+INSERT INTO public.probe_cycles (
+    "timestamp", node_id,
+    ping_rtt, ping_loss, ping_status, ping_min, ping_max, ping_jitter, ping_out_of_order, ping_rtts, ping_samples, ping_p50, ping_p95, ping_p99,
+    cmts_rtt, cmts_loss, cmts_status, cmts_min, cmts_max, cmts_jitter, cmts_out_of_order, cmts_rtts, cmts_samples, cmts_p50, cmts_p95, cmts_p99
+)
+SELECT COALESCE(p."timestamp", c."timestamp"), COALESCE(p.node_id, c.node_id),
+       p.ping, p.packet_loss, p.status, p.min_ping, p.max_ping, p.jitter, p.out_of_order, p.rtts, p.sample_count, p.p50, p.p95, p.p99,
+       c.ping, c.packet_loss, c.status, c.min_ping, c.max_ping, c.jitter, c.out_of_order, c.rtts, c.sample_count, c.p50, c.p95, c.p99
+FROM public.ping_tests p
+FULL JOIN public.cmts_tests c ON p."timestamp" = c."timestamp" AND p.node_id = c.node_id
+ORDER BY 1;
+
+-- Rollups now come from probe_cycles; pending work on the old tables moves over
+DROP TRIGGER IF EXISTS ping_tests_rollup_dirty ON public.ping_tests;
+DROP TRIGGER IF EXISTS cmts_tests_rollup_dirty ON public.cmts_tests;
+INSERT INTO public.rollup_dirty (source, node_id, hour)
+SELECT 'probe_cycles', node_id, hour FROM public.rollup_dirty WHERE source IN ('ping_tests', 'cmts_tests')
+ON CONFLICT DO NOTHING;
+DELETE FROM public.rollup_dirty WHERE source IN ('ping_tests', 'cmts_tests');
+
+CREATE TRIGGER probe_cycles_rollup_dirty AFTER INSERT ON public.probe_cycles REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mark_rollup_dirty();
@@ -0,0 +1,67 @@
+-- Smaller rows for the largest tables:
+--   * codeword counters become bigint instead of numeric
+--   * probe status becomes a 4-byte enum instead of a repeated varchar(20)
+--   * per-channel codewords are stored one row per scrape, as parallel arrays
+--     ordered by channel, in channel_scrapes (instead of one row per channel)
+-- Existing channel_codewords rows are moved into channel_scrapes by
+-- `python migrate.py pack-channels`, which drops the old table when done.
+
+DO $$
+BEGIN
+    CREATE TYPE public.probe_status AS ENUM ('OK', 'PACKET_LOSS', 'HIGH_LATENCY', 'FAILED');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END
+$$;
+
+ALTER TABLE public.probe_cycles
+    ALTER COLUMN ping_status TYPE public.probe_status USING ping_status::public.probe_status,
+    ALTER COLUMN cmts_status TYPE public.probe_status USING cmts_status::public.probe_status;
+ALTER TABLE public.ping_tests ALTER COLUMN status TYPE public.probe_status USING status::public.probe_status;
+ALTER TABLE public.cmts_tests ALTER COLUMN status TYPE public.probe_status USING status::public.probe_status;
+
+ALTER TABLE public.modem_signals
+    ALTER COLUMN correctable_codewords TYPE bigint,
+    ALTER COLUMN uncorrectable_codewords TYPE bigint,
+    ALTER COLUMN worst_channel_correctable TYPE bigint,
+    ALTER COLUMN worst_channel_uncorrectable TYPE bigint;
+
+DO $$
+DECLARE
+    resolution text;
+BEGIN
+    FOREACH resolution IN ARRAY ARRAY['1m', '15m', '1h'] LOOP
+        EXECUTE format('ALTER TABLE public.%I ALTER COLUMN correctable_codewords TYPE bigint, ALTER COLUMN uncorrectable_codewords TYPE bigint, '
+                       'ALTER COLUMN correctable_delta TYPE bigint, ALTER COLUMN uncorrectable_delta TYPE bigint', 'modem_rollup_' || resolution);
+        EXECUTE format('ALTER TABLE public.%I ALTER COLUMN correctable TYPE bigint, ALTER COLUMN uncorrectable TYPE bigint, '
+                       'ALTER COLUMN correctable_delta TYPE bigint, ALTER COLUMN uncorrectable_delta TYPE bigint', 'channel_rollup_' || resolution);
+    END LOOP;
+END
+$$;
+
+-- Rates are not stored per channel; they are correctable_delta[i] / interval_seconds
+CREATE TABLE IF NOT EXISTS public.channel_scrapes (
+    id bigserial NOT NULL,
+    "timestamp" timestamp without time zone NOT NULL,
+    node_id text NOT NULL DEFAULT 'local',
+    channel_ids smallint[] NOT NULL,
+    correctable bigint[],
+    uncorrectable bigint[],
+    correctable_delta bigint[],
+    uncorrectable_delta bigint[],
+    interval_seconds real,
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_channel_scrapes_timestamp ON public.channel_scrapes USING btree ("timestamp");
+CREATE INDEX IF NOT EXISTS idx_channel_scrapes_node_timestamp ON public.channel_scrapes USING btree (node_id, "timestamp");
+
+-- Rollups now come from channel_scrapes; pending work on the old table moves over
+DROP TRIGGER IF EXISTS channel_codewords_rollup_dirty ON public.channel_codewords;
+INSERT INTO public.rollup_dirty (source, node_id, hour)
+SELECT 'channel_scrapes', node_id, hour FROM public.rollup_dirty WHERE source = 'channel_codewords'
+ON CONFLICT DO NOTHING;
+DELETE FROM public.rollup_dirty WHERE source = 'channel_codewords';
+
+DROP TRIGGER IF EXISTS channel_scrapes_rollup_dirty ON public.channel_scrapes;
+CREATE TRIGGER channel_scrapes_rollup_dirty AFTER INSERT ON public.channel_scrapes REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mark_rollup_dirty();
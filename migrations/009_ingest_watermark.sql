@@ -0,0 +1,16 @@
+-- Per-node data version, bumped in the same transaction as every sample
+-- flush, remote ingest batch and rollup refresh. The API derives its ETag
+-- from it so an unchanged dashboard poll is answered with 304 Not Modified.
+
+CREATE TABLE IF NOT EXISTS public.ingest_watermark (
+    node_id text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0,
+    updated_at timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')
+);
+
+CREATE OR REPLACE FUNCTION public.bump_ingest_watermark(nodes text[]) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO public.ingest_watermark (node_id, version, updated_at)
+    SELECT DISTINCT node_id, 1, now() AT TIME ZONE 'UTC' FROM unnest(nodes) AS n(node_id)
+    ON CONFLICT (node_id) DO UPDATE SET version = ingest_watermark.version + 1, updated_at = EXCLUDED.updated_at;
+$$;
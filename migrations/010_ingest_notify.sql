@@ -0,0 +1,11 @@
+-- Announce every watermark bump on the `ingest` channel. NOTIFY is delivered
+-- when the writing transaction commits, so a listener that then reads the
+-- tables sees the new rows. The payload is the comma-separated node ids.
+
+CREATE OR REPLACE FUNCTION public.bump_ingest_watermark(nodes text[]) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO public.ingest_watermark (node_id, version, updated_at)
+    SELECT DISTINCT node_id, 1, now() AT TIME ZONE 'UTC' FROM unnest(nodes) AS n(node_id)
+    ON CONFLICT (node_id) DO UPDATE SET version = ingest_watermark.version + 1, updated_at = EXCLUDED.updated_at;
+    SELECT pg_notify('ingest', array_to_string(nodes, ','));
+$$;
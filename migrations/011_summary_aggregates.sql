@@ -0,0 +1,20 @@
+-- Sum of squared latencies per probe rollup bucket, so the summary can report
+-- a standard deviation from the buckets alone. Together with samples,
+-- ping_count, ping_sum, loss_sum, lossy, failed and high_latency this makes
+-- every bucket a mergeable summary of its rows.
+
+DO $$
+DECLARE
+    resolution text;
+BEGIN
+    FOREACH resolution IN ARRAY ARRAY['1m', '15m', '1h'] LOOP
+        EXECUTE format('ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS ping_sumsq double precision', 'probe_rollup_' || resolution);
+    END LOOP;
+END
+$$;
+
+-- Existing buckets lack the new column; the rollup worker recomputes them.
+-- Until it has, the summary reads their hours from probe_cycles.
+INSERT INTO public.rollup_dirty (source, node_id, hour)
+SELECT DISTINCT 'probe_cycles', node_id, date_trunc('hour', "timestamp") FROM public.probe_cycles
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,26 @@
+-- Packet loss slices for the hour-of-day and day-of-week heatmaps: one row
+-- per node and UTC hour with the Mountain Time day and hour it falls in.
+-- Mountain Time is a whole number of hours from UTC, so every UTC hour lies
+-- in exactly one local hour. Across DST changes, the repeated local hour has
+-- two slices and the skipped one has none. Any range sums its slices
+-- instead of converting every probe row. The rollup worker refreshes the
+-- slices of each dirty hour from probe_rollup_1h.
+
+CREATE TABLE IF NOT EXISTS public.loss_heatmap (
+    node_id text NOT NULL,
+    bucket timestamp without time zone NOT NULL,
+    local_day date NOT NULL,
+    local_hour smallint NOT NULL,
+    samples integer NOT NULL,
+    lossy integer NOT NULL,
+    loss_sum double precision,
+    PRIMARY KEY (node_id, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_loss_heatmap_bucket ON public.loss_heatmap USING btree (bucket);
+
+INSERT INTO public.loss_heatmap (node_id, bucket, local_day, local_hour, samples, lossy, loss_sum)
+SELECT node_id, bucket, (bucket AT TIME ZONE 'UTC' AT TIME ZONE 'America/Denver')::date,
+       EXTRACT(HOUR FROM bucket AT TIME ZONE 'UTC' AT TIME ZONE 'America/Denver'), samples, lossy, loss_sum
+FROM public.probe_rollup_1h WHERE target = 'ping'
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,23 @@
+-- Latency sketches (see latency_sketch.py): per probe cycle and target, the
+-- log-histogram keys of the replies and their counts. The rollup worker
+-- merges them into one sketch per target and bucket, so percentiles of any
+-- range come from adding up bucket sketches instead of raw RTTs.
+-- Rows written before this migration have RTTs but no sketch; build theirs
+-- with `python migrate.py sketches`.
+
+ALTER TABLE public.probe_cycles
+    ADD COLUMN IF NOT EXISTS ping_sketch_keys integer[],
+    ADD COLUMN IF NOT EXISTS ping_sketch_counts integer[],
+    ADD COLUMN IF NOT EXISTS cmts_sketch_keys integer[],
+    ADD COLUMN IF NOT EXISTS cmts_sketch_counts integer[];
+
+DO $$
+DECLARE
+    resolution text;
+BEGIN
+    FOREACH resolution IN ARRAY ARRAY['1m', '15m', '1h'] LOOP
+        EXECUTE format('ALTER TABLE public.%I ADD COLUMN IF NOT EXISTS sketch_keys integer[], ADD COLUMN IF NOT EXISTS sketch_counts integer[]',
+                       'probe_rollup_' || resolution);
+    END LOOP;
+END
+$$;
@@ -0,0 +1,16 @@
+-- An insert whose (node, hour) is already in rollup_dirty used to skip the
+-- entry (ON CONFLICT DO NOTHING) without locking it. The rollup worker could
+-- then claim and delete the entry and recompute the hour from a snapshot
+-- that did not contain the still-uncommitted rows, which were never rolled
+-- up. Updating the conflicting entry instead row-locks it until the insert
+-- commits, so the worker's FOR UPDATE SKIP LOCKED leaves it for a later pass.
+
+CREATE OR REPLACE FUNCTION public.mark_rollup_dirty() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO public.rollup_dirty (source, node_id, hour)
+    SELECT DISTINCT TG_TABLE_NAME, node_id, date_trunc('hour', "timestamp") FROM new_rows
+    ON CONFLICT (source, node_id, hour) DO UPDATE SET hour = EXCLUDED.hour;
+    RETURN NULL;
+END
+$$;
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""XB8 modem scraper.
+
+Keeps one authenticated session to the gateway's web UI and only logs in
+again when a page comes back as the login form. network_setup.jst is parsed
+in a single pass with precompiled patterns: the page is tokenized into
+section headings, table rows and the uptime field, and every row is reduced
+to (label, cell values) under the section heading it appears in.
+"""
+import os
+import re
+import time
+import requests
+
+SECTIONS = ('Downstream', 'Upstream', 'CM Error Codewords')
+TOKEN_RE = re.compile(
+    r'<h2[^>]*>(?P<heading>.*?)</h2>'
+    r'|<tr[^>]*>(?P<row>.*?)</tr>'
+    r'|System Uptime:</span>\s*<span[^>]*>(?P<uptime>.*?)</span>',
+    re.DOTALL | re.IGNORECASE
+)
+CELL_RE = re.compile(r'<t[dh][^>]*>(.*?)</t[dh]>', re.DOTALL | re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]+>')
+NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+UPTIME_RE = re.compile(r'(\d+)\s*days?\s*(\d+)h:\s*(\d+)m:\s*(\d+)s', re.IGNORECASE)
+
+
+def tokenize(html):
+    """Return ({section: {row label: [cell text, ...]}}, uptime text)"""
+    rows = {name: {} for name in SECTIONS}
+    section = None
+    uptime = None
+    for match in TOKEN_RE.finditer(html):
+        kind = match.lastgroup
+        if kind == 'heading':
+            heading = match.group('heading').strip()
+            if heading in SECTIONS:
+                section = heading
+        elif kind == 'row':
+            if section:
+                cells = [TAG_RE.sub('', cell).strip() for cell in CELL_RE.findall(match.group('row'))]
+                if len(cells) > 1:
+                    # First occurrence of a label wins, like the modem UI shows it
+                    rows[section].setdefault(cells[0], cells[1:])
+        else:
+            uptime = match.group('uptime')
+    return rows, uptime
+
+
+def numbers(cells, cast=float):
+    values = []
+    for cell in cells:
+        match = NUMBER_RE.search(cell)
+        if match:
+            values.append(cast(match.group()))
+    return values
+
+
+def parse_network_setup(html):
+    """Extract signal, codeword and uptime data from network_setup.jst"""
+    rows, uptime = tokenize(html)
+
+    data = {}
+    downstream = rows['Downstream']
+    snrs = numbers(downstream.get('SNR', []))
+    if snrs:
+        data['downstream_avg_snr'] = round(sum(snrs) / len(snrs), 1)
+        data['downstream_min_snr'] = round(min(snrs), 1)
+    powers = numbers(downstream.get('Power Level', []))
+    if powers:
+        data['downstream_avg_power'] = round(sum(powers) / len(powers), 1)
+        data['downstream_max_power'] = round(max(powers), 1)
+
+    up_powers = numbers(rows['Upstream'].get('Power Level', []))
+    if up_powers:
+        data['upstream_avg_power'] = round(sum(up_powers) / len(up_powers), 1)
+
+    codewords = rows['CM Error Codewords']
+    channel_ids = numbers(codewords.get('Channel ID', []), int)
+    correctable = numbers(codewords.get('Correctable Codewords', []), int)
+    uncorrectable = numbers(codewords.get('Uncorrectable Codewords', []), int)
+    if channel_ids and correctable and uncorrectable:
+        channel_data = list(zip(channel_ids, correctable, uncorrectable))
+        worst = max(channel_data, key=lambda ch: ch[1])
+        data['correctable_codewords'] = sum(ch[1] for ch in channel_data)
+        data['uncorrectable_codewords'] = sum(ch[2] for ch in channel_data)
+        data['channel_data'] = channel_data
+        # No worst channel when every counter is zero
+        data['worst_channel_id'] = worst[0] if worst[1] > 0 else None
+        data['worst_channel_correctable'] = worst[1]
+        data['worst_channel_uncorrectable'] = worst[2] if worst[1] > 0 else 0
+
+    if uptime:
+        match = UPTIME_RE.search(uptime)
+        if match:
+            days, hours, minutes, seconds = map(int, match.groups())
+            data['uptime_seconds'] = days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+    return data
+
+
+def is_login_page(response):
+    return (response.status_code in (401, 403)
+            or 'action="check.jst"' in response.text
+            or 'Channel Bonding Value' not in response.text)
+
+
+class ModemScraper:
+    def __init__(self, router_url=None, username=None, password=None, timeout=10):
+        self.router_url = router_url or os.getenv('ROUTER_URL', 'http://192.168.1.1')
+        self.username = username or os.getenv('ROUTER_USERNAME', 'admin')
+        self.password = password or os.getenv('ROUTER_PASSWORD')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.logged_in = False
+
+    def login(self):
+        self.session.cookies.clear()
+        self.session.post(
+            f'{self.router_url}/check.jst',
+            data={'username': self.username, 'password': self.password},
+            timeout=self.timeout
+        )
+        self.logged_in = True
+
+    def fetch(self):
+        """Return the network_setup.jst HTML, logging in only when needed"""
+        if not self.logged_in:
+            self.login()
+        page = self.session.get(f'{self.router_url}/network_setup.jst', timeout=self.timeout)
+        if is_login_page(page):
+            # Session expired or the modem rebooted - log in once and retry
+            self.login()
+            page = self.session.get(f'{self.router_url}/network_setup.jst', timeout=self.timeout)
+            if is_login_page(page):
+                self.logged_in = False
+                raise RuntimeError("Modem login failed")
+        return page.text
+
+    def scrape(self):
+        return parse_network_setup(self.fetch())
+
+
+def benchmark(path, iterations=200):
+    with open(path) as f:
+        html = f.read()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = parse_network_setup(html)
+    elapsed = time.perf_counter() - start
+    print(f"{path}: {len(html)} bytes, {elapsed / iterations * 1000:.3f} ms/parse over {iterations} runs")
+    return data
+
+
+if __name__ == "__main__":
+    import sys
+
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(fixtures, 'xb8_network_setup.html')
+        iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+        data = benchmark(path, iterations)
+        print({k: v for k, v in data.items() if k != 'channel_data'})
+    else:
+        data = ModemScraper().scrape()
+        print({k: v for k, v in data.items() if k != 'channel_data'})
@@ -1,11 +1,40 @@
 #!/usr/bin/env python3
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import gzip
+import hashlib
+import itertools
+import json
+import math
+import numpy as np
 import pytz
 import os
+import queue
+import re
+import select
+import threading
+import time
 from dotenv import load_dotenv
+from sample_writer import NODE_ID, decode_batch
+import downsample
+import latency_sketch
+from response_cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Responses are gzipped only
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # format=msgpack is unavailable
 
 # Load environment variables
 load_dotenv()
@@ -22,9 +51,201 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD')
 }
 
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 4))   # Connections each API worker keeps open between requests
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 8))   # Most connections per worker; further requests wait for a free one
+DB_POOL_CHECK_IDLE = 30  # Seconds idle after which a pooled connection is pinged before it is handed out
+
+PANEL_WORKERS = int(os.getenv('PANEL_WORKERS', DB_POOL_MAX))  # Threads per worker running panel queries concurrently
+
+PLACEHOLDER_RE = re.compile(r'%%|%s')
+
+INGEST_TOKEN = os.getenv('INGEST_TOKEN')  # Shared secret for remote collectors; ingest is off when unset
+INGEST_TABLES = ('probe_cycles', 'ping_tests', 'cmts_tests', 'speed_tests', 'modem_signals', 'channel_scrapes', 'modem_restarts')
+ingest_table_columns = {}
+
+COMPRESS_MIN_BYTES = 1024  # Smaller responses are sent uncompressed
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+
+# Fields of the columnar format, one array each. Modem and channel values only
+# exist on scrape rows, so they are listed with the indexes of those rows.
+PROBE_FIELDS = ('ping', 'packet_loss', 'status', 'cmts_ping', 'cmts_packet_loss')
+MODEM_FIELDS = ('modem_ds_snr', 'modem_ds_min_snr', 'modem_ds_power', 'modem_ds_max_power', 'modem_us_power')
+CHANNEL_FIELDS = ('correctable', 'uncorrectable', 'correctable_delta', 'uncorrectable_delta')
+
+response_cache = ResponseCache()
+
+LATENCY_PERCENTILES = (50, 90, 95, 99, 99.9)  # Reported by the latency panel; the CDF covers the rest
+
+DEFAULT_POINTS = 2000  # Probe rows drawn when the client sends neither width nor points
+MAX_POINTS = 20000
+PROBE_INTERVAL = float(os.getenv('PROBE_INTERVAL', 5))  # The collector's, to estimate the raw rows of a range
+RAW_ROW_LIMIT = 2 * MAX_POINTS  # Ranges with up to this many probe cycles are read raw and downsampled
+# Series sources by bucket width in seconds; the rollup tables are suffixed with the name
+RESOLUTIONS = (('raw', 0), ('1m', 60), ('15m', 900), ('1h', 3600))
+
+DEFAULT_NODE_TTL = 60      # Seconds the default node is reused before the node list is walked again
+default_node_cache = {}    # 'node' -> (expires, node id), shared by the worker's threads
+
+STREAM_KEEPALIVE = 15       # Seconds between keep-alive comments on /api/network/stream
+STREAM_QUEUE_SIZE = 100     # Events buffered per stream client; a client that falls further behind is dropped
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 16))  # Open streams per worker; each holds a thread, the rest serve requests
+STREAM_LOOKBACK = 60        # Seconds a sent row id is kept, for writers that commit out of id order
+
+# channel_scrapes expanded to one row per channel (`ch`) of each scrape (`t`)
+CHANNEL_ROWS = """channel_scrapes t CROSS JOIN LATERAL unnest(t.channel_ids, t.correctable, t.uncorrectable, t.correctable_delta, t.uncorrectable_delta)
+    AS ch(channel_id, correctable, uncorrectable, correctable_delta, uncorrectable_delta)"""
+
+# Counters that merge by addition, kept per target in the probe rollups
+SUMMARY_COUNTERS = ('samples', 'ping_count', 'ping_sum', 'ping_sumsq', 'loss_sum', 'lossy', 'failed', 'high_latency')
+
+# The same counters per target from raw probe_cycles rows (`p`)
+RAW_SUMMARY_QUERY = """
+    SELECT t.target, COUNT(*) as samples, COUNT(*) FILTER (WHERE t.rtt > 0) as ping_count,
+           SUM(t.rtt) FILTER (WHERE t.rtt > 0) as ping_sum, SUM(t.rtt * t.rtt) FILTER (WHERE t.rtt > 0) as ping_sumsq,
+           SUM(t.loss) as loss_sum, COUNT(*) FILTER (WHERE t.loss > 0) as lossy,
+           COUNT(*) FILTER (WHERE t.status = 'FAILED') as failed, COUNT(*) FILTER (WHERE t.status = 'HIGH_LATENCY') as high_latency
+    FROM {source}
+    CROSS JOIN LATERAL (VALUES ('ping', p.ping_rtt, p.ping_loss, p.ping_status),
+                               ('cmts', p.cmts_rtt, p.cmts_loss, p.cmts_status)) AS t(target, rtt, loss, status)
+    {where}
+    GROUP BY t.target
+"""
+
+# Whether a probe_cycles row has modem (and channel) readings stamped with its time
+SCRAPED = "EXISTS (SELECT 1 FROM modem_signals m WHERE m.node_id = probe_cycles.node_id AND m.timestamp = probe_cycles.timestamp) as scraped"
+
+# Probe buckets of one rollup resolution for one node, two rows per bucket like
+# the min/max downsampler keeps of raw rows: the lowest cycle latency at the
+# bucket start and the highest half a bucket ({half} seconds) later
+PROBE_ROLLUP_QUERY = """
+    SELECT b.bucket + e.shift as timestamp, (EXTRACT(EPOCH FROM b.bucket + e.shift) * 1000)::bigint as epoch_ms,
+           e.ping, b.packet_loss, b.status, e.cmts_ping, b.cmts_packet_loss
+    FROM (
+        SELECT bucket,
+               MIN(ping_min) FILTER (WHERE target = 'ping') as ping_min, MAX(ping_max) FILTER (WHERE target = 'ping') as ping_max,
+               MAX(loss_max) FILTER (WHERE target = 'ping') as packet_loss,
+               CASE WHEN SUM(failed) FILTER (WHERE target = 'ping') > 0 THEN 'FAILED'
+                    WHEN SUM(high_latency) FILTER (WHERE target = 'ping') > 0 THEN 'HIGH_LATENCY'
+                    WHEN SUM(packet_loss) FILTER (WHERE target = 'ping') > 0 THEN 'PACKET_LOSS'
+                    ELSE 'OK' END as status,
+               MIN(ping_min) FILTER (WHERE target = 'cmts') as cmts_min, MAX(ping_max) FILTER (WHERE target = 'cmts') as cmts_max,
+               MAX(loss_max) FILTER (WHERE target = 'cmts') as cmts_packet_loss
+        FROM probe_rollup_{resolution}
+        {where}
+        GROUP BY bucket
+    ) b
+    CROSS JOIN LATERAL (VALUES (INTERVAL '0', b.ping_min, b.cmts_min),
+                               (INTERVAL '{half} seconds', b.ping_max, b.cmts_max)) AS e(shift, ping, cmts_ping)
+    ORDER BY 1
+"""
+
 def get_db():
     return psycopg2.connect(**DB_CONFIG)
 
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers the statements prepared on it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Per-worker pool of up to `maxconn` connections. Requests beyond that
+    wait for a connection instead of failing. `minconn` connections (and the
+    statements prepared on them) stay open between requests; extra ones are
+    closed when returned. A connection that sat idle is checked with a round
+    trip before it is reused."""
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _pool(self):
+        # Opened on first use so each gunicorn worker gets its own connections
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadedConnectionPool(self.minconn, self.maxconn, connection_factory=PreparingConnection, **DB_CONFIG)
+            return self.pool
+
+    def _checkout(self, pool):
+        while True:
+            conn = pool.getconn()
+            if not conn.closed and time.monotonic() - conn.last_used < DB_POOL_CHECK_IDLE:
+                return conn
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+                return conn
+            except psycopg2.Error:
+                # Server restarted or the connection was dropped; open a new one
+                pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; its open transaction is rolled back on return"""
+        with self.slots:
+            pool = self._pool()
+            conn = self._checkout(pool)
+            try:
+                yield conn
+            finally:
+                broken = conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN
+                if not broken:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                conn.last_used = time.monotonic()
+                pool.putconn(conn, close=bool(broken))
+
+
+db_pool = ConnectionPool()
+panel_executor = ThreadPoolExecutor(PANEL_WORKERS, thread_name_prefix='panel')
+
+
+def execute_prepared(cur, sql, params=()):
+    """Run `sql` (with %s placeholders) as a server-side prepared statement,
+    preparing it the first time the connection sees that exact text"""
+    name = 'q_' + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    conn = cur.connection
+    if name not in conn.prepared:
+        numbers = itertools.count(1)
+        text = PLACEHOLDER_RE.sub(lambda m: '%' if m.group() == '%%' else f'${next(numbers)}', sql)
+        cur.execute(f"PREPARE {name} AS {text}")
+        conn.prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+def get_ingest_columns(cur, refresh=False):
+    """{table: columns} remote collectors may insert into, read from the live schema"""
+    if refresh or not ingest_table_columns:
+        cur.execute(
+            "SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = ANY(%s)",
+            (list(INGEST_TABLES),)
+        )
+        ingest_table_columns.clear()
+        for table, column in cur.fetchall():
+            if column not in ('id', 'node_id'):
+                ingest_table_columns.setdefault(table, set()).add(column)
+    return ingest_table_columns
+
+def batch_is_valid(cur, batch):
+    for refresh in (False, True):
+        # Refresh once in case a migration added columns since the cache was filled
+        allowed = get_ingest_columns(cur, refresh)
+        if all(table in allowed and set(columns) <= allowed[table] for table, columns in batch):
+            return True
+    return False
+
 def calculate_summary(tests):
     """Calculate summary statistics from all tests"""
     total_tests = len(tests)
@@ -71,67 +292,51 @@ def calculate_summary(tests):
         'avg_upload': round(avg_upload, 1) if avg_upload else None
     }
 
-def decimate_tests(tests, target=2000):
-    """Intelligently decimate test data while preserving outliers and time gaps"""
-    if len(tests) <= target:
-        return tests
-    
-    result = [tests[0]]  # Always keep first
-    step = max(1, len(tests) // target)
-    
-    for i in range(1, len(tests) - 1, step):
-        window_end = min(i + step, len(tests))
-        window = tests[i:window_end]
-        
-        # Check for time gaps (missing data periods)
-        if i > 0:
-            prev_time = datetime.strptime(result[-1]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            curr_time = datetime.strptime(window[0]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            time_gap = (curr_time - prev_time).total_seconds()
-            
-            # If gap > 15 minutes, keep both boundary points to show the gap
-            if time_gap > 900:
-                result.append(window[0])
-                if len(window) > 1:
-                    result.append(window[-1])
-                continue
-        
-        # Find outliers in window (packet loss, high latency, failures)
-        outliers = [t for t in window if 
-                   t.get('packet_loss', 0) > 0 or 
-                   t.get('cmts_packet_loss', 0) > 0 or
-                   (t.get('ping') and t['ping'] > 100) or
-                   t.get('status') == 'FAILED' or
-                   (t.get('download') is not None and t['download'] == 0)]
-        
-        if outliers:
-            result.extend(outliers)  # Keep all outliers
-        else:
-            # Check variance in normal data
-            pings = [t['ping'] for t in window if t.get('ping') and t['ping'] > 0]
-            if len(pings) > 1:
-                variance = max(pings) - min(pings)
-                if variance > 20:
-                    # High variance - keep min, middle, max
-                    sorted_window = sorted(window, key=lambda t: t.get('ping', 0))
-                    result.extend([sorted_window[0], sorted_window[len(sorted_window)//2], sorted_window[-1]])
-                else:
-                    # Low variance - keep middle point
-                    result.append(window[len(window)//2])
-            else:
-                result.append(window[len(window)//2])
-    
-    result.append(tests[-1])  # Always keep last
-    
-    # Sort by timestamp and remove duplicates
-    seen = set()
-    unique_result = []
-    for test in sorted(result, key=lambda t: t['timestamp']):
-        if test['timestamp'] not in seen:
-            seen.add(test['timestamp'])
-            unique_result.append(test)
-    
-    return unique_result
+def columnar_tests(tests, top_channels):
+    """Tests as one array per field instead of one object per test, with
+    epoch-millisecond timestamps. Modem and channel arrays are sparse: their
+    `index` array gives the test each value belongs to."""
+    columns = {'length': len(tests), 'timestamp': [t['epoch_ms'] for t in tests]}
+    for field in PROBE_FIELDS:
+        columns[field] = [t.get(field) for t in tests]
+    modem_rows = [i for i, t in enumerate(tests) if 'modem_ds_snr' in t]
+    columns['modem'] = {'index': modem_rows}
+    for field in MODEM_FIELDS:
+        columns['modem'][field] = [tests[i][field] for i in modem_rows]
+    channel_rows = [i for i, t in enumerate(tests) if 'channels' in t]
+    columns['channels'] = {'index': channel_rows}
+    for ch in top_channels:
+        values = [tests[i]['channels'].get(ch, {}) for i in channel_rows]
+        columns['channels'][str(ch)] = {field: [v.get(field) for v in values] for field in CHANNEL_FIELDS}
+    return columns
+
+def accepted_encoding():
+    """Best compression the client accepts: br, gzip or None"""
+    if brotli and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=5)
+
+@app.after_request
+def compress_response(response):
+    """Brotli or gzip JSON/MessagePack bodies for clients that accept it"""
+    if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    body = response.get_data()
+    encoding = accepted_encoding()
+    if len(body) < COMPRESS_MIN_BYTES or not encoding:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/')
 @app.route('/network.html')
@@ -139,312 +344,891 @@ def dashboard():
     return send_file('network.html')
 
 
-def get_summary_from_db(cur, cutoff=None):
-    """Calculate summary statistics in SQL instead of fetching all rows"""
-    where = "WHERE p.timestamp >= %s" if cutoff else ""
-    params = (cutoff,) if cutoff else ()
+def range_filter(cutoff=None, node=None, alias=None, end=None, column='timestamp'):
+    """SQL conditions and params restricting a query to the selected range and node"""
+    prefix = f"{alias}." if alias else ""
+    conditions, params = [], []
+    if cutoff:
+        conditions.append(f"{prefix}{column} >= %s")
+        params.append(cutoff)
+    if end:
+        conditions.append(f"{prefix}{column} < %s")
+        params.append(end)
+    if node:
+        conditions.append(f"{prefix}node_id = %s")
+        params.append(node)
+    return conditions, tuple(params)
+
 
-    cur.execute(f"""
-        WITH bucketed AS (
-            SELECT DISTINCT ON (date_trunc('second', p.timestamp) - (EXTRACT(SECOND FROM p.timestamp)::int %% 10) * INTERVAL '1 second')
-                   p.ping, p.packet_loss, p.status, c.ping as cmts_ping, c.packet_loss as cmts_packet_loss
-            FROM ping_tests p
-            LEFT JOIN cmts_tests c ON p.timestamp = c.timestamp
-            {where}
-            ORDER BY date_trunc('second', p.timestamp) - (EXTRACT(SECOND FROM p.timestamp)::int %% 10) * INTERVAL '1 second', p.timestamp
-        )
-        SELECT
-            COUNT(*) as total_tests,
-            SUM(CASE WHEN status = 'HIGH_LATENCY' THEN 1 ELSE 0 END) as high_latency,
-            SUM(CASE WHEN status = 'FAILED' THEN 1 ELSE 0 END) as failures,
-            SUM(CASE WHEN packet_loss > 0 THEN 1 ELSE 0 END) as google_packet_loss,
-            ROUND(AVG(CASE WHEN ping > 0 THEN ping END)::numeric, 1) as avg_latency,
-            ROUND(AVG(packet_loss)::numeric, 1) as avg_packet_loss,
-            SUM(CASE WHEN cmts_packet_loss > 0 THEN 1 ELSE 0 END) as cmts_packet_loss,
-            ROUND(AVG(CASE WHEN cmts_ping > 0 THEN cmts_ping END)::numeric, 1) as avg_cmts_latency,
-            ROUND(AVG(cmts_packet_loss)::numeric, 1) as avg_cmts_packet_loss
-        FROM bucketed
+def where_clause(conditions):
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def data_version(cur, node=None):
+    """Sum of the ingest watermarks of the selected node (or all nodes)"""
+    conditions, params = range_filter(node=node)
+    execute_prepared(cur, f"SELECT COALESCE(SUM(version), 0) AS version FROM ingest_watermark {where_clause(conditions)}", params)
+    return cur.fetchone()['version']
+
+
+def data_start(cur, node=None):
+    """Start of the oldest hourly probe bucket, where the "All" range begins"""
+    conditions, params = range_filter(node=node)
+    execute_prepared(cur, f"SELECT MIN(bucket) AS oldest FROM probe_rollup_1h {where_clause(conditions)}", params)
+    return cur.fetchone()['oldest']
+
+
+# Hourly aggregates (`r`) of an hour the rollup worker has not refreshed yet are stale
+NOT_DIRTY = "NOT EXISTS (SELECT 1 FROM rollup_dirty d WHERE d.source = 'probe_cycles' AND d.node_id = r.node_id AND d.hour = r.bucket)"
+# probe_cycles rows (`p`) of the dirty hours (`d`)
+DIRTY_PROBE_ROWS = "rollup_dirty d JOIN probe_cycles p ON p.node_id = d.node_id AND p.timestamp >= d.hour AND p.timestamp < d.hour + INTERVAL '1 hour'"
+
+
+def whole_hours(cutoff=None, end=None):
+    """(first_hour, last_hour): the whole hours of the range, which can be
+    read from hourly aggregates. first_hour is None for the "All" range."""
+    last_hour = (end or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    first_hour = cutoff and cutoff.replace(minute=0, second=0, microsecond=0)
+    if first_hour and first_hour < cutoff:
+        first_hour += timedelta(hours=1)
+    if first_hour and first_hour > last_hour:
+        # Within a single hour: all raw rows
+        first_hour = last_hour = cutoff
+    return first_hour, last_hour
+
+
+def raw_edges(cutoff, end, node, first_hour, last_hour):
+    """[(source, conditions, params)] of the probe_cycles rows (`p`) that the
+    hourly aggregates leave out: the partial hours at either end of the range
+    and the whole hours the rollup worker has not caught up with yet"""
+    edges = [('probe_cycles p', *range_filter(last_hour, node, 'p', end))]
+    if cutoff:
+        edges.append(('probe_cycles p', *range_filter(cutoff, node, 'p', first_hour)))
+    conditions, params = range_filter(first_hour, node, 'd', last_hour, 'hour')
+    edges.append((DIRTY_PROBE_ROWS, ["d.source = 'probe_cycles'"] + conditions, params))
+    return edges
+
+
+def summary_counters(cur, cutoff=None, node=None, end=None):
+    """{target: SUMMARY_COUNTERS} for the range: the hourly probe rollups of
+    its whole hours plus the raw rows of the rest (see raw_edges)"""
+    first_hour, last_hour = whole_hours(cutoff, end)
+    sums = ', '.join(f'SUM({name}) as {name}' for name in SUMMARY_COUNTERS)
+    conditions, params = range_filter(first_hour, node, 'r', last_hour, 'bucket')
+    params = list(params)
+    parts = [f"SELECT target, {sums} FROM probe_rollup_1h r {where_clause(conditions + [NOT_DIRTY])} GROUP BY target"]
+    for source, raw_conditions, raw_params in raw_edges(cutoff, end, node, first_hour, last_hour):
+        parts.append(RAW_SUMMARY_QUERY.format(source=source, where=where_clause(raw_conditions + ['t.loss IS NOT NULL'])))
+        params.extend(raw_params)
+
+    execute_prepared(cur, f"SELECT target, {sums} FROM ({' UNION ALL '.join(parts)}) parts GROUP BY target", params)
+    counters = {target: dict.fromkeys(SUMMARY_COUNTERS, 0) for target in ('ping', 'cmts')}
+    for row in cur.fetchall():
+        counters[row['target']] = {name: float(row[name] or 0) for name in SUMMARY_COUNTERS}
+    return counters
+
+
+def latency_sketches(cur, cutoff=None, node=None, end=None):
+    """{target: (keys, counts)}: the range's merged latency sketch, from the
+    hourly probe rollups of its whole hours plus the raw rows of the rest
+    (see raw_edges)"""
+    first_hour, last_hour = whole_hours(cutoff, end)
+    conditions, params = range_filter(first_hour, node, 'r', last_hour, 'bucket')
+    params = list(params)
+    parts = [f"""
+        SELECT r.target, k.key, k.count FROM probe_rollup_1h r
+        CROSS JOIN LATERAL unnest(r.sketch_keys, r.sketch_counts) AS k(key, count)
+        {where_clause(conditions + [NOT_DIRTY])}
+    """]
+    for source, raw_conditions, raw_params in raw_edges(cutoff, end, node, first_hour, last_hour):
+        parts.append(f"""
+            SELECT t.target, k.key, k.count FROM {source}
+            CROSS JOIN LATERAL (VALUES ('ping', p.ping_sketch_keys, p.ping_sketch_counts),
+                                       ('cmts', p.cmts_sketch_keys, p.cmts_sketch_counts)) AS t(target, keys, counts)
+            CROSS JOIN LATERAL unnest(t.keys, t.counts) AS k(key, count)
+            {where_clause(raw_conditions)}
+        """)
+        params.extend(raw_params)
+    execute_prepared(cur, f"""
+        SELECT target, key, SUM(count) as count FROM ({' UNION ALL '.join(parts)}) parts
+        GROUP BY target, key ORDER BY target, key
     """, params)
-    row = cur.fetchone()
+    sketches = {target: ([], []) for target in ('ping', 'cmts')}
+    for row in cur.fetchall():
+        keys, counts = sketches[row['target']]
+        keys.append(row['key'])
+        counts.append(int(row['count']))
+    return sketches
+
 
-    cur.execute(f"""
+def latency_stats(counters):
+    """Mean and population standard deviation of the latencies behind `counters`"""
+    count = counters['ping_count']
+    if not count:
+        return 0, 0
+    mean = counters['ping_sum'] / count
+    return round(mean, 1), round(math.sqrt(max(counters['ping_sumsq'] / count - mean * mean, 0)), 1)
+
+
+def get_summary_from_db(cur, cutoff=None, node=None, end=None):
+    """Summary statistics from mergeable counters (see summary_counters)
+    instead of a scan of the range"""
+    counters = summary_counters(cur, cutoff, node, end)
+    ping, cmts = counters['ping'], counters['cmts']
+    avg_latency, latency_stddev = latency_stats(ping)
+    avg_cmts, cmts_stddev = latency_stats(cmts)
+
+    speed_conditions, speed_params = range_filter(cutoff, node, end=end)
+    execute_prepared(cur, f"""
         SELECT ROUND(AVG(CASE WHEN download > 0 THEN download END)::numeric, 1) as avg_download,
                ROUND(AVG(CASE WHEN upload > 0 THEN upload END)::numeric, 1) as avg_upload
-        FROM speed_tests {"WHERE timestamp >= %s" if cutoff else ""}
-    """, params)
+        FROM speed_tests {where_clause(speed_conditions)}
+    """, speed_params)
     speed = cur.fetchone()
 
-    avg_latency = float(row['avg_latency']) if row['avg_latency'] else 0
-    avg_cmts = float(row['avg_cmts_latency']) if row['avg_cmts_latency'] else 0
-
     return {
-        'total_tests': row['total_tests'],
-        'high_latency': row['high_latency'],
-        'failures': row['failures'],
-        'google_packet_loss': row['google_packet_loss'],
-        'cmts_packet_loss': row['cmts_packet_loss'],
+        'total_tests': int(ping['samples']),
+        'high_latency': int(ping['high_latency']),
+        'failures': int(ping['failed']),
+        'google_packet_loss': int(ping['lossy']),
+        'cmts_packet_loss': int(cmts['lossy']),
         'avg_latency': avg_latency,
-        'avg_packet_loss': float(row['avg_packet_loss']) if row['avg_packet_loss'] else 0,
+        'latency_stddev': latency_stddev,
+        'avg_packet_loss': round(ping['loss_sum'] / ping['samples'], 1) if ping['samples'] else 0,
         'avg_cmts_latency': avg_cmts,
-        'avg_cmts_packet_loss': float(row['avg_cmts_packet_loss']) if row['avg_cmts_packet_loss'] else 0,
+        'cmts_latency_stddev': cmts_stddev,
+        'avg_cmts_packet_loss': round(cmts['loss_sum'] / cmts['samples'], 1) if cmts['samples'] else 0,
         'latency_diff': round(avg_cmts - avg_latency, 1),
         'avg_download': float(speed['avg_download']) if speed['avg_download'] else None,
         'avg_upload': float(speed['avg_upload']) if speed['avg_upload'] else None
     }
 
 
-def get_hourly_avg_from_db(cur, cutoff=None):
-    """Calculate hourly packet loss averages in SQL"""
-    where = "AND timestamp >= %s" if cutoff else ""
-    params = (cutoff,) if cutoff else ()
-
-    cur.execute(f"""
-        SELECT EXTRACT(HOUR FROM timestamp AT TIME ZONE 'UTC' AT TIME ZONE 'America/Denver')::int as hour,
-               AVG(packet_loss) as avg_loss
-        FROM ping_tests
-        WHERE TRUE {where}
-        GROUP BY hour
+def get_heatmap_from_db(cur, cutoff=None, node=None, end=None):
+    """Average packet loss and loss events by Mountain Time hour of day, and by
+    day of week (Monday first) and hour. Whole hours are summed from the
+    loss_heatmap slices, the rest from raw rows (see raw_edges)."""
+    first_hour, last_hour = whole_hours(cutoff, end)
+    conditions, params = range_filter(first_hour, node, 'r', last_hour, 'bucket')
+    params = list(params)
+    parts = [f"""
+        SELECT EXTRACT(ISODOW FROM local_day)::int as dow, local_hour as hour, samples, lossy, loss_sum
+        FROM loss_heatmap r {where_clause(conditions + [NOT_DIRTY])}
+    """]
+    for source, raw_conditions, raw_params in raw_edges(cutoff, end, node, first_hour, last_hour):
+        parts.append(f"""
+            SELECT EXTRACT(ISODOW FROM p.timestamp AT TIME ZONE 'UTC' AT TIME ZONE 'America/Denver')::int,
+                   EXTRACT(HOUR FROM p.timestamp AT TIME ZONE 'UTC' AT TIME ZONE 'America/Denver')::int,
+                   1, (p.ping_loss > 0)::int, p.ping_loss
+            FROM {source} {where_clause(raw_conditions + ['p.ping_loss IS NOT NULL'])}
+        """)
+        params.extend(raw_params)
+    execute_prepared(cur, f"""
+        SELECT dow, hour, SUM(samples) as samples, SUM(lossy) as lossy, SUM(loss_sum) as loss_sum
+        FROM ({' UNION ALL '.join(parts)}) parts GROUP BY dow, hour
     """, params)
 
-    hourly = [0.0] * 24
+    samples = [[0] * 24 for _ in range(7)]
+    lossy = [[0] * 24 for _ in range(7)]
+    loss_sum = [[0.0] * 24 for _ in range(7)]
     for row in cur.fetchall():
-        hourly[row['hour']] = float(row['avg_loss']) if row['avg_loss'] else 0
-    return hourly
+        day, hour = row['dow'] - 1, row['hour']
+        samples[day][hour] = int(row['samples'])
+        lossy[day][hour] = int(row['lossy'])
+        loss_sum[day][hour] = float(row['loss_sum'] or 0)
 
+    def average(total, count):
+        return round(total / count, 2) if count else 0
 
-@app.route('/api/network/data')
-def get_data():
-    minutes = request.args.get('minutes', type=int)
-    
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    cutoff = datetime.now() - timedelta(minutes=minutes) if minutes else None
+    return {
+        'hourly_avg': [average(sum(day[h] for day in loss_sum), sum(day[h] for day in samples)) for h in range(24)],
+        'weekly_avg': [[average(loss_sum[d][h], samples[d][h]) for h in range(24)] for d in range(7)],
+        'weekly_loss_events': lossy
+    }
 
-    # For "All" queries, sample data in SQL to avoid fetching 500K+ rows
-    # Use TABLESAMPLE for bulk, then UNION outliers to preserve them
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp, ping, packet_loss, status FROM ping_tests WHERE timestamp >= %s ORDER BY timestamp",
-            (cutoff,)
-        )
-    else:
-        # For "All" view, aggregate into 15-minute buckets with avg + max
-        cur.execute("""
-            SELECT date_trunc('hour', p.timestamp) + INTERVAL '15 min' * FLOOR(EXTRACT(MINUTE FROM p.timestamp) / 15) as timestamp,
-                   AVG(p.ping) as ping, MAX(p.packet_loss) as packet_loss,
-                   CASE WHEN MAX(CASE WHEN p.status = 'FAILED' THEN 1 ELSE 0 END) = 1 THEN 'FAILED'
-                        WHEN MAX(CASE WHEN p.status = 'HIGH_LATENCY' THEN 1 ELSE 0 END) = 1 THEN 'HIGH_LATENCY'
-                        WHEN MAX(CASE WHEN p.status = 'PACKET_LOSS' THEN 1 ELSE 0 END) = 1 THEN 'PACKET_LOSS'
-                        ELSE 'OK' END as status
-            FROM ping_tests p
-            GROUP BY 1 ORDER BY 1
-        """)
-    
-    ping_tests = cur.fetchall()
-    ping_timestamps = {row['timestamp'] for row in ping_tests}
-    
-    # Get CMTS tests - only for timestamps we have ping data for
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp, ping, packet_loss, status FROM cmts_tests WHERE timestamp >= %s ORDER BY timestamp",
-            (cutoff,)
-        )
-    else:
-        cur.execute("""
-            SELECT date_trunc('hour', c.timestamp) + INTERVAL '15 min' * FLOOR(EXTRACT(MINUTE FROM c.timestamp) / 15) as timestamp,
-                   AVG(c.ping) as ping, MAX(c.packet_loss) as packet_loss,
-                   CASE WHEN MAX(CASE WHEN c.status = 'FAILED' THEN 1 ELSE 0 END) = 1 THEN 'FAILED'
-                        WHEN MAX(CASE WHEN c.status = 'HIGH_LATENCY' THEN 1 ELSE 0 END) = 1 THEN 'HIGH_LATENCY'
-                        WHEN MAX(CASE WHEN c.status = 'PACKET_LOSS' THEN 1 ELSE 0 END) = 1 THEN 'PACKET_LOSS'
-                        ELSE 'OK' END as status
-            FROM cmts_tests c
-            GROUP BY 1 ORDER BY 1
-        """)
-    
-    cmts_tests = {row['timestamp']: row for row in cur.fetchall()}
-    BUCKET_EXPR = "date_trunc('hour', timestamp) + INTERVAL '15 min' * FLOOR(EXTRACT(MINUTE FROM timestamp) / 15)"
 
-    # Get channel codewords and find top 5 worst channels
-    if cutoff:
-        cur.execute(
-            "SELECT channel_id, MAX(correctable) as max_correctable FROM channel_codewords WHERE timestamp >= %s GROUP BY channel_id ORDER BY max_correctable DESC LIMIT 5",
-            (cutoff,)
-        )
-    else:
-        cur.execute("SELECT channel_id, MAX(correctable) as max_correctable FROM channel_codewords GROUP BY channel_id ORDER BY max_correctable DESC LIMIT 5")
-    
-    top_channels = [row['channel_id'] for row in cur.fetchall()]
-    
-    # Get codeword data for top channels
-    channel_data = {}
-    if top_channels:
-        if cutoff:
-            cur.execute(
-                "SELECT timestamp, channel_id, correctable, uncorrectable FROM channel_codewords WHERE channel_id = ANY(%s) AND timestamp >= %s ORDER BY timestamp",
-                (top_channels, cutoff)
-            )
+def pick_resolution(seconds, points):
+    """Series source for a span of `seconds`: raw rows while there are at most
+    RAW_ROW_LIMIT of them, else the coarsest rollup that still has a bucket
+    for every two of the `points` to draw (or raw rows if none does)"""
+    if seconds / PROBE_INTERVAL <= RAW_ROW_LIMIT:
+        return 'raw'
+    for resolution, width in reversed(RESOLUTIONS):
+        if width and seconds / width >= points / 2:
+            return resolution
+    return 'raw'
+
+
+class DataRange:
+    """Range, node filter and `since` cursor of a data request, as SQL
+    conditions, plus the series resolution and how far to downsample the
+    probe series. `start`/`end` (epoch ms) select a window instead of the
+    last `minutes`; `oldest` is where the "All" range begins."""
+
+    def __init__(self, minutes=None, node=None, since=None, points=DEFAULT_POINTS, mode='minmax',
+                 start=None, end=None, oldest=None):
+        self.node = node
+        self.points = points
+        self.mode = mode
+        if start:
+            self.cutoff = datetime.utcfromtimestamp(start / 1000)
+            self.end = datetime.utcfromtimestamp(end / 1000) if end else None
         else:
-            cur.execute(
-                f"SELECT {BUCKET_EXPR} as timestamp, channel_id, MAX(correctable) as correctable, MAX(uncorrectable) as uncorrectable FROM channel_codewords WHERE channel_id = ANY(%s) GROUP BY 1, channel_id ORDER BY 1",
-                (top_channels,)
-            )
-        
-        for row in cur.fetchall():
-            ts = row['timestamp']
-            if ts not in channel_data:
-                channel_data[ts] = {}
-            channel_data[ts][row['channel_id']] = {
-                'correctable': int(row['correctable']) if row['correctable'] else None,
-                'uncorrectable': int(row['uncorrectable']) if row['uncorrectable'] else None
-            }
-    
-    # Get speed tests
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp, download, upload FROM speed_tests WHERE timestamp >= %s ORDER BY timestamp",
-            (cutoff,)
-        )
-    else:
-        cur.execute("SELECT timestamp, download, upload FROM speed_tests ORDER BY timestamp")
-    
-    speed_test_rows = cur.fetchall()
-    speed_tests_array = []
-    for row in speed_test_rows:
-        utc_time = row['timestamp'].replace(tzinfo=pytz.UTC)
-        mt_time = utc_time.astimezone(MOUNTAIN_TZ)
-        speed_tests_array.append({
-            'timestamp': mt_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'download': row['download'],
-            'upload': row['upload']
-        })
-    
-    # Get modem signals
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power, correctable_codewords, uncorrectable_codewords, worst_channel_id, worst_channel_correctable, worst_channel_uncorrectable FROM modem_signals WHERE timestamp >= %s ORDER BY timestamp",
-            (cutoff,)
+            self.cutoff = datetime.now() - timedelta(minutes=minutes) if minutes else None
+            self.end = None
+        self.conditions, self.params = range_filter(self.cutoff, node, end=self.end)
+        self.where = where_clause(self.conditions)
+        self.node_conditions, self.node_params = range_filter(node=node)
+
+        first = self.cutoff or oldest
+        span = ((self.end or datetime.now()) - first).total_seconds() if first else 0
+        self.resolution = pick_resolution(span, points)
+        # Rollup rows are filtered on their bucket start
+        self.bucket_conditions, self.bucket_params = range_filter(self.cutoff, node, end=self.end, column='bucket')
+        self.bucket_where = where_clause(self.bucket_conditions)
+
+        # With a cursor only rows after it are returned; aggregates still cover the whole range.
+        # Only open-ended raw series grow row by row.
+        self.delta = bool(self.cutoff and since and not self.end and self.resolution == 'raw')
+        if self.delta:
+            since_time = datetime.utcfromtimestamp((since + 1) / 1000)
+            self.row_conditions, self.row_params = range_filter(max(self.cutoff, since_time), node)
+        else:
+            self.row_conditions, self.row_params = self.conditions, self.params
+        self.row_where = where_clause(self.row_conditions)
+
+
+def mountain_time(ts):
+    """Mountain-time string and epoch milliseconds of a stored (UTC) timestamp"""
+    utc_time = ts.replace(tzinfo=pytz.UTC)
+    return utc_time.astimezone(MOUNTAIN_TZ).strftime('%Y-%m-%d %H:%M:%S'), int(utc_time.timestamp() * 1000)
+
+
+def probes_panel(cur, r):
+    """Probe tests and modem restarts"""
+    # Both targets of a cycle come from the same probe_cycles row
+    if r.resolution == 'raw':
+        execute_prepared(
+            cur, f"SELECT timestamp, (EXTRACT(EPOCH FROM timestamp) * 1000)::bigint as epoch_ms, ping_rtt as ping, ping_loss as packet_loss, ping_status as status, cmts_rtt as cmts_ping, cmts_loss as cmts_packet_loss, {SCRAPED} FROM probe_cycles {r.row_where} ORDER BY timestamp",
+            r.row_params
         )
     else:
-        cur.execute(f"""
-            SELECT {BUCKET_EXPR} as timestamp,
-                   AVG(downstream_avg_snr) as downstream_avg_snr, MIN(downstream_min_snr) as downstream_min_snr,
-                   AVG(downstream_avg_power) as downstream_avg_power, MAX(downstream_max_power) as downstream_max_power,
-                   AVG(upstream_avg_power) as upstream_avg_power,
-                   MAX(correctable_codewords) as correctable_codewords, MAX(uncorrectable_codewords) as uncorrectable_codewords,
-                   NULL::int as worst_channel_id, NULL::numeric as worst_channel_correctable, NULL::numeric as worst_channel_uncorrectable
-            FROM modem_signals GROUP BY 1 ORDER BY 1
-        """)
-    
-    modem_signals = {row['timestamp']: row for row in cur.fetchall()}
-    
-    # Merge data
+        # Long ranges read the rollups (min + max per bucket)
+        half = dict(RESOLUTIONS)[r.resolution] // 2
+        execute_prepared(cur, PROBE_ROLLUP_QUERY.format(resolution=r.resolution, half=half, where=r.bucket_where), r.bucket_params)
+
     tests = []
-    for row in ping_tests:
-        # Convert UTC timestamp to Mountain Time
-        utc_time = row['timestamp'].replace(tzinfo=pytz.UTC)
-        mt_time = utc_time.astimezone(MOUNTAIN_TZ)
-        
+    for row in downsample_probes(cur.fetchall(), r):
+        timestamp, epoch_ms = mountain_time(row['timestamp'])
         test = {
-            'timestamp': mt_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': timestamp,
+            'epoch_ms': epoch_ms,
             'ping': row['ping'],
             'packet_loss': row['packet_loss'],
             'status': row['status']
         }
-        if row['timestamp'] in cmts_tests:
-            test['cmts_ping'] = cmts_tests[row['timestamp']]['ping']
-            test['cmts_packet_loss'] = cmts_tests[row['timestamp']]['packet_loss']
-        if row['timestamp'] in modem_signals:
-            test['modem_ds_snr'] = modem_signals[row['timestamp']]['downstream_avg_snr']
-            test['modem_ds_min_snr'] = modem_signals[row['timestamp']]['downstream_min_snr']
-            test['modem_ds_power'] = modem_signals[row['timestamp']]['downstream_avg_power']
-            test['modem_ds_max_power'] = modem_signals[row['timestamp']]['downstream_max_power']
-            test['modem_us_power'] = modem_signals[row['timestamp']]['upstream_avg_power']
-        if row['timestamp'] in channel_data:
-            test['channels'] = channel_data[row['timestamp']]
+        if row['cmts_packet_loss'] is not None:
+            test['cmts_ping'] = row['cmts_ping']
+            test['cmts_packet_loss'] = row['cmts_packet_loss']
         tests.append(test)
-    
-    # Get modem restart events
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp FROM modem_restarts WHERE timestamp >= %s ORDER BY timestamp",
-            (cutoff,)
+
+    # A restart is stamped with when it happened, detected one scrape later, so
+    # it is always older than the cursor; the whole range's restarts are sent
+    execute_prepared(cur, f"SELECT timestamp FROM modem_restarts {r.where} ORDER BY timestamp", r.params)
+    restarts = [mountain_time(row['timestamp'])[0] for row in cur.fetchall()]
+    return {'tests': tests, 'restarts': restarts}
+
+
+def downsample_probes(rows, r):
+    """The probe rows worth drawing, about r.points of them. Loss, failures,
+    gaps and the rows /api/network/data attaches modem and channel readings
+    to are always kept."""
+    if len(rows) <= r.points:
+        return rows
+    t = np.fromiter((row['epoch_ms'] for row in rows), np.int64, len(rows))
+    ping = np.array([row['ping'] for row in rows], dtype=float)
+    loss = np.fmax(np.array([row['packet_loss'] for row in rows], dtype=float),
+                   np.array([row['cmts_packet_loss'] for row in rows], dtype=float))
+    failed = np.array([row['status'] == 'FAILED' for row in rows])
+    severity = np.where(failed, 100.0, np.nan_to_num(loss))
+    scraped = np.array([row.get('scraped', False) for row in rows])
+    return [rows[i] for i in downsample.select(t, ping, severity, r.points, r.mode, scraped)]
+
+
+def modem_panel(cur, r):
+    """Modem signal readings and the latest uptime"""
+    if r.resolution == 'raw':
+        execute_prepared(
+            cur, f"SELECT timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power FROM modem_signals {r.row_where} ORDER BY timestamp",
+            r.row_params
         )
     else:
-        cur.execute("SELECT timestamp FROM modem_restarts ORDER BY timestamp")
-    
-    restarts = []
+        execute_prepared(cur, f"""
+            SELECT bucket as timestamp,
+                   SUM(downstream_avg_snr * samples) / NULLIF(SUM(samples) FILTER (WHERE downstream_avg_snr IS NOT NULL), 0) as downstream_avg_snr,
+                   MIN(downstream_min_snr) as downstream_min_snr,
+                   SUM(downstream_avg_power * samples) / NULLIF(SUM(samples) FILTER (WHERE downstream_avg_power IS NOT NULL), 0) as downstream_avg_power,
+                   MAX(downstream_max_power) as downstream_max_power,
+                   SUM(upstream_avg_power * samples) / NULLIF(SUM(samples) FILTER (WHERE upstream_avg_power IS NOT NULL), 0) as upstream_avg_power
+            FROM modem_rollup_{r.resolution} {r.bucket_where} GROUP BY 1 ORDER BY 1
+        """, r.bucket_params)
+
+    modem = []
     for row in cur.fetchall():
-        # Convert UTC timestamp to Mountain Time
-        utc_time = row['timestamp'].replace(tzinfo=pytz.UTC)
-        mt_time = utc_time.astimezone(MOUNTAIN_TZ)
-        restarts.append(mt_time.strftime('%Y-%m-%d %H:%M:%S'))
-    
+        timestamp, epoch_ms = mountain_time(row['timestamp'])
+        modem.append({
+            'timestamp': timestamp,
+            'epoch_ms': epoch_ms,
+            'modem_ds_snr': row['downstream_avg_snr'],
+            'modem_ds_min_snr': row['downstream_min_snr'],
+            'modem_ds_power': row['downstream_avg_power'],
+            'modem_ds_max_power': row['downstream_max_power'],
+            'modem_us_power': row['upstream_avg_power']
+        })
+
     # Get latest uptime and timestamp
-    cur.execute("SELECT timestamp, uptime_seconds FROM modem_signals WHERE uptime_seconds IS NOT NULL ORDER BY timestamp DESC LIMIT 1")
+    execute_prepared(cur, f"SELECT timestamp, uptime_seconds FROM modem_signals {where_clause(['uptime_seconds IS NOT NULL'] + r.node_conditions)} ORDER BY timestamp DESC LIMIT 1", r.node_params)
     uptime_row = cur.fetchone()
-    uptime_seconds = uptime_row['uptime_seconds'] if uptime_row else None
-    uptime_timestamp = uptime_row['timestamp'].strftime('%Y-%m-%d %H:%M:%S') if uptime_row else None
-    
-    # Get weather data for the same time range (excluding future forecast data)
-    if cutoff:
-        cur.execute(
-            "SELECT timestamp, temperature, precipitation, weather_code FROM weather_data WHERE timestamp >= %s AND timestamp <= NOW() ORDER BY timestamp",
-            (cutoff,)
-        )
+    return {
+        'modem': modem,
+        'uptime_seconds': uptime_row['uptime_seconds'] if uptime_row else None,
+        'uptime_timestamp': uptime_row['timestamp'].strftime('%Y-%m-%d %H:%M:%S') if uptime_row else None
+    }
+
+
+def channels_panel(cur, r):
+    """Codeword counts of the five channels with the most errors in the range"""
+    # Rank channels by errors counted in the range (deltas are computed at ingest)
+    if r.resolution == 'raw':
+        source, where, params = CHANNEL_ROWS, r.where, r.params
     else:
-        cur.execute("SELECT timestamp, temperature, precipitation, weather_code FROM weather_data WHERE timestamp <= NOW() ORDER BY timestamp")
-    
-    weather_data = []
-    for row in cur.fetchall():
-        utc_time = row['timestamp'].replace(tzinfo=pytz.UTC)
-        mt_time = utc_time.astimezone(MOUNTAIN_TZ)
-        weather_data.append({
-            'timestamp': mt_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'temperature': row['temperature'],
-            'precipitation': row['precipitation'],
-            'weather_code': row['weather_code']
-        })
-    
+        source, where, params = 'channel_rollup_1h ch', r.bucket_where, r.bucket_params
+    execute_prepared(
+        cur, f"SELECT ch.channel_id, SUM(ch.correctable_delta) as total_correctable FROM {source} {where} GROUP BY ch.channel_id HAVING SUM(ch.correctable_delta) IS NOT NULL ORDER BY total_correctable DESC LIMIT 5",
+        params
+    )
+    top_channels = [row['channel_id'] for row in cur.fetchall()]
+
+    channel_data = {}
+    if top_channels:
+        if r.resolution == 'raw':
+            execute_prepared(
+                cur, f"SELECT timestamp, ch.channel_id, ch.correctable, ch.uncorrectable, ch.correctable_delta, ch.uncorrectable_delta FROM {CHANNEL_ROWS} {where_clause(['ch.channel_id = ANY(%s)'] + r.row_conditions)} ORDER BY timestamp",
+                (top_channels,) + r.row_params
+            )
+        else:
+            execute_prepared(
+                cur, f"SELECT bucket as timestamp, channel_id, MAX(correctable) as correctable, MAX(uncorrectable) as uncorrectable, SUM(correctable_delta) as correctable_delta, SUM(uncorrectable_delta) as uncorrectable_delta FROM channel_rollup_{r.resolution} ch {where_clause(['ch.channel_id = ANY(%s)'] + r.bucket_conditions)} GROUP BY 1, channel_id ORDER BY 1",
+                (top_channels,) + r.bucket_params
+            )
+
+        for row in cur.fetchall():
+            ts = row['timestamp']
+            if ts not in channel_data:
+                timestamp, epoch_ms = mountain_time(ts)
+                channel_data[ts] = {'timestamp': timestamp, 'epoch_ms': epoch_ms, 'channels': {}}
+            channel_data[ts]['channels'][row['channel_id']] = {
+                field: int(row[field]) if row[field] is not None else None for field in CHANNEL_FIELDS
+            }
+    return {'top_channels': top_channels, 'channels': list(channel_data.values())}
+
+
+def speed_panel(cur, r):
+    """Speed tests in the range and the latest one overall"""
+    # Stamped when the test starts but stored when it finishes, so a test can
+    # land behind the cursor; the whole range's tests are sent
+    execute_prepared(cur, f"SELECT timestamp, download, upload FROM speed_tests {r.where} ORDER BY timestamp", r.params)
+    speed_tests = [{
+        'timestamp': mountain_time(row['timestamp'])[0],
+        'download': row['download'],
+        'upload': row['upload']
+    } for row in cur.fetchall()]
+
     # Get latest speed test regardless of time range
-    cur.execute("SELECT timestamp, download, upload FROM speed_tests ORDER BY timestamp DESC LIMIT 1")
+    execute_prepared(cur, f"SELECT timestamp, download, upload FROM speed_tests {where_clause(r.node_conditions)} ORDER BY timestamp DESC LIMIT 1", r.node_params)
     latest_speed_row = cur.fetchone()
     latest_speed = None
     if latest_speed_row:
-        utc_time = latest_speed_row['timestamp'].replace(tzinfo=pytz.UTC)
-        mt_time = utc_time.astimezone(MOUNTAIN_TZ)
         latest_speed = {
-            'timestamp': mt_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'timestamp': mountain_time(latest_speed_row['timestamp'])[0],
             'download': latest_speed_row['download'],
             'upload': latest_speed_row['upload']
         }
-    
-    # Calculate summary and hourly stats in SQL (avoids fetching all rows)
-    summary = get_summary_from_db(cur, cutoff)
-    hourly_avg = get_hourly_avg_from_db(cur, cutoff)
+    return {'speed_tests': speed_tests, 'latest_speed': latest_speed}
 
-    conn.close()
-    
-    # Decimate data server-side if needed
-    if len(tests) > 6000:
-        tests = decimate_tests(tests, target=2000)
-    
-    return jsonify({
-        'tests': tests,
-        'speed_tests': speed_tests_array,
-        'summary': summary,
-        'hourly_avg': hourly_avg,
-        'top_channels': top_channels,
-        'restarts': restarts,
-        'uptime_seconds': uptime_seconds,
-        'uptime_timestamp': uptime_timestamp,
-        'weather': weather_data,
-        'latest_speed': latest_speed,
-        'node_id': os.getenv('NODE_ID', 'Unknown'),
+
+def weather_panel(cur, r):
+    """Hourly weather for the range (excluding future forecast data)"""
+    # Left out of incremental responses; clients keep what they have
+    if r.delta:
+        return {'weather': None}
+    conditions, params = range_filter(r.cutoff, end=r.end)
+    execute_prepared(
+        cur, f"SELECT timestamp, temperature, precipitation, weather_code FROM weather_data {where_clause(conditions + ['timestamp <= NOW()'])} ORDER BY timestamp",
+        params
+    )
+    return {'weather': [{
+        'timestamp': mountain_time(row['timestamp'])[0],
+        'temperature': row['temperature'],
+        'precipitation': row['precipitation'],
+        'weather_code': row['weather_code']
+    } for row in cur.fetchall()]}
+
+
+def summary_panel(cur, r):
+    return {'summary': get_summary_from_db(cur, r.cutoff, r.node, r.end)}
+
+
+def latency_panel(cur, r):
+    """Latency percentiles and CDF of each target, merged from the sketches"""
+    latency = {}
+    for target, (keys, counts) in latency_sketches(cur, r.cutoff, r.node, r.end).items():
+        percentiles = {}
+        for q in LATENCY_PERCENTILES:
+            value = latency_sketch.quantile(keys, counts, q / 100)
+            percentiles[f'p{q:g}'] = round(value, 3) if value is not None else None
+        latency[target] = {
+            'samples': sum(counts),
+            'percentiles': percentiles,
+            'cdf': [[round(ms, 3), round(fraction, 4)] for ms, fraction in latency_sketch.cdf(keys, counts)]
+        }
+    return {'latency': latency, 'relative_accuracy': latency_sketch.SKETCH_ALPHA}
+
+
+def heatmap_panel(cur, r):
+    return get_heatmap_from_db(cur, r.cutoff, r.node, r.end)
+
+
+PANELS = {
+    'probes': probes_panel,
+    'summary': summary_panel,
+    'modem': modem_panel,
+    'channels': channels_panel,
+    'speed': speed_panel,
+    'weather': weather_panel,
+    'heatmap': heatmap_panel,
+    'latency': latency_panel,
+}
+
+
+def run_panel(name, r):
+    with db_pool.connection() as conn:
+        return PANELS[name](conn.cursor(cursor_factory=RealDictCursor), r)
+
+
+def run_panels(names, r):
+    """Run the panels' queries concurrently, each on its own pooled connection"""
+    futures = {name: panel_executor.submit(run_panel, name, r) for name in names}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def target_labels(node):
+    return {
+        'node_id': node,
         'ping_target': os.getenv('PING_TARGET', '8.8.8.8'),
         'ping_target_name': os.getenv('PING_TARGET_NAME', 'Google DNS'),
         'cmts_target': os.getenv('CMTS_TARGET')
-    })
+    }
+
+
+def series_columns(rows, fields):
+    """Series rows as one array per field, with epoch-millisecond timestamps"""
+    columns = {'length': len(rows), 'timestamp': [row['epoch_ms'] for row in rows]}
+    for field in fields:
+        columns[field] = [row.get(field) for row in rows]
+    return columns
+
+
+def channel_columns(rows, top_channels):
+    columns = {'length': len(rows), 'timestamp': [row['epoch_ms'] for row in rows]}
+    for ch in top_channels:
+        values = [row['channels'].get(ch, {}) for row in rows]
+        columns[str(ch)] = {field: [v.get(field) for v in values] for field in CHANNEL_FIELDS}
+    return columns
+
+
+def panel_payload(name, r, fmt):
+    """One panel's data in the requested format"""
+    payload = run_panel(name, r)
+    if name == 'probes':
+        payload.update(target_labels(r.node))
+    series = [key for key in ('tests', 'modem', 'channels') if key in payload]
+    if fmt == 'rows':
+        for key in series:
+            for row in payload[key]:
+                del row['epoch_ms']
+    elif name == 'channels':
+        payload['channels'] = channel_columns(payload['channels'], payload['top_channels'])
+    else:
+        for key in series:
+            payload[key] = series_columns(payload[key], PROBE_FIELDS if key == 'tests' else MODEM_FIELDS)
+    payload.update({'format': fmt, 'delta': r.delta, 'resolution': r.resolution})
+    return payload
+
+
+def data_payload(r, fmt):
+    """All panels combined, with modem and channel readings merged into the
+    tests taken at the same time"""
+    panels = run_panels(PANELS, r)
+    modem = {row['epoch_ms']: row for row in panels['modem']['modem']}
+    channels = {row['epoch_ms']: row['channels'] for row in panels['channels']['channels']}
+    top_channels = panels['channels']['top_channels']
+
+    tests = panels['probes']['tests']
+    for test in tests:
+        if test['epoch_ms'] in modem:
+            for field in MODEM_FIELDS:
+                test[field] = modem[test['epoch_ms']][field]
+        if test['epoch_ms'] in channels:
+            test['channels'] = channels[test['epoch_ms']]
+
+    payload = {
+        'format': fmt,
+        'delta': r.delta,
+        'resolution': r.resolution,
+        'speed_tests': panels['speed']['speed_tests'],
+        'summary': panels['summary']['summary'],
+        'hourly_avg': panels['heatmap']['hourly_avg'],
+        'weekly_avg': panels['heatmap']['weekly_avg'],
+        'weekly_loss_events': panels['heatmap']['weekly_loss_events'],
+        'latency': panels['latency']['latency'],
+        'top_channels': top_channels,
+        'restarts': panels['probes']['restarts'],
+        'uptime_seconds': panels['modem']['uptime_seconds'],
+        'uptime_timestamp': panels['modem']['uptime_timestamp'],
+        'weather': panels['weather']['weather'],
+        'latest_speed': panels['speed']['latest_speed'],
+        **target_labels(r.node)
+    }
+    if fmt == 'rows':
+        for test in tests:
+            del test['epoch_ms']
+        payload['tests'] = tests
+    else:
+        payload['tests'] = columnar_tests(tests, top_channels)
+    return payload
+
+
+def data_response(name, build):
+    """Shared request handling of the data and panel endpoints: format
+    negotiation, ETag/304 and the response cache. `build(range, fmt)` returns
+    the payload."""
+    minutes = request.args.get('minutes', type=int)
+    # A zoomed window in epoch ms; `end` is optional and defaults to now
+    start = request.args.get('start', type=int)
+    end = request.args.get('end', type=int)
+    if end and not start:
+        return jsonify({'error': 'end requires start'}), 400
+    if start and end and end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    node = request.args.get('node')
+    # rows (default): a list of objects; columns: one array per field; msgpack: columns as MessagePack
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'msgpack' if request.accept_mimetypes.best == 'application/msgpack' else 'rows'
+    if fmt not in ('rows', 'columns', 'msgpack'):
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
+    if fmt == 'msgpack' and msgpack is None:
+        return jsonify({'error': 'MessagePack is not available (pip install msgpack)'}), 406
+    # Epoch ms of the newest row the client already has (ranged views only)
+    since = request.args.get('since', type=int)
+    # Probe rows to draw: `points`, or two per pixel of the client's chart `width`
+    width = request.args.get('width', type=int)
+    points = request.args.get('points', type=int) or (2 * width if width else DEFAULT_POINTS)
+    points = min(max(points, 10), MAX_POINTS)
+    mode = request.args.get('downsample', 'minmax')
+    if mode not in downsample.MODES:
+        return jsonify({'error': f'Unknown downsample mode: {mode}'}), 400
+
+    # Read before the data so a write that lands mid-request changes the next ETag.
+    # The connection goes back before building, which borrows its own.
+    with db_pool.connection() as conn:
+        node = node or default_node(conn)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        version = data_version(cur, node)
+        oldest = data_start(cur, node) if not (start or minutes) else None
+    span = f"{start}~{end or 'now'}" if start else minutes or 'all'
+    etag = f"{version}-{span}-{node}-{fmt}-{name}-{points}{mode}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    # The ETag carries the data version, so a new ingest starts a new cache entry
+    encoding = accepted_encoding()
+    r = DataRange(minutes, node, since, points, mode, start, end, oldest)
+    key = f"{etag}|{since if r.delta else ''}|{encoding}"
+    headers, body = response_cache.fetch(key, lambda: encode_payload(build(r, fmt), fmt, encoding))
+
+    response = Response(body, headers=headers)
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    return response
+
+
+def encode_payload(payload, fmt, encoding):
+    """Serialized (and compressed, if `encoding`) payload, as the response
+    cache's (headers, body)"""
+    if fmt == 'msgpack':
+        headers, body = {'Content-Type': 'application/msgpack'}, msgpack.packb(payload, default=str)
+    else:
+        headers, body = {'Content-Type': 'application/json'}, app.json.dumps(payload).encode()
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        headers['Content-Encoding'] = encoding
+        body = compress(body, encoding)
+    return headers, body
+
+
+@app.route('/api/network/data')
+def get_data():
+    """Every panel in one response"""
+    return data_response('data', data_payload)
+
+
+@app.route('/api/network/panels/<panel>')
+def get_panel(panel):
+    """One dashboard panel, so the page can draw each as soon as it arrives"""
+    if panel not in PANELS:
+        return jsonify({'error': f'Unknown panel: {panel}'}), 404
+    return data_response(panel, lambda r, fmt: panel_payload(panel, r, fmt))
+
+@app.route('/api/network/ingest', methods=['POST'])
+def ingest():
+    """Insert a gzipped sample batch pushed by a remote collector. A batch_id
+    that was already committed is acknowledged without inserting again."""
+    if not INGEST_TOKEN:
+        return jsonify({'error': 'Ingest is disabled (INGEST_TOKEN not set)'}), 404
+    if request.headers.get('Authorization') != f'Bearer {INGEST_TOKEN}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        batch_id, node_id, batch = decode_batch(request.get_data())
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Malformed batch: {e}'}), 400
+    if not batch_id or not node_id:
+        return jsonify({'error': 'batch_id and node_id are required'}), 400
+
+    rows = sum(len(r) for r in batch.values())
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        if not batch_is_valid(cur, batch):
+            return jsonify({'error': 'Unknown table or column in batch'}), 400
+        cur.execute(
+            "INSERT INTO ingest_batches (batch_id, node_id, row_count) VALUES (%s, %s, %s) ON CONFLICT (batch_id) DO NOTHING",
+            (batch_id, node_id, rows)
+        )
+        if cur.rowcount == 0:
+            conn.rollback()
+            return jsonify({'batch_id': batch_id, 'rows': 0, 'duplicate': True})
+        try:
+            for (table, columns), table_rows in batch.items():
+                execute_values(
+                    cur,
+                    f"INSERT INTO {table} ({', '.join(columns)}, node_id) VALUES %s",
+                    [row + (node_id,) for row in table_rows],
+                    page_size=1000
+                )
+        except (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.ProgrammingError) as e:
+            # The rows themselves are bad; retrying the batch would fail the same way
+            conn.rollback()
+            return jsonify({'error': f'Batch rejected: {e}'.strip()}), 422
+        cur.execute("SELECT bump_ingest_watermark(%s)", ([node_id],))
+        conn.commit()
+    return jsonify({'batch_id': batch_id, 'rows': rows, 'duplicate': False})
+
+def list_nodes(conn):
+    """Every node with probe data"""
+    cur = conn.cursor()
+    # Walk the (node_id, timestamp) index one node at a time instead of a DISTINCT over every row
+    execute_prepared(cur, """
+        WITH RECURSIVE nodes AS (
+            SELECT MIN(node_id) AS node_id FROM probe_cycles
+            UNION ALL
+            SELECT (SELECT MIN(node_id) FROM probe_cycles WHERE node_id > nodes.node_id) FROM nodes WHERE node_id IS NOT NULL
+        )
+        SELECT node_id FROM nodes WHERE node_id IS NOT NULL
+    """)
+    return [row[0] for row in cur.fetchall()]
+
+def pick_default_node(nodes):
+    return NODE_ID if NODE_ID in nodes or not nodes else nodes[0]
+
+def default_node(conn):
+    """Node shown when a request names none: this server's NODE_ID, or the
+    first node with data if it has none. Series of different nodes never
+    share one line. Looked up at most once per DEFAULT_NODE_TTL, as every
+    panel request (304s included) needs it."""
+    expires, node = default_node_cache.get('node', (0, None))
+    if expires <= time.monotonic():
+        node = pick_default_node(list_nodes(conn))
+        default_node_cache['node'] = (time.monotonic() + DEFAULT_NODE_TTL, node)
+    return node
+
+@app.route('/api/network/nodes')
+def get_nodes():
+    with db_pool.connection() as conn:
+        nodes = list_nodes(conn)
+    return jsonify({'nodes': nodes, 'default': pick_default_node(nodes)})
+
+class SampleBroadcaster:
+    """Fans new samples out to /api/network/stream clients. Each worker
+    process holds one LISTEN connection. On every `ingest` notification it
+    reads the rows added since the last one once, whatever the number of
+    connected dashboards, and queues them for each client.
+
+    Concurrent writers (the collector's pool, ingest requests of several
+    nodes) can commit a lower id after a higher one, so ids are not a cursor
+    on their own. Every read goes back to a floor id, skips ids already
+    sent, and the floor only moves past ids sent STREAM_LOOKBACK ago."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}  # queue -> node
+        self.floors = {}   # table -> id at or below which every row counts as sent
+        self.sent = {}     # table -> {id above the floor: monotonic time sent}
+        self.thread = None
+
+    def subscribe(self, node):
+        """Queue for one client, or None when the worker has no stream to spare"""
+        client = queue.Queue(STREAM_QUEUE_SIZE)
+        with self.lock:
+            if len(self.clients) >= STREAM_MAX_CLIENTS:
+                return None
+            self.clients[client] = node
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='sample-broadcaster', daemon=True)
+                self.thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.pop(client, None)
+
+    def is_subscribed(self, client):
+        with self.lock:
+            return client in self.clients
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except psycopg2.Error as e:
+                print(f"Sample stream listener failed, reconnecting in 5s: {e}")
+                time.sleep(5)
+
+    def _listen(self):
+        conn = get_db()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("LISTEN ingest")
+            # Start from the current newest rows; history comes from /api/network/data
+            for table in ('probe_cycles', 'modem_signals', 'speed_tests'):
+                cur.execute(f"SELECT COALESCE(MAX(id), 0) AS id FROM {table}")
+                self.floors.setdefault(table, cur.fetchone()['id'])
+                self.sent.setdefault(table, {})
+            while True:
+                if select.select([conn], [], [], STREAM_KEEPALIVE) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    self._broadcast(cur)
+        finally:
+            conn.close()
+
+    def _read_new(self, cur, table, columns):
+        cur.execute(f"SELECT id, timestamp, node_id, {columns} FROM {table} WHERE id > %s ORDER BY timestamp", (self.floors[table],))
+        sent = self.sent[table]
+        now = time.monotonic()
+        rows = [row for row in cur.fetchall() if row['id'] not in sent]
+        for row in rows:
+            sent[row['id']] = now
+        settled = [row_id for row_id, sent_at in sent.items() if now - sent_at >= STREAM_LOOKBACK]
+        if settled:
+            floor = self.floors[table] = max(settled)
+            for row_id in [row_id for row_id in sent if row_id <= floor]:
+                del sent[row_id]
+        return rows
+
+    def _broadcast(self, cur):
+        probes = self._read_new(cur, 'probe_cycles', 'ping_rtt as ping, ping_loss as packet_loss, ping_status as status, cmts_rtt as cmts_ping, cmts_loss as cmts_packet_loss')
+        modems = self._read_new(cur, 'modem_signals', 'downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power')
+        speeds = self._read_new(cur, 'speed_tests', 'download, upload')
+        if not (probes or modems or speeds):
+            return
+        with self.lock:
+            clients = list(self.clients.items())
+        events = {}
+        for client, node in clients:
+            if node not in events:
+                events[node] = self._event(probes, modems, speeds, node)
+            if events[node] is None:
+                continue
+            try:
+                client.put_nowait(events[node])
+            except queue.Full:
+                self.unsubscribe(client)
+
+    def _event(self, probes, modems, speeds, node):
+        """SSE `samples` event for one node: tests in the columnar
+        format of /api/network/data plus new speed tests"""
+        probes = [row for row in probes if row['node_id'] == node]
+        speeds = [row for row in speeds if row['node_id'] == node]
+        if not (probes or speeds):
+            return None
+        modem_rows = {(row['timestamp'], row['node_id']): row for row in modems}
+        tests = []
+        for row in probes:
+            utc_time = row['timestamp'].replace(tzinfo=pytz.UTC)
+            test = {
+                'timestamp': utc_time.astimezone(MOUNTAIN_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+                'epoch_ms': int(utc_time.timestamp() * 1000),
+            }
+            for field in PROBE_FIELDS:
+                test[field] = row[field]
+            modem = modem_rows.get((row['timestamp'], row['node_id']))
+            if modem:
+                test['modem_ds_snr'] = modem['downstream_avg_snr']
+                test['modem_ds_min_snr'] = modem['downstream_min_snr']
+                test['modem_ds_power'] = modem['downstream_avg_power']
+                test['modem_ds_max_power'] = modem['downstream_max_power']
+                test['modem_us_power'] = modem['upstream_avg_power']
+            tests.append(test)
+        speed_tests = [{
+            'timestamp': row['timestamp'].replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+            'download': row['download'],
+            'upload': row['upload']
+        } for row in speeds]
+        payload = {'tests': columnar_tests(tests, []), 'speed_tests': speed_tests}
+        return f"event: samples\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+broadcaster = SampleBroadcaster()
+
+@app.route('/api/network/stream')
+def stream():
+    """Server-Sent Events: a `samples` event whenever new rows are committed"""
+    node = request.args.get('node')
+    if not node:
+        with db_pool.connection() as conn:
+            node = default_node(conn)
+    client = broadcaster.subscribe(node)
+    if client is None:
+        # Dashboards fall back to polling
+        return jsonify({'error': 'Too many open streams'}), 503, {'Retry-After': '60'}
+
+    def events():
+        try:
+            yield "retry: 5000\n\n"
+            while broadcaster.is_subscribed(client):
+                try:
+                    yield client.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(client)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5002)
@@ -5,11 +5,19 @@ import time
 from datetime import datetime, timedelta
 from pathlib import Path
 import pytz
-import threading
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 from dotenv import load_dotenv
+from icmp_prober import IcmpProber, make_backend, summarize
+from sample_writer import SampleWriter, make_ingest_client
+from modem_scraper import ModemScraper
+from job_scheduler import JobScheduler
+from hf_sampler import HighFrequencySampler
+from collector_metrics import metrics, serve as serve_metrics
+import partitions
+import weather_tracker
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +26,22 @@ MOUNTAIN_TZ = pytz.timezone('America/Denver')
 
 # Configuration
 SPEED_TEST_INTERVAL = int(os.getenv('SPEED_TEST_INTERVAL', 3600))  # Default 1 hour
+PROBE_INTERVAL = float(os.getenv('PROBE_INTERVAL', 5))  # Seconds between probe cycles
+PROBE_BACKEND = os.getenv('PROBE_BACKEND', 'icmp')  # icmp, subprocess or fake
+PROBE_COUNT = 5  # Echo requests per target per cycle
+PROBE_TIMEOUT = 2.0  # Seconds to wait for the last reply
+CYCLE_MARGIN = 0.25  # Slack left in each interval for name resolution and bookkeeping
+MIN_PROBE_SPACING = 0.2  # Closest ping allows unprivileged requests to follow each other
+MIN_PROBE_TIMEOUT = 0.5
+MODEM_SCRAPE_INTERVAL = int(os.getenv('MODEM_SCRAPE_INTERVAL', 300))  # Default 5 minutes
+WEATHER_INTERVAL = int(os.getenv('WEATHER_INTERVAL', 0))  # Update weather in-process every N seconds; 0 = weather_tracker.py runs separately
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+PARTITION_MAINTENANCE_INTERVAL = 86400  # Create upcoming partitions and apply retention once a day
+
+# High-frequency mode: probe at HF_RATE_HZ and store one aggregate row per target every HF_WINDOW seconds
+HF_SAMPLING = os.getenv('HF_SAMPLING', '0') == '1'
+HF_RATE_HZ = float(os.getenv('HF_RATE_HZ', 10))
+HF_WINDOW = float(os.getenv('HF_WINDOW', 10))
 
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -27,9 +51,28 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD')
 }
 
+def probe_timing(interval=PROBE_INTERVAL, count=PROBE_COUNT, timeout=PROBE_TIMEOUT):
+    """(count, spacing, timeout) of a cycle's echo requests. Requests go out 1s
+    apart like ping's, closer together if the last one's reply timeout would
+    otherwise run past the interval: an overrunning cycle makes the scheduler
+    skip the next slot, which would halve the sample rate during loss. Short
+    intervals that can't fit `count` requests even at the tightest spacing
+    send fewer."""
+    budget = interval - CYCLE_MARGIN
+    count = max(1, min(count, int((budget - MIN_PROBE_TIMEOUT) / MIN_PROBE_SPACING + 1e-9) + 1))
+    spacing = max(MIN_PROBE_SPACING, min(1.0, (budget - timeout) / max(count - 1, 1)))
+    timeout = max(MIN_PROBE_TIMEOUT, min(timeout, budget - (count - 1) * spacing))
+    return count, spacing, timeout
+
+PROBE_CYCLE_COUNT, PROBE_SPACING, PROBE_REPLY_TIMEOUT = probe_timing()
+if (PROBE_CYCLE_COUNT - 1) * PROBE_SPACING + PROBE_REPLY_TIMEOUT > PROBE_INTERVAL - CYCLE_MARGIN:
+    print(f"PROBE_INTERVAL={PROBE_INTERVAL:g}s is too short for a {MIN_PROBE_TIMEOUT:g}s reply timeout; "
+          f"lossy cycles will skip the next slot")
+
 def ping_test(target='8.8.8.8'):
     try:
-        result = subprocess.run(['ping', '-c', '5', '-W', '2', target], 
+        result = subprocess.run(['ping', '-c', str(PROBE_CYCLE_COUNT), '-i', f'{PROBE_SPACING:.2f}',
+                                 '-W', f'{PROBE_REPLY_TIMEOUT:.2f}', target],
                               capture_output=True, text=True, timeout=15)
         if result.returncode == 0:
             lines = result.stdout.split('\n')
@@ -45,7 +88,81 @@ def ping_test(target='8.8.8.8'):
     except:
         return None, 100.0
 
+def classify_status(ping, packet_loss):
+    if ping is None:
+        return "FAILED"
+    if ping > 100:
+        return "HIGH_LATENCY"
+    if packet_loss > 0:
+        return "PACKET_LOSS"
+    return "OK"
+
+class SubprocessProber:
+    """Fallback prober that forks /bin/ping once per target, in parallel"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='probe')
+
+    def probe(self, targets):
+        futures = {name: self.executor.submit(ping_test, address) for name, address in targets}
+        results = {}
+        for name, future in futures.items():
+            ping, packet_loss = future.result()
+            stats = summarize([])
+            stats.update({'avg': ping, 'packet_loss': packet_loss})
+            results[name] = stats
+        return results
+
+def make_prober():
+    if PROBE_BACKEND == 'subprocess':
+        return SubprocessProber()
+    try:
+        return IcmpProber(make_backend('fake' if PROBE_BACKEND == 'fake' else 'socket'),
+                          count=PROBE_CYCLE_COUNT, interval=PROBE_SPACING, timeout=PROBE_REPLY_TIMEOUT)
+    except OSError as e:
+        print(f"ICMP socket unavailable ({e}), falling back to ping subprocess")
+        return SubprocessProber()
+
+class ProbeScheduler:
+    """Probe every target concurrently on a fixed cadence.
+
+    Cycles start on a fixed grid of `interval` seconds measured with the
+    monotonic clock. A cycle that overruns (e.g. a target timing out) skips
+    the missed slots instead of shifting every later cycle, and all results
+    of a cycle share the timestamp taken when the cycle started.
+    """
+
+    def __init__(self, targets, interval=PROBE_INTERVAL, prober=None):
+        self.targets = targets
+        self.interval = interval
+        self.prober = prober or make_prober()
+
+    def run_cycle(self):
+        with metrics.timed('probe'):
+            return self.prober.probe(self.targets)
+
+    def cycles(self):
+        next_cycle = time.monotonic()
+        while True:
+            timestamp_dt = datetime.now(MOUNTAIN_TZ)
+            yield timestamp_dt, self.run_cycle()
+
+            next_cycle += self.interval
+            now = time.monotonic()
+            if now > next_cycle:
+                # Overran one or more slots - realign to the grid
+                missed = int((now - next_cycle) // self.interval) + 1
+                next_cycle += missed * self.interval
+            time.sleep(max(0, next_cycle - time.monotonic()))
+
 def speed_test():
+    with metrics.timed('speed_test'):
+        download, upload = _run_speedtest()
+    if download is None:
+        metrics.fail('speed_test')
+    return download, upload
+
+def _run_speedtest():
     try:
         result = subprocess.run(['speedtest', '--accept-license', '--accept-gdpr', '--format=json'], 
                               capture_output=True, text=True, timeout=120)
@@ -58,216 +175,150 @@ def speed_test():
     except:
         return None, None
 
+# All measurement inserts go through this buffer; started in main()
+writer = SampleWriter(DB_CONFIG, ingest=make_ingest_client())
+
+# Bounded worker pool for speed tests, modem scrapes and weather updates
+jobs = JobScheduler(max_workers=JOB_WORKERS)
+
+# One authenticated session to the modem, reused across scrapes
+modem_scraper = ModemScraper()
+
+# Last (timestamp, uptime_seconds) seen from the modem, for restart detection
+last_uptime = {'timestamp': None, 'uptime_seconds': None}
+
+# Column group written to probe_cycles for every target: (column suffix, stats key)
+TARGET_FIELDS = (('rtt', 'avg'), ('loss', 'packet_loss'), ('status', None), ('min', 'min'), ('max', 'max'), ('jitter', 'jitter'),
+                 ('out_of_order', 'out_of_order'), ('rtts', 'rtts'), ('samples', 'sent'), ('p50', 'p50'), ('p95', 'p95'), ('p99', 'p99'),
+                 ('sketch_keys', 'sketch_keys'), ('sketch_counts', 'sketch_counts'))
+# Previous cumulative codeword counters, for per-interval deltas
+last_codewords = {'timestamp': None, 'total': None, 'channels': {}}
+
+MODEM_COLUMNS = ('timestamp', 'downstream_avg_snr', 'downstream_min_snr', 'downstream_avg_power', 'downstream_max_power', 'upstream_avg_power', 'correctable_codewords', 'uncorrectable_codewords', 'worst_channel_id', 'worst_channel_correctable', 'worst_channel_uncorrectable', 'uptime_seconds', 'correctable_delta', 'uncorrectable_delta', 'correctable_rate', 'uncorrectable_rate', 'interval_seconds')
+# One channel_scrapes row per scrape; each array is ordered by channel_ids
+CHANNEL_COLUMNS = ('timestamp', 'channel_ids', 'correctable', 'uncorrectable', 'correctable_delta', 'uncorrectable_delta', 'interval_seconds')
+
 def get_db(retries=30, delay=2):
     for attempt in range(retries):
         try:
             return psycopg2.connect(**DB_CONFIG)
         except psycopg2.OperationalError:
+            metrics.inc('collector_db_connect_failures', 'Failed get_db() connection attempts.')
             if attempt < retries - 1:
                 print(f"DB connection failed (attempt {attempt + 1}/{retries}), retrying in {delay}s...")
                 time.sleep(delay)
             else:
                 raise
 
-def insert_ping(timestamp, ping, packet_loss, status):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO ping_tests (timestamp, ping, packet_loss, status) VALUES (%s, %s, %s, %s)",
-        (timestamp, ping, packet_loss, status)
-    )
-    conn.commit()
-    conn.close()
+def insert_probe_cycle(timestamp, results, statuses):
+    """Queue one probe_cycles row holding every target's results"""
+    columns = ['timestamp']
+    row = [timestamp]
+    for name, stats in results.items():
+        for suffix, key in TARGET_FIELDS:
+            columns.append(f'{name}_{suffix}')
+            if suffix == 'status':
+                row.append(statuses[name])
+            elif suffix == 'rtts':
+                row.append(stats['rtts'] or None)
+            else:
+                row.append(stats[key])
+    writer.add('probe_cycles', columns, row)
+
+def detect_restart(timestamp, uptime_seconds):
+    """Return the approximate restart time if uptime shows the modem restarted
+    since the previous reading, otherwise None"""
+    prev_timestamp, prev_uptime = last_uptime['timestamp'], last_uptime['uptime_seconds']
+    last_uptime['timestamp'], last_uptime['uptime_seconds'] = timestamp, uptime_seconds
+    if prev_timestamp is None:
+        return None
+    time_diff = (timestamp - prev_timestamp).total_seconds()
+    # If uptime went backwards or didn't increase proportionally, it's a restart
+    if uptime_seconds < prev_uptime or (uptime_seconds - prev_uptime) < (time_diff * 0.5):
+        return timestamp - timedelta(seconds=uptime_seconds)
+    return None
+
+def counter_delta(prev, curr, restarted):
+    """Errors counted since the previous reading. The modem zeroes its
+    counters on restart, so after a restart (or any counter that went
+    backwards) everything counted so far is new."""
+    if prev is None or curr is None:
+        return None
+    if restarted or curr < prev:
+        return curr
+    return curr - prev
+
+def codeword_interval(timestamp, uptime_seconds, restarted):
+    """Seconds the deltas were accumulated over, or None for the first reading"""
+    if last_codewords['timestamp'] is None:
+        return None
+    elapsed = (timestamp - last_codewords['timestamp']).total_seconds()
+    if restarted and uptime_seconds is not None:
+        elapsed = min(elapsed, uptime_seconds)
+    return elapsed if elapsed > 0 else None
+
+def rate(delta, interval):
+    return round(delta / interval, 4) if delta is not None and interval else None
+
+def packed(values):
+    """Array column value, or NULL when no channel has a value (an all-NULL
+    list has no element type to cast from)"""
+    return values if any(v is not None for v in values) else None
 
 def insert_modem_signal(timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power, correctable=None, uncorrectable=None, worst_ch_id=None, worst_ch_corr=None, worst_ch_uncorr=None, channel_data=None, uptime_seconds=None):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO modem_signals (timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power, correctable_codewords, uncorrectable_codewords, worst_channel_id, worst_channel_correctable, worst_channel_uncorrectable, uptime_seconds) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-        (timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power, correctable, uncorrectable, worst_ch_id, worst_ch_corr, worst_ch_uncorr, uptime_seconds)
-    )
+    restart_time = detect_restart(timestamp, uptime_seconds) if uptime_seconds is not None else None
+    if restart_time:
+        writer.add('modem_restarts', ('timestamp', 'detected_at', 'uptime_seconds'), (restart_time, timestamp, uptime_seconds))
+        print(f"Modem restart detected! Restarted at ~{restart_time}, uptime now: {uptime_seconds}s")
+    restarted = restart_time is not None
+    interval = codeword_interval(timestamp, uptime_seconds, restarted)
     
-    # Detect restart: if uptime decreased or is very small compared to time since last reading
-    if uptime_seconds is not None:
-        cur.execute("SELECT timestamp, uptime_seconds FROM modem_signals WHERE uptime_seconds IS NOT NULL ORDER BY timestamp DESC LIMIT 1 OFFSET 1")
-        prev = cur.fetchone()
-        if prev:
-            prev_timestamp, prev_uptime = prev
-            # Make prev_timestamp timezone-aware if it isn't
-            if prev_timestamp.tzinfo is None:
-                prev_timestamp = MOUNTAIN_TZ.localize(prev_timestamp)
-            time_diff = (timestamp - prev_timestamp).total_seconds()
-            # If uptime went backwards or didn't increase proportionally, it's a restart
-            if uptime_seconds < prev_uptime or (uptime_seconds - prev_uptime) < (time_diff * 0.5):
-                # Calculate approximate restart time
-                restart_time = timestamp - timedelta(seconds=uptime_seconds)
-                cur.execute(
-                    "INSERT INTO modem_restarts (timestamp, detected_at, uptime_seconds) VALUES (%s, %s, %s)",
-                    (restart_time, timestamp, uptime_seconds)
-                )
-                print(f"Modem restart detected! Restarted at ~{restart_time}, uptime now: {uptime_seconds}s")
+    prev_corr, prev_uncorr = last_codewords['total'] or (None, None)
+    corr_delta = counter_delta(prev_corr, correctable, restarted) if interval else None
+    uncorr_delta = counter_delta(prev_uncorr, uncorrectable, restarted) if interval else None
+    writer.add('modem_signals', MODEM_COLUMNS, (
+        timestamp, downstream_avg_snr, downstream_min_snr, downstream_avg_power, downstream_max_power, upstream_avg_power,
+        correctable, uncorrectable, worst_ch_id, worst_ch_corr, worst_ch_uncorr, uptime_seconds,
+        corr_delta, uncorr_delta, rate(corr_delta, interval), rate(uncorr_delta, interval), interval
+    ))
     
-    # Insert per-channel data
-    if channel_data:
-        for ch_id, corr, uncorr in channel_data:
-            cur.execute(
-                "INSERT INTO channel_codewords (timestamp, channel_id, correctable, uncorrectable) VALUES (%s, %s, %s, %s)",
-                (timestamp, ch_id, corr, uncorr)
-            )
+    # All channels go into one row, batched into the same flush as the summary row
+    prev_channels = last_codewords['channels']
+    channels = sorted(channel_data or [])
+    if channels:
+        corr_deltas, uncorr_deltas = [], []
+        for ch_id, corr, uncorr in channels:
+            prev_ch_corr, prev_ch_uncorr = prev_channels.get(ch_id, (None, None))
+            corr_deltas.append(counter_delta(prev_ch_corr, corr, restarted) if interval else None)
+            uncorr_deltas.append(counter_delta(prev_ch_uncorr, uncorr, restarted) if interval else None)
+        writer.add('channel_scrapes', CHANNEL_COLUMNS, (
+            timestamp, [ch[0] for ch in channels], packed([ch[1] for ch in channels]), packed([ch[2] for ch in channels]),
+            packed(corr_deltas), packed(uncorr_deltas), interval
+        ))
     
-    conn.commit()
-    conn.close()
+    if correctable is not None:
+        last_codewords['timestamp'] = timestamp
+        last_codewords['total'] = (correctable, uncorrectable)
+        last_codewords['channels'] = {ch_id: (corr, uncorr) for ch_id, corr, uncorr in channel_data or []}
 
 def get_modem_signals():
     """Scrape modem signal data from XB8"""
     try:
-        import requests
-        from bs4 import BeautifulSoup
-        import re
-        
-        session = requests.Session()
-        
-        # Login
-        login_data = {
-            'username': os.getenv('ROUTER_USERNAME', 'admin'), 
-            'password': os.getenv('ROUTER_PASSWORD')
-        }
-        router_url = os.getenv('ROUTER_URL', 'http://192.168.1.1')
-        session.post(f'{router_url}/check.jst', data=login_data, timeout=10)
-        
-        # Get page
-        page = session.get(f'{router_url}/network_setup.jst', timeout=10)
-        
-        soup = BeautifulSoup(page.text, 'html.parser')
-        text = soup.get_text()
-        lines = text.split('\n')
-        
-        data = {}
-        
-        # Parse downstream
-        for i, line in enumerate(lines):
-            if 'Channel Bonding Value' in line and i > 0 and 'Downstream' in lines[i-1]:
-                for j in range(i, min(i+30, len(lines))):
-                    if lines[j].strip() == 'SNR' and j+1 < len(lines):
-                        snrs = re.findall(r'([\d.]+)\s*dB', lines[j+1])
-                        if snrs:
-                            data['downstream_avg_snr'] = round(sum(map(float, snrs)) / len(snrs), 1)
-                            data['downstream_min_snr'] = round(min(map(float, snrs)), 1)
-                    if lines[j].strip() == 'Power Level' and j+1 < len(lines):
-                        powers = re.findall(r'([\d.]+)\s*dBmV', lines[j+1])
-                        if powers:
-                            data['downstream_avg_power'] = round(sum(map(float, powers)) / len(powers), 1)
-                            data['downstream_max_power'] = round(max(map(float, powers)), 1)
-                break
-        
-        # Parse upstream
-        for i, line in enumerate(lines):
-            if 'Channel Bonding Value' in line and i > 0 and 'Upstream' in lines[i-1]:
-                for j in range(i, min(i+30, len(lines))):
-                    if lines[j].strip() == 'Power Level' and j+1 < len(lines):
-                        powers = re.findall(r'([\d.]+)\s*dBmV', lines[j+1])
-                        if powers:
-                            data['upstream_avg_power'] = round(sum(map(float, powers)) / len(powers), 1)
-                        break
-                break
-        
-        # Parse codeword errors using regex on raw HTML (more reliable than BeautifulSoup)
-        # Find CM Error Codewords table
-        codewords_start = page.text.find('CM Error Codewords')
-        channel_ids = []
-        correctable_values = []
-        uncorrectable_values = []
-        
-        if codewords_start > 0:
-            table_section = page.text[codewords_start:codewords_start+10000]
-            
-            # Extract Channel IDs
-            ch_match = re.search(r'Channel ID</td>(.*?)</tr>', table_section, re.DOTALL)
-            if ch_match:
-                channel_ids = re.findall(r'<div class="netWidth">(\d+)</div>', ch_match.group(1))
-            
-            # Extract Correctable Codewords
-            corr_match = re.search(r'Correctable Codewords</td>(.*?)</tr>', table_section, re.DOTALL)
-            if corr_match:
-                correctable_values = re.findall(r'<div class="netWidth">(\d+)</div>', corr_match.group(1))
-            
-            # Extract Uncorrectable Codewords
-            uncorr_match = re.search(r'Uncorrectable Codewords</td>(.*?)</tr>', table_section, re.DOTALL)
-            if uncorr_match:
-                uncorrectable_values = re.findall(r'<div class="netWidth">(\d+)</div>', uncorr_match.group(1))
-        
-        # Build channel data from parsed values
-        if channel_ids and correctable_values and uncorrectable_values:
-            total_corr = 0
-            total_uncorr = 0
-            channel_data = []
-            max_corr = 0
-            worst_ch_id = None
-            worst_ch_corr = 0
-            worst_ch_uncorr = 0
-            
-            for i in range(min(len(channel_ids), len(correctable_values), len(uncorrectable_values))):
-                ch_id_int = int(channel_ids[i])
-                corr_int = int(correctable_values[i])
-                uncorr_int = int(uncorrectable_values[i])
-                
-                total_corr += corr_int
-                total_uncorr += uncorr_int
-                channel_data.append((ch_id_int, corr_int, uncorr_int))
-                
-                if corr_int > max_corr:
-                    max_corr = corr_int
-                    worst_ch_id = ch_id_int
-                    worst_ch_corr = corr_int
-                    worst_ch_uncorr = uncorr_int
-            
-            data['correctable_codewords'] = total_corr
-            data['uncorrectable_codewords'] = total_uncorr
-            data['channel_data'] = channel_data
-            data['worst_channel_id'] = worst_ch_id
-            data['worst_channel_correctable'] = worst_ch_corr
-            data['worst_channel_uncorrectable'] = worst_ch_uncorr
-        
-        # Extract System Uptime
-        uptime_match = re.search(r'System Uptime:</span>\s*<span[^>]*>\s*(\d+)\s*days?\s*(\d+)h:\s*(\d+)m:\s*(\d+)s', page.text, re.IGNORECASE)
-        if uptime_match:
-            days = int(uptime_match.group(1))
-            hours = int(uptime_match.group(2))
-            minutes = int(uptime_match.group(3))
-            seconds = int(uptime_match.group(4))
-            data['uptime_seconds'] = days * 86400 + hours * 3600 + minutes * 60 + seconds
-        
-        return data
+        with metrics.timed('modem_scrape'):
+            return modem_scraper.scrape()
     except Exception as e:
         print(f"Error getting modem signals: {e}")
         return None
 
-def insert_cmts_ping(timestamp, ping, packet_loss, status):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO cmts_tests (timestamp, ping, packet_loss, status) VALUES (%s, %s, %s, %s)",
-        (timestamp, ping, packet_loss, status)
-    )
-    conn.commit()
-    conn.close()
-
 def insert_speed(timestamp, download, upload):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO speed_tests (timestamp, download, upload) VALUES (%s, %s, %s)",
-        (timestamp, download, upload)
-    )
-    conn.commit()
-    conn.close()
+    writer.add('speed_tests', ('timestamp', 'download', 'upload'), (timestamp, download, upload))
 
 def load_data():
     conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     # Get all ping tests
-    cur.execute("SELECT timestamp, ping, packet_loss, status FROM ping_tests ORDER BY timestamp")
+    cur.execute("SELECT timestamp, ping_rtt as ping, ping_loss as packet_loss, ping_status as status FROM probe_cycles ORDER BY timestamp")
     ping_tests = cur.fetchall()
     
     # Get all speed tests
@@ -315,102 +366,167 @@ def speed_test_async(timestamp):
     except Exception as e:
         print(f"[{timestamp}] Speed test thread error: {e}")
 
-def main():
-    print("Network monitor started")
+def modem_scrape_job(timestamp_dt):
+    """Scrape the modem and queue its rows, stamped with the probe cycle's time"""
+    timestamp = timestamp_dt.strftime('%Y-%m-%d %H:%M:%S')
+    modem_data = get_modem_signals()
+    if modem_data:
+        insert_modem_signal(
+            timestamp_dt,
+            modem_data.get('downstream_avg_snr'),
+            modem_data.get('downstream_min_snr'),
+            modem_data.get('downstream_avg_power'),
+            modem_data.get('downstream_max_power'),
+            modem_data.get('upstream_avg_power'),
+            modem_data.get('correctable_codewords'),
+            modem_data.get('uncorrectable_codewords'),
+            modem_data.get('worst_channel_id'),
+            modem_data.get('worst_channel_correctable'),
+            modem_data.get('worst_channel_uncorrectable'),
+            modem_data.get('channel_data'),
+            modem_data.get('uptime_seconds')
+        )
+        uptime_str = f" | Uptime: {modem_data.get('uptime_seconds')}s" if modem_data.get('uptime_seconds') else ""
+        print(f"[{timestamp}] Modem: DS SNR={modem_data.get('downstream_avg_snr')}dB US Pwr={modem_data.get('upstream_avg_power')}dBmV{uptime_str} | Total Errors: C={modem_data.get('correctable_codewords')} U={modem_data.get('uncorrectable_codewords')} | Worst Ch{modem_data.get('worst_channel_id')}: C={modem_data.get('worst_channel_correctable')} U={modem_data.get('worst_channel_uncorrectable')} | Saved {len(modem_data.get('channel_data', []))} channels")
+
+def partition_maintenance_job():
+    conn = get_db(retries=1)
+    try:
+        partitions.maintain(conn)
+    finally:
+        conn.close()
+
+def log_job_stats():
+    stats = jobs.stats()
+    if stats:
+        parts = [f"{name} runs={s['runs']} failed={s['failures']} skipped={s['skipped']} last={s['last_duration']:.1f}s" if s['last_duration'] is not None
+                 else f"{name} running" for name, s in stats.items()]
+        print(f"Jobs: queue depth {jobs.queue_depth()} | " + " | ".join(parts))
+
+def load_schedule_state():
+    """Return (last modem scrape, last speed test) times from the database and
+    seed restart detection. Falls back to defaults when the database is down
+    so probing can start without waiting for it."""
+    last_modem_scrape = datetime.now(MOUNTAIN_TZ) - timedelta(minutes=10)
+    last_speed_test_time = datetime.now(MOUNTAIN_TZ) - timedelta(minutes=20)
+    if writer.ingest:
+        # Remote collectors have no database connection of their own
+        print(f"Pushing samples to {writer.ingest.url} as node {writer.node_id}")
+        return last_modem_scrape, last_speed_test_time
+    try:
+        conn = get_db(retries=1)
+    except psycopg2.OperationalError as e:
+        print(f"Database unavailable at startup, samples will be spooled: {e}")
+        return last_modem_scrape, last_speed_test_time
     
-    # Track last modem scrape time
-    conn = get_db()
     cur = conn.cursor()
-    cur.execute("SELECT COALESCE(MAX(timestamp), '1970-01-01') FROM modem_signals")
+    cur.execute("SELECT MAX(timestamp) FROM modem_signals WHERE node_id = %s", (writer.node_id,))
     last_scrape = cur.fetchone()[0]
-    conn.close()
+    if last_scrape:
+        last_modem_scrape = last_scrape.replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ)
     
-    if isinstance(last_scrape, str):
-        last_modem_scrape = datetime.strptime(last_scrape, '%Y-%m-%d %H:%M:%S').replace(tzinfo=MOUNTAIN_TZ)
-    else:
-        last_modem_scrape = last_scrape.replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ) if last_scrape.year > 1970 else datetime.now(MOUNTAIN_TZ) - timedelta(minutes=10)
+    cur.execute("SELECT MAX(timestamp) FROM speed_tests WHERE node_id = %s", (writer.node_id,))
+    last_speed_test = cur.fetchone()[0]
+    if last_speed_test:
+        last_speed_test_time = last_speed_test.replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ)
     
-    print(f"Last modem scrape: {last_modem_scrape}")
+    # Seed restart detection with the last uptime reading
+    cur.execute("SELECT timestamp, uptime_seconds FROM modem_signals WHERE node_id = %s AND uptime_seconds IS NOT NULL ORDER BY timestamp DESC LIMIT 1", (writer.node_id,))
+    prev = cur.fetchone()
+    if prev:
+        last_uptime['timestamp'] = prev[0].replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ)
+        last_uptime['uptime_seconds'] = prev[1]
     
-    # Track last speed test time separately
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT COALESCE(MAX(timestamp), '1970-01-01') FROM speed_tests")
-    last_speed_test = cur.fetchone()[0]
+    # Seed codeword deltas with the last scrape's counters
+    cur.execute("SELECT timestamp, correctable_codewords, uncorrectable_codewords FROM modem_signals WHERE node_id = %s AND correctable_codewords IS NOT NULL ORDER BY timestamp DESC LIMIT 1", (writer.node_id,))
+    prev = cur.fetchone()
+    if prev:
+        last_codewords['timestamp'] = prev[0].replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ)
+        last_codewords['total'] = (int(prev[1]), int(prev[2]))
+        cur.execute("SELECT channel_ids, correctable, uncorrectable FROM channel_scrapes WHERE node_id = %s ORDER BY timestamp DESC LIMIT 1", (writer.node_id,))
+        scrape = cur.fetchone()
+        if scrape and scrape[1] and scrape[2]:
+            last_codewords['channels'] = {ch_id: (corr, uncorr) for ch_id, corr, uncorr in zip(*scrape) if corr is not None}
     conn.close()
+    return last_modem_scrape, last_speed_test_time
+
+def main():
+    print("Network monitor started")
+    
+    last_modem_scrape, last_speed_test_time = load_schedule_state()
+    print(f"Last modem scrape: {last_modem_scrape}")
+    
+    writer.start()
+    serve_metrics()
+    metrics.gauge('collector_writer_pending_rows', 'Rows buffered and not yet flushed.', lambda: {'': writer.pending_rows})
+    metrics.gauge('collector_spool_bytes', 'Size of the local spool file.', lambda: {'': len(writer.spool)})
+    metrics.gauge('collector_job_queue_depth', 'Background jobs submitted but not started.', lambda: {'': jobs.queue_depth()})
+    metrics.counter('collector_job_skipped', 'Job submissions skipped because the job was still active.',
+                    lambda: {f'job="{name}"': s['skipped'] for name, s in jobs.stats().items()})
+    last_weather_update = None
+    last_partition_maintenance = None
     
-    if isinstance(last_speed_test, str):
-        last_speed_test_time = datetime.strptime(last_speed_test, '%Y-%m-%d %H:%M:%S').replace(tzinfo=MOUNTAIN_TZ)
-    else:
-        last_speed_test_time = last_speed_test.replace(tzinfo=pytz.UTC).astimezone(MOUNTAIN_TZ) if last_speed_test.year > 1970 else datetime.now(MOUNTAIN_TZ) - timedelta(minutes=20)
+    # Probe targets concurrently so both are measured at the same moment
+    targets = [
+        ('ping', os.getenv('PING_TARGET', '8.8.8.8')),
+        ('cmts', os.getenv('CMTS_TARGET')),
+    ]
+    scheduler = None
+    if HF_SAMPLING and PROBE_BACKEND == 'subprocess':
+        print("HF_SAMPLING needs an ICMP socket, ignoring it with PROBE_BACKEND=subprocess")
+    elif HF_SAMPLING:
+        try:
+            backend = make_backend('fake' if PROBE_BACKEND == 'fake' else 'socket')
+            scheduler = HighFrequencySampler(targets, backend, rate_hz=HF_RATE_HZ, window=HF_WINDOW, tz=MOUNTAIN_TZ)
+            print(f"Probing {', '.join(str(t) for _, t in targets)} at {HF_RATE_HZ:g} Hz, aggregating every {HF_WINDOW:g}s")
+        except OSError as e:
+            print(f"ICMP socket unavailable ({e}), high-frequency sampling disabled")
+    if scheduler is None:
+        scheduler = ProbeScheduler(targets)
+        print(f"Probing {', '.join(str(t) for _, t in targets)} every {scheduler.interval:g}s")
     
-    while True:
-        timestamp_dt = datetime.now(MOUNTAIN_TZ)
+    for timestamp_dt, results in scheduler.cycles():
+        loop_start = time.perf_counter()
         timestamp = timestamp_dt.strftime('%Y-%m-%d %H:%M:%S')
         
-        # Ping primary target
-        ping_target = os.getenv('PING_TARGET', '8.8.8.8')
-        ping, packet_loss = ping_test(ping_target)
-        status = "OK"
-        if ping is None:
-            status = "FAILED"
-        elif ping > 100:
-            status = "HIGH_LATENCY"
-        elif packet_loss > 0:
-            status = "PACKET_LOSS"
-        insert_ping(timestamp_dt, ping, packet_loss, status)
+        statuses = {name: classify_status(stats['avg'], stats['packet_loss']) for name, stats in results.items()}
+        insert_probe_cycle(timestamp_dt, results, statuses)
         
-        # Ping CMTS (first hop)
-        cmts_target = os.getenv('CMTS_TARGET')
-        cmts_ping, cmts_packet_loss = ping_test(cmts_target)
-        cmts_status = "OK"
-        if cmts_ping is None:
-            cmts_status = "FAILED"
-        elif cmts_ping > 100:
-            cmts_status = "HIGH_LATENCY"
-        elif cmts_packet_loss > 0:
-            cmts_status = "PACKET_LOSS"
-        insert_cmts_ping(timestamp_dt, cmts_ping, cmts_packet_loss, cmts_status)
+        # Primary target and CMTS (first hop)
+        ping, packet_loss, status = results['ping']['avg'], results['ping']['packet_loss'], statuses['ping']
+        cmts_ping, cmts_packet_loss = results['cmts']['avg'], results['cmts']['packet_loss']
         
-        # Speed test every SPEED_TEST_INTERVAL seconds, modem signals every 5 minutes
+        # Slow jobs run on the scheduler's worker pool so the probe cadence never stalls
         time_since_last_scrape = (timestamp_dt - last_modem_scrape).total_seconds()
         time_since_last_speed_test = (timestamp_dt - last_speed_test_time).total_seconds()
         
         if time_since_last_speed_test >= SPEED_TEST_INTERVAL:
-            # Start speed test in background thread
-            print(f"[{timestamp}] Triggering speed test (last test was {time_since_last_speed_test:.0f}s ago)")
-            thread = threading.Thread(target=speed_test_async, args=(timestamp_dt,))
-            thread.daemon = True
-            thread.start()
+            if jobs.submit('speed_test', speed_test_async, timestamp_dt):
+                print(f"[{timestamp}] Triggering speed test (last test was {time_since_last_speed_test:.0f}s ago)")
             last_speed_test_time = timestamp_dt
         
-        if time_since_last_scrape >= 300:  # 5 minutes = 300 seconds
-            # Get modem signals
-            modem_data = get_modem_signals()
-            if modem_data:
-                insert_modem_signal(
-                    timestamp_dt,
-                    modem_data.get('downstream_avg_snr'),
-                    modem_data.get('downstream_min_snr'),
-                    modem_data.get('downstream_avg_power'),
-                    modem_data.get('downstream_max_power'),
-                    modem_data.get('upstream_avg_power'),
-                    modem_data.get('correctable_codewords'),
-                    modem_data.get('uncorrectable_codewords'),
-                    modem_data.get('worst_channel_id'),
-                    modem_data.get('worst_channel_correctable'),
-                    modem_data.get('worst_channel_uncorrectable'),
-                    modem_data.get('channel_data'),
-                    modem_data.get('uptime_seconds')
-                )
-                uptime_str = f" | Uptime: {modem_data.get('uptime_seconds')}s" if modem_data.get('uptime_seconds') else ""
-                print(f"[{timestamp}] Modem: DS SNR={modem_data.get('downstream_avg_snr')}dB US Pwr={modem_data.get('upstream_avg_power')}dBmV{uptime_str} | Total Errors: C={modem_data.get('correctable_codewords')} U={modem_data.get('uncorrectable_codewords')} | Worst Ch{modem_data.get('worst_channel_id')}: C={modem_data.get('worst_channel_correctable')} U={modem_data.get('worst_channel_uncorrectable')} | Saved {len(modem_data.get('channel_data', []))} channels")
-            
+        if time_since_last_scrape >= MODEM_SCRAPE_INTERVAL:
+            jobs.submit('modem_scrape', modem_scrape_job, timestamp_dt)
             last_modem_scrape = timestamp_dt
+            log_job_stats()
         
-        print(f"[{timestamp}] Google: {ping}ms/{packet_loss}% | CMTS: {cmts_ping}ms/{cmts_packet_loss}% | Status: {status}")
+        if WEATHER_INTERVAL and (last_weather_update is None or time.monotonic() - last_weather_update >= WEATHER_INTERVAL):
+            jobs.submit('weather', weather_tracker.update_recent_weather)
+            last_weather_update = time.monotonic()
         
-        # No sleep - ping test itself provides the delay
+        # Remote collectors have no database; the central collector keeps partitions ahead
+        if not writer.ingest and (last_partition_maintenance is None or time.monotonic() - last_partition_maintenance >= PARTITION_MAINTENANCE_INTERVAL):
+            jobs.submit('partitions', partition_maintenance_job)
+            last_partition_maintenance = time.monotonic()
+        
+        print(f"[{timestamp}] Google: {ping}ms/{packet_loss}% jitter {results['ping']['jitter']}ms | CMTS: {cmts_ping}ms/{cmts_packet_loss}% jitter {results['cmts']['jitter']}ms | Status: {status}")
+        # Loop bookkeeping only - probe time is recorded separately
+        metrics.stage('loop').observe(time.perf_counter() - loop_start)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        jobs.shutdown()
+        # Don't drop samples still waiting in the buffer
+        writer.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Time-range partitioning for the measurement tables.
+
+convert() turns a plain table into a table partitioned by RANGE ("timestamp")
+with one partition per month (or week) and a default partition as a safety
+net, copying the existing rows across. ensure_partitions() creates the
+partitions for the next few periods ahead of time, and drop_expired()
+implements retention by dropping whole partitions instead of DELETEing rows.
+
+Partition bounds are in UTC, like the stored timestamps.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+
+PARTITIONED_TABLES = ('probe_cycles', 'ping_tests', 'cmts_tests', 'modem_signals', 'channel_scrapes')
+PARTITION_INTERVAL = os.getenv('PARTITION_INTERVAL', 'month')     # month or week
+PARTITION_PREMAKE = int(os.getenv('PARTITION_PREMAKE', 2))        # Future periods to create ahead of time
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 0))              # Drop partitions older than this; 0 keeps everything
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def period_start(ts, interval=PARTITION_INTERVAL):
+    if interval == 'week':
+        day = ts - timedelta(days=ts.weekday())
+        return datetime(day.year, day.month, day.day)
+    return datetime(ts.year, ts.month, 1)
+
+
+def next_period(start, interval=PARTITION_INTERVAL):
+    if interval == 'week':
+        return start + timedelta(days=7)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def partition_name(table, start, interval=PARTITION_INTERVAL):
+    if interval == 'week':
+        year, week, _ = start.isocalendar()
+        return f"{table}_p{year}w{week:02d}"
+    return f"{table}_p{start:%Y_%m}"
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (f'public.{table}',))
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions(cur, table):
+    """[(name, lower, upper)] for the table's range partitions, oldest first"""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (f'public.{table}',))
+    result = []
+    for name, bound in cur.fetchall():
+        match = BOUND_RE.search(bound or '')
+        if match:
+            result.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(result, key=lambda p: p[1])
+
+
+def create_partition(cur, table, start, end, name):
+    """Create and attach one partition, moving any rows for its range out of
+    the default partition first (attaching would fail otherwise)"""
+    default = f"{table}_default"
+    cur.execute(f"CREATE TABLE public.{name} (LIKE public.{table} INCLUDING DEFAULTS)")
+    cur.execute("SELECT to_regclass(%s)", (f'public.{default}',))
+    if cur.fetchone()[0]:
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM public.{default} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *
+            )
+            INSERT INTO public.{name} SELECT * FROM moved
+        """, (start, end))
+    cur.execute(f"ALTER TABLE public.{table} ATTACH PARTITION public.{name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+
+
+def ensure_partitions(conn, tables=PARTITIONED_TABLES, ahead=PARTITION_PREMAKE, interval=PARTITION_INTERVAL, now=None):
+    """Create partitions from the current period through `ahead` periods
+    ahead. Returns the names created."""
+    now = now or datetime.utcnow()
+    created = []
+    with conn.cursor() as cur:
+        for table in tables:
+            if not is_partitioned(cur, table):
+                continue
+            existing = partitions(cur, table)
+            start = period_start(now, interval)
+            for _ in range(ahead + 1):
+                end = next_period(start, interval)
+                # Skip ranges already covered, e.g. after switching from monthly to weekly
+                if not any(lower < end and start < upper for _, lower, upper in existing):
+                    name = partition_name(table, start, interval)
+                    create_partition(cur, table, start, end, name)
+                    existing.append((name, start, end))
+                    created.append(name)
+                start = end
+    conn.commit()
+    return created
+
+
+def drop_expired(conn, retention_days=RETENTION_DAYS, tables=PARTITIONED_TABLES, now=None):
+    """Drop partitions that lie entirely before the retention cutoff. Returns
+    the names dropped."""
+    if not retention_days:
+        return []
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    dropped = []
+    with conn.cursor() as cur:
+        for table in tables:
+            if not is_partitioned(cur, table):
+                continue
+            for name, _, upper in partitions(cur, table):
+                if upper <= cutoff:
+                    cur.execute(f"DROP TABLE public.{name}")
+                    dropped.append(name)
+            cur.execute("SELECT to_regclass(%s)", (f'public.{table}_default',))
+            if cur.fetchone()[0]:
+                # Stragglers that landed outside every range are cheap to delete
+                cur.execute(f'DELETE FROM public.{table}_default WHERE "timestamp" < %s', (cutoff,))
+    conn.commit()
+    return dropped
+
+
+def maintain(conn):
+    """Daily upkeep: create upcoming partitions and apply retention"""
+    created = ensure_partitions(conn)
+    dropped = drop_expired(conn)
+    if created or dropped:
+        print(f"Partitions created: {', '.join(created) or 'none'} | dropped: {', '.join(dropped) or 'none'}")
+    return created, dropped
+
+
+def convert(conn, table, interval=PARTITION_INTERVAL, ahead=PARTITION_PREMAKE):
+    """Rebuild a plain table as a range-partitioned one, keeping its rows,
+    ids, sequence, indexes and triggers. Runs in one transaction; writers
+    block until it commits."""
+    with conn.cursor() as cur:
+        if is_partitioned(cur, table):
+            print(f"{table} is already partitioned")
+            return False
+        legacy = f"{table}_unpartitioned"
+        cur.execute(f"LOCK TABLE public.{table} IN ACCESS EXCLUSIVE MODE")
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%'", (table,))
+        index_defs = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal", (f'public.{table}',))
+        trigger_defs = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (f'public.{table}',))
+        sequence = cur.fetchone()[0]
+        cur.execute('SELECT MIN("timestamp"), COUNT(*) FROM public.' + table)
+        oldest, rows = cur.fetchone()
+
+        cur.execute(f"ALTER TABLE public.{table} RENAME TO {legacy}")
+        cur.execute(f'CREATE TABLE public.{table} (LIKE public.{legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ("timestamp")')
+        cur.execute(f"CREATE TABLE public.{table}_default PARTITION OF public.{table} DEFAULT")
+        start = period_start(oldest or datetime.utcnow(), interval)
+        last = period_start(datetime.utcnow(), interval)
+        for _ in range(ahead):
+            last = next_period(last, interval)
+        while start <= last:
+            end = next_period(start, interval)
+            cur.execute(f"CREATE TABLE public.{partition_name(table, start, interval)} PARTITION OF public.{table} FOR VALUES FROM (%s) TO (%s)", (start, end))
+            start = end
+
+        cur.execute(f"INSERT INTO public.{table} SELECT * FROM public.{legacy}")
+        if sequence:
+            # The sequence is owned by the old table and would be dropped with it
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY public.{table}.id")
+        cur.execute(f"DROP TABLE public.{legacy}")
+        # Unique constraints on a partitioned table must include the partition key
+        cur.execute(f'ALTER TABLE public.{table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, "timestamp")')
+        for index_def in index_defs:
+            cur.execute(index_def)
+        # Recreated after the copy so the rows already there don't fire them
+        for trigger_def in trigger_defs:
+            cur.execute(trigger_def)
+    conn.commit()
+    print(f"Partitioned {table}: {rows} rows by {interval}")
+    return True
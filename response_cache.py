@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""File-backed response cache shared by every API worker process.
+
+Entries are files in RESPONSE_CACHE_DIR named after a hash of their key.
+Callers put the data version (ingest watermark) in the key, so a new ingest
+simply makes new keys and old entries expire after RESPONSE_CACHE_TTL.
+
+fetch() is single-flight: a miss takes an exclusive flock on the key's lock
+file before computing, so concurrent misses for the same key in any worker
+or thread wait for the first one and then read its result.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'network-monitor-cache'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 300))  # Seconds an entry is kept; 0 disables the cache
+PRUNE_INTERVAL = 60  # Seconds between sweeps for expired entries, per process
+
+
+class ResponseCache:
+    def __init__(self, directory=RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.last_prune = 0
+        if ttl:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _read(self, path):
+        """(headers, body) of a live entry, or None"""
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                headers, _, body = f.read().partition(b'\n')
+        except FileNotFoundError:
+            return None
+        return json.loads(headers), body
+
+    def _write(self, path, headers, body):
+        # Write then rename so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(headers).encode() + b'\n' + body)
+        os.replace(tmp, path)
+
+    def fetch(self, key, compute):
+        """Return the cached (headers, body) for `key`, calling compute() to
+        produce it on a miss. Only one caller computes a given key at a time."""
+        if not self.ttl:
+            return compute()
+        path = self._path(key)
+        entry = self._read(path)
+        if entry:
+            return entry
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            os.utime(lock.fileno())  # Keep prune() from removing a lock in use
+            try:
+                # Another worker may have filled it while we waited for the lock
+                entry = self._read(path)
+                if entry:
+                    return entry
+                entry = compute()
+                self._write(path, *entry)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.prune()
+        return entry
+
+    def prune(self):
+        """Delete entries and lock files older than the TTL"""
+        now = time.time()
+        if now - self.last_prune < PRUNE_INTERVAL:
+            return
+        self.last_prune = now
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if now - entry.stat().st_mtime > self.ttl:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Keeps the 1-minute, 15-minute and 1-hour rollup tables (and the loss
+heatmap slices derived from the hourly probe rollups) up to date.
+
+Every ROLLUP_INTERVAL seconds the worker claims a batch of dirty
+(source, node, hour) entries recorded by the insert triggers from migration
+006 and recomputes the rollup buckets inside those hours from the raw rows.
+Claiming and recomputing happen in one transaction, so an hour that gets
+more rows while it is being processed is simply marked dirty again. An
+insert that is still open holds a lock on its dirty entry (migration 014),
+and claiming skips locked entries, so such an hour waits for the next pass.
+"""
+import os
+import time
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 5432)),
+    'database': os.getenv('DB_NAME', 'network_monitor'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+ROLLUP_INTERVAL = float(os.getenv('ROLLUP_INTERVAL', 10))   # Seconds between passes
+ROLLUP_BATCH_HOURS = int(os.getenv('ROLLUP_BATCH_HOURS', 200))  # Dirty hours claimed per transaction
+
+RESOLUTIONS = (('1m', '1 minute'), ('15m', '15 minutes'), ('1h', '1 hour'))
+PROBE_TARGETS = ('ping', 'cmts')  # Column groups of probe_cycles
+HEATMAP_TZ = 'America/Denver'  # Local time of the heatmap slices, as shown on the dashboard
+
+# Each query reads the raw rows of the claimed hours (joined as `d`) and upserts their buckets
+PROBE_ROLLUP_SQL = """
+    INSERT INTO {rollup} (node_id, target, bucket, samples, ping_count, ping_sum, ping_sumsq, ping_min, ping_max,
+                          loss_sum, loss_max, lossy, failed, high_latency, packet_loss)
+    SELECT t.node_id, %(target)s, date_bin(%(width)s::interval, t.timestamp, TIMESTAMP '2000-01-01') AS bucket,
+           COUNT(*), COUNT(*) FILTER (WHERE t.{target}_rtt > 0), SUM(t.{target}_rtt) FILTER (WHERE t.{target}_rtt > 0),
+           SUM(t.{target}_rtt * t.{target}_rtt) FILTER (WHERE t.{target}_rtt > 0), MIN(t.{target}_rtt), MAX(t.{target}_rtt),
+           SUM(t.{target}_loss), MAX(t.{target}_loss), COUNT(*) FILTER (WHERE t.{target}_loss > 0),
+           COUNT(*) FILTER (WHERE t.{target}_status = 'FAILED'), COUNT(*) FILTER (WHERE t.{target}_status = 'HIGH_LATENCY'),
+           COUNT(*) FILTER (WHERE t.{target}_status = 'PACKET_LOSS')
+    FROM {source} t
+    JOIN unnest(%(nodes)s::text[], %(hours)s::timestamp[]) AS d(node_id, hour)
+      ON t.node_id = d.node_id AND t.timestamp >= d.hour AND t.timestamp < d.hour + INTERVAL '1 hour'
+    WHERE t.{target}_loss IS NOT NULL
+    GROUP BY t.node_id, bucket
+    ON CONFLICT (node_id, target, bucket) DO UPDATE SET
+        samples = EXCLUDED.samples, ping_count = EXCLUDED.ping_count, ping_sum = EXCLUDED.ping_sum,
+        ping_sumsq = EXCLUDED.ping_sumsq, ping_min = EXCLUDED.ping_min, ping_max = EXCLUDED.ping_max, loss_sum = EXCLUDED.loss_sum,
+        loss_max = EXCLUDED.loss_max, lossy = EXCLUDED.lossy, failed = EXCLUDED.failed,
+        high_latency = EXCLUDED.high_latency, packet_loss = EXCLUDED.packet_loss
+"""
+
+# Latency sketches of the probe buckets just upserted: counts added up per sketch key
+SKETCH_ROLLUP_SQL = """
+    UPDATE {rollup} r SET sketch_keys = s.keys, sketch_counts = s.counts
+    FROM (
+        SELECT node_id, bucket, array_agg(key ORDER BY key) AS keys, array_agg(count ORDER BY key) AS counts
+        FROM (
+            SELECT t.node_id, date_bin(%(width)s::interval, t.timestamp, TIMESTAMP '2000-01-01') AS bucket, k.key, SUM(k.count)::int AS count
+            FROM {source} t
+            JOIN unnest(%(nodes)s::text[], %(hours)s::timestamp[]) AS d(node_id, hour)
+              ON t.node_id = d.node_id AND t.timestamp >= d.hour AND t.timestamp < d.hour + INTERVAL '1 hour'
+            CROSS JOIN LATERAL unnest(t.{target}_sketch_keys, t.{target}_sketch_counts) AS k(key, count)
+            GROUP BY t.node_id, bucket, k.key
+        ) keys
+        GROUP BY node_id, bucket
+    ) s
+    WHERE r.node_id = s.node_id AND r.bucket = s.bucket AND r.target = %(target)s
+"""
+
+MODEM_ROLLUP_SQL = """
+    INSERT INTO {rollup} (node_id, bucket, samples, downstream_avg_snr, downstream_min_snr, downstream_avg_power,
+                          downstream_max_power, upstream_avg_power, correctable_codewords, uncorrectable_codewords,
+                          correctable_delta, uncorrectable_delta)
+    SELECT t.node_id, date_bin(%(width)s::interval, t.timestamp, TIMESTAMP '2000-01-01') AS bucket, COUNT(*),
+           AVG(t.downstream_avg_snr), MIN(t.downstream_min_snr), AVG(t.downstream_avg_power), MAX(t.downstream_max_power),
+           AVG(t.upstream_avg_power), MAX(t.correctable_codewords), MAX(t.uncorrectable_codewords),
+           SUM(t.correctable_delta), SUM(t.uncorrectable_delta)
+    FROM {source} t
+    JOIN unnest(%(nodes)s::text[], %(hours)s::timestamp[]) AS d(node_id, hour)
+      ON t.node_id = d.node_id AND t.timestamp >= d.hour AND t.timestamp < d.hour + INTERVAL '1 hour'
+    GROUP BY t.node_id, bucket
+    ON CONFLICT (node_id, bucket) DO UPDATE SET
+        samples = EXCLUDED.samples, downstream_avg_snr = EXCLUDED.downstream_avg_snr,
+        downstream_min_snr = EXCLUDED.downstream_min_snr, downstream_avg_power = EXCLUDED.downstream_avg_power,
+        downstream_max_power = EXCLUDED.downstream_max_power, upstream_avg_power = EXCLUDED.upstream_avg_power,
+        correctable_codewords = EXCLUDED.correctable_codewords, uncorrectable_codewords = EXCLUDED.uncorrectable_codewords,
+        correctable_delta = EXCLUDED.correctable_delta, uncorrectable_delta = EXCLUDED.uncorrectable_delta
+"""
+
+CHANNEL_ROLLUP_SQL = """
+    INSERT INTO {rollup} (node_id, bucket, channel_id, correctable, uncorrectable, correctable_delta, uncorrectable_delta)
+    SELECT t.node_id, date_bin(%(width)s::interval, t.timestamp, TIMESTAMP '2000-01-01') AS bucket, ch.channel_id,
+           MAX(ch.correctable), MAX(ch.uncorrectable), SUM(ch.correctable_delta), SUM(ch.uncorrectable_delta)
+    FROM {source} t
+    JOIN unnest(%(nodes)s::text[], %(hours)s::timestamp[]) AS d(node_id, hour)
+      ON t.node_id = d.node_id AND t.timestamp >= d.hour AND t.timestamp < d.hour + INTERVAL '1 hour'
+    CROSS JOIN LATERAL unnest(t.channel_ids, t.correctable, t.uncorrectable, t.correctable_delta, t.uncorrectable_delta)
+        AS ch(channel_id, correctable, uncorrectable, correctable_delta, uncorrectable_delta)
+    GROUP BY t.node_id, bucket, ch.channel_id
+    ON CONFLICT (node_id, bucket, channel_id) DO UPDATE SET
+        correctable = EXCLUDED.correctable, uncorrectable = EXCLUDED.uncorrectable,
+        correctable_delta = EXCLUDED.correctable_delta, uncorrectable_delta = EXCLUDED.uncorrectable_delta
+"""
+
+# Heatmap slices of the claimed hours, copied from the freshly computed hourly ping rollups
+HEATMAP_SQL = """
+    INSERT INTO loss_heatmap (node_id, bucket, local_day, local_hour, samples, lossy, loss_sum)
+    SELECT r.node_id, r.bucket, (r.bucket AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s)::date,
+           EXTRACT(HOUR FROM r.bucket AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s), r.samples, r.lossy, r.loss_sum
+    FROM probe_rollup_1h r
+    JOIN unnest(%(nodes)s::text[], %(hours)s::timestamp[]) AS d(node_id, hour) ON r.node_id = d.node_id AND r.bucket = d.hour
+    WHERE r.target = 'ping'
+    ON CONFLICT (node_id, bucket) DO UPDATE SET
+        samples = EXCLUDED.samples, lossy = EXCLUDED.lossy, loss_sum = EXCLUDED.loss_sum
+"""
+
+SOURCES = {
+    'probe_cycles': ('probe_rollup', PROBE_ROLLUP_SQL),
+    'modem_signals': ('modem_rollup', MODEM_ROLLUP_SQL),
+    'channel_scrapes': ('channel_rollup', CHANNEL_ROLLUP_SQL),
+}
+
+
+def get_db(retries=30, delay=2):
+    for attempt in range(retries):
+        try:
+            return psycopg2.connect(**DB_CONFIG)
+        except psycopg2.OperationalError:
+            if attempt < retries - 1:
+                print(f"DB connection failed (attempt {attempt + 1}/{retries}), retrying in {delay}s...")
+                time.sleep(delay)
+            else:
+                raise
+
+
+def claim_dirty(cur, source, limit=ROLLUP_BATCH_HOURS):
+    """Remove up to `limit` dirty hours for `source` and return them as (nodes, hours)"""
+    cur.execute("""
+        DELETE FROM rollup_dirty WHERE (source, node_id, hour) IN (
+            SELECT source, node_id, hour FROM rollup_dirty WHERE source = %s
+            ORDER BY hour LIMIT %s FOR UPDATE SKIP LOCKED
+        )
+        RETURNING node_id, hour
+    """, (source, limit))
+    rows = cur.fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+def refresh_source(conn, source):
+    """Recompute one batch of dirty hours for `source`; returns hours processed"""
+    prefix, sql = SOURCES[source]
+    with conn.cursor() as cur:
+        nodes, hours = claim_dirty(cur, source)
+        if hours:
+            # probe_cycles is rolled up once per target column group
+            targets = PROBE_TARGETS if source == 'probe_cycles' else (None,)
+            for suffix, width in RESOLUTIONS:
+                for target in targets:
+                    params = {'target': target, 'width': width, 'nodes': nodes, 'hours': hours}
+                    cur.execute(sql.format(rollup=f'{prefix}_{suffix}', source=source, target=target), params)
+                    if source == 'probe_cycles':
+                        cur.execute(SKETCH_ROLLUP_SQL.format(rollup=f'{prefix}_{suffix}', source=source, target=target), params)
+            if source == 'probe_cycles':
+                cur.execute(HEATMAP_SQL, {'tz': HEATMAP_TZ, 'nodes': nodes, 'hours': hours})
+            # Long ranges read the rollups, so their ETags have to change too
+            cur.execute("SELECT bump_ingest_watermark(%s)", (nodes,))
+    conn.commit()
+    return len(hours)
+
+
+def refresh_all(conn):
+    """Work through every dirty hour; returns {source: hours processed}"""
+    processed = {}
+    for source in SOURCES:
+        total = 0
+        while True:
+            hours = refresh_source(conn, source)
+            total += hours
+            if hours < ROLLUP_BATCH_HOURS:
+                break
+        if total:
+            processed[source] = total
+    return processed
+
+
+def main():
+    print(f"Rollup worker started, refreshing every {ROLLUP_INTERVAL:g}s")
+    conn = None
+    while True:
+        try:
+            if conn is None or conn.closed:
+                conn = get_db()
+            start = time.monotonic()
+            processed = refresh_all(conn)
+            if processed:
+                summary = ', '.join(f"{source}={hours}h" for source, hours in processed.items())
+                print(f"Rolled up {summary} in {time.monotonic() - start:.2f}s")
+        except psycopg2.Error as e:
+            print(f"Rollup pass failed: {e}")
+            if conn is not None:
+                conn.close()
+            conn = None
+        time.sleep(ROLLUP_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
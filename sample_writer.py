@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Buffered, batched write path for collector samples.
+
+Rows are queued in memory per (table, columns) and written by a background
+thread with one multi-row INSERT per table and a single commit per flush,
+over a small pool of long-lived connections.
+
+If a flush fails because the database (or ingest endpoint) is unreachable,
+the batch is appended to a local spool file instead of being retried in
+memory. Once it is reachable again the spool is moved aside and replayed one
+batch per transaction. A batch the database rejects outright (bad data,
+HTTP 4xx) would fail on every retry, so it is moved to a dead-letter file
+next to the spool instead.
+
+With INGEST_URL set, batches are POSTed gzip-compressed to a central
+network_api instead of being written to PostgreSQL directly. Each batch
+carries a batch_id that stays the same across retries (it is spooled with
+the rows), so the server can drop replays it has already committed. Direct
+writes record their batch_id in ingest_batches the same way.
+"""
+import gzip
+import json
+import os
+import pickle
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+import psycopg2
+import requests
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from dotenv import load_dotenv
+from collector_metrics import metrics
+
+load_dotenv()
+
+FLUSH_MAX_ROWS = int(os.getenv('FLUSH_MAX_ROWS', 500))      # Flush once this many rows are queued
+FLUSH_INTERVAL = float(os.getenv('FLUSH_INTERVAL', 5))      # ...or once the oldest row is this old
+WRITER_POOL_SIZE = int(os.getenv('WRITER_POOL_SIZE', 2))
+SPOOL_PATH = os.getenv('SPOOL_PATH', 'collector.spool')
+SPOOL_RETRY_INTERVAL = float(os.getenv('SPOOL_RETRY_INTERVAL', 30))  # Seconds between DB retries while spooling
+NODE_ID = os.getenv('NODE_ID', 'local')
+INGEST_URL = os.getenv('INGEST_URL')        # e.g. http://central:5000/api/network/ingest
+INGEST_TOKEN = os.getenv('INGEST_TOKEN')
+
+# 4xx answers that are about the request's circumstances, not the batch:
+# auth/config problems and throttling. Every other 4xx rejects the batch.
+INGEST_RETRY_STATUSES = (401, 403, 404, 408, 429)
+
+RECORD_MAGIC = b'NMSP'
+RECORD_HEADER = struct.Struct('>4sII')  # magic, payload length, payload CRC-32
+
+
+class IngestError(Exception):
+    pass
+
+
+class BatchRejected(Exception):
+    """The ingest endpoint refused the batch itself; sending it again won't help"""
+
+
+def is_retryable(error):
+    """True if a failed delivery should be spooled and retried: the database
+    or ingest endpoint could not be reached, not a rejected batch"""
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError,
+                              requests.ConnectionError, requests.Timeout, IngestError))
+
+
+def encode_batch(batch_id, node_id, batch):
+    """Gzipped JSON body for POST /api/network/ingest. Datetimes travel as ISO
+    strings with their UTC offset, and each table lists the columns holding
+    them so the server can turn every one back into a timestamp."""
+    tables = []
+    for (table, columns), rows in batch.items():
+        datetimes = [column for i, column in enumerate(columns) if any(isinstance(row[i], datetime) for row in rows)]
+        tables.append({'table': table, 'columns': list(columns), 'datetime_columns': datetimes, 'rows': rows})
+    payload = {'batch_id': batch_id, 'node_id': node_id, 'tables': tables}
+    return gzip.compress(json.dumps(payload, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v)).encode())
+
+
+def utc_naive(value):
+    """Stored form of an ISO timestamp: naive UTC. Left as a string,
+    PostgreSQL would drop the offset when casting to timestamp without time
+    zone and keep the Mountain local time."""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def decode_batch(body):
+    """Inverse of encode_batch: (batch_id, node_id, {(table, columns): rows})"""
+    payload = json.loads(gzip.decompress(body))
+    batch = {}
+    for entry in payload['tables']:
+        columns = tuple(entry['columns'])
+        rows = [list(row) for row in entry['rows']]
+        if any(len(row) != len(columns) for row in rows):
+            raise ValueError(f"{entry['table']}: rows don't match the {len(columns)} columns")
+        for i in (columns.index(column) for column in entry['datetime_columns']):
+            for row in rows:
+                row[i] = utc_naive(row[i])
+        batch.setdefault((entry['table'], columns), []).extend(tuple(row) for row in rows)
+    return payload['batch_id'], payload['node_id'], batch
+
+
+class IngestClient:
+    def __init__(self, url, token=None, node_id=NODE_ID, timeout=15):
+        self.url = url
+        self.token = token
+        self.node_id = node_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, batch_id, batch):
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        response = self.session.post(self.url, data=encode_batch(batch_id, self.node_id, batch),
+                                     headers=headers, timeout=self.timeout)
+        if 400 <= response.status_code < 500 and response.status_code not in INGEST_RETRY_STATUSES:
+            raise BatchRejected(f"Ingest rejected the batch with HTTP {response.status_code}: {response.text[:200]}")
+        if response.status_code != 200:
+            raise IngestError(f"Ingest returned HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+
+def make_ingest_client():
+    """IngestClient for INGEST_URL, or None to write to PostgreSQL directly"""
+    return IngestClient(INGEST_URL, INGEST_TOKEN) if INGEST_URL else None
+
+
+class Spool:
+    """Append-only file of framed, pickled (batch_id, batch) records.
+
+    Each record carries a magic marker, its length and a CRC, so a record
+    torn by a crash mid-append is skipped and reading resyncs on the next
+    intact one instead of losing everything after it. For a replay the file
+    is renamed to `<path>.replay` first; records spooled during the replay
+    start a new file, and only the replayed one is deleted afterwards.
+    """
+
+    def __init__(self, path=SPOOL_PATH):
+        self.path = path
+        self.replay_path = path + '.replay'
+        self.rejected_path = path + '.rejected'
+
+    def __len__(self):
+        size = 0
+        for path in (self.path, self.replay_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def append(self, batch, batch_id=None, path=None):
+        payload = pickle.dumps((batch_id, batch), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(path or self.path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload)) + payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reject(self, batch, batch_id=None):
+        """Keep a batch the database refused, for inspection"""
+        self.append(batch, batch_id, self.rejected_path)
+
+    def records(self, path=None):
+        """Every intact (batch_id, batch) record in the file"""
+        try:
+            with open(path or self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        records = []
+        offset = 0
+        while True:
+            offset = data.find(RECORD_MAGIC, offset)
+            if offset < 0 or offset + RECORD_HEADER.size > len(data):
+                break
+            _, length, crc = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) == length and zlib.crc32(payload) == crc:
+                records.append(pickle.loads(payload))
+                offset = start + length
+            else:
+                # Torn or corrupt: look for the next record
+                offset += 1
+        return records
+
+    def take(self):
+        """Records to replay: those of an interrupted earlier replay, or else
+        the spool, moved aside so new records go to a fresh file"""
+        if not os.path.exists(self.replay_path):
+            try:
+                os.replace(self.path, self.replay_path)
+            except FileNotFoundError:
+                return []
+        return self.records(self.replay_path)
+
+    def replayed(self):
+        """Delete the file returned by take() once every record is delivered"""
+        try:
+            os.remove(self.replay_path)
+        except FileNotFoundError:
+            pass
+
+
+class SampleWriter:
+    def __init__(self, db_config, max_rows=FLUSH_MAX_ROWS, max_age=FLUSH_INTERVAL, pool_size=WRITER_POOL_SIZE, spool=None,
+                 node_id=NODE_ID, ingest=None):
+        self.db_config = db_config
+        self.node_id = node_id
+        self.ingest = ingest
+        self.spool = spool if spool is not None else Spool()
+        self.retry_at = 0
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.pool_size = pool_size
+        self.pool = None
+        self.pending = {}  # (table, columns) -> [row tuples], in insertion order
+        self.pending_rows = 0
+        self.oldest = None
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='sample-writer', daemon=True)
+        self.thread.start()
+
+    def add(self, table, columns, row):
+        """Queue one row; never touches the database"""
+        with self.cond:
+            self.pending.setdefault((table, tuple(columns)), []).append(tuple(row))
+            self.pending_rows += 1
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            if self.pending_rows >= self.max_rows:
+                self.cond.notify()
+
+    def _take(self):
+        with self.cond:
+            batch, self.pending = self.pending, {}
+            self.pending_rows = 0
+            self.oldest = None
+            return batch
+
+    def _connect(self):
+        if self.pool is None:
+            self.pool = ThreadedConnectionPool(1, self.pool_size, connect_timeout=5, **self.db_config)
+        return self.pool.getconn()
+
+    def write_batch(self, batch, batch_id):
+        """Write {(table, columns): rows} in one transaction. Returns the rows
+        inserted, 0 if batch_id was already committed."""
+        rows = sum(len(r) for r in batch.values())
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO ingest_batches (batch_id, node_id, row_count) VALUES (%s, %s, %s) ON CONFLICT (batch_id) DO NOTHING",
+                    (batch_id, self.node_id, rows)
+                )
+                if cur.rowcount == 0:
+                    conn.rollback()
+                    self.pool.putconn(conn)
+                    return 0
+                for (table, columns), table_rows in batch.items():
+                    execute_values(
+                        cur,
+                        f"INSERT INTO {table} ({', '.join(columns)}, node_id) VALUES %s",
+                        [row + (self.node_id,) for row in table_rows],
+                        page_size=1000
+                    )
+                # Readers use the watermark to tell whether anything changed
+                cur.execute("SELECT bump_ingest_watermark(%s)", ([self.node_id],))
+            conn.commit()
+        except Exception:
+            broken = conn.closed != 0
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self.pool.putconn(conn, close=broken)
+            raise
+        self.pool.putconn(conn)
+        return rows
+
+    def _spool(self, batch_id, batch):
+        self.spool.append(batch, batch_id)
+        metrics.inc('collector_spooled_batches', 'Batches written to the spool instead of the database.')
+
+    def deliver(self, batch_id, batch):
+        """Write one batch to the database or push it to the ingest endpoint.
+        Returns the rows inserted; a batch_id that was already committed is
+        skipped. A batch that is rejected goes to the dead-letter file; a
+        retryable failure is raised."""
+        try:
+            if self.ingest is None:
+                rows = self.write_batch(batch, batch_id)
+            else:
+                rows = self.ingest.send(batch_id, batch)['rows']
+            metrics.inc('collector_flushed_rows', 'Rows written to the database.', rows)
+            return rows
+        except (psycopg2.Error, requests.RequestException, IngestError, BatchRejected) as e:
+            if is_retryable(e):
+                raise
+            rows = sum(len(r) for r in batch.values())
+            print(f"Batch {batch_id} ({rows} rows) was rejected, moving it to {self.spool.rejected_path}: {e}")
+            self.spool.reject(batch, batch_id)
+            metrics.inc('collector_rejected_batches', 'Batches the database or ingest endpoint rejected.')
+            return 0
+
+    def replay(self):
+        """Deliver the spooled batches one at a time. Returns the rows
+        inserted; a retryable failure is raised and the replay resumes from
+        the same file next time."""
+        rows = 0
+        # An interrupted replay is finished first, then whatever was spooled meanwhile
+        while len(self.spool) > 0:
+            records = self.spool.take()
+            replayed = sum(self.deliver(batch_id, batch) for batch_id, batch in records)
+            self.spool.replayed()
+            print(f"Replayed {len(records)} spooled batches ({replayed} rows) from {self.spool.path}")
+            rows += replayed
+        return rows
+
+    def flush(self):
+        with self.flush_lock:
+            batch = self._take()
+            batch_id = uuid.uuid4().hex
+            spooled = len(self.spool) > 0
+            if not batch and not spooled:
+                return 0
+            if spooled and time.monotonic() < self.retry_at:
+                # Database was down recently - don't block on it again yet
+                if batch:
+                    self._spool(batch_id, batch)
+                return 0
+
+            target = self.ingest.url if self.ingest else 'the database'
+            rows = 0
+            try:
+                with metrics.timed('db_flush'):
+                    if spooled:
+                        rows += self.replay()
+                    if batch:
+                        rows += self.deliver(batch_id, batch)
+                        batch = None
+            except (psycopg2.Error, requests.RequestException, IngestError) as e:
+                print(f"Sample flush to {target} failed, spooling to {self.spool.path}: {e}")
+                if batch:
+                    self._spool(batch_id, batch)
+                self.retry_at = time.monotonic() + SPOOL_RETRY_INTERVAL
+            return rows
+
+    def _run(self):
+        while not self.stopping:
+            with self.cond:
+                if self.pending_rows < self.max_rows:
+                    wait = self.max_age if self.oldest is None else self.oldest + self.max_age - time.monotonic()
+                    if wait > 0:
+                        self.cond.wait(wait)
+                due = self.pending_rows >= self.max_rows or (
+                    self.oldest is not None and time.monotonic() - self.oldest >= self.max_age)
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    # e.g. the spool's disk is full; keep buffering and try again later
+                    print(f"Sample writer flush failed, retrying in {SPOOL_RETRY_INTERVAL:g}s: {e!r}")
+                    metrics.inc('collector_writer_errors', 'Flushes that failed with an unexpected error.')
+                    time.sleep(SPOOL_RETRY_INTERVAL)
+
+    def close(self):
+        self.stopping = True
+        with self.cond:
+            self.cond.notify()
+        self.flush()
+        if self.pool is not None:
+            self.pool.closeall()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_NODE = 'pytest'
+
+
+def db_config():
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 5432)),
+        'database': os.getenv('DB_NAME', 'network_monitor'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD'),
+    }
+
+
+@pytest.fixture
+def db():
+    """Connection to the migrated database named by DB_*; the test is
+    skipped when there is none. Rows of TEST_NODE are deleted afterwards."""
+    try:
+        conn = psycopg2.connect(connect_timeout=3, **db_config())
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"No database: {e}")
+    yield conn
+    conn.rollback()
+    with conn.cursor() as cur:
+        for table in ('probe_cycles', 'modem_signals', 'speed_tests', 'modem_restarts', 'channel_scrapes',
+                      'probe_rollup_1m', 'probe_rollup_15m', 'probe_rollup_1h', 'modem_rollup_1m',
+                      'modem_rollup_15m', 'modem_rollup_1h', 'loss_heatmap', 'rollup_dirty',
+                      'ingest_batches', 'ingest_watermark'):
+            cur.execute(f"DELETE FROM {table} WHERE node_id = %s", (TEST_NODE,))
+    conn.commit()
+    conn.close()
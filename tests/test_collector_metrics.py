@@ -0,0 +1,38 @@
+import threading
+
+from collector_metrics import Registry
+
+
+def test_inc_from_many_threads():
+    registry = Registry()
+
+    def bump():
+        for _ in range(10000):
+            registry.inc('collector_test_events', 'Test events.')
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'collector_test_events_total 80000' in registry.render()
+
+
+def test_counter_callback_is_exported_as_counter():
+    registry = Registry()
+    registry.counter('collector_job_skipped', 'Skipped.', lambda: {'job="speed_test"': 3})
+    text = registry.render()
+    assert '# TYPE collector_job_skipped counter' in text
+    assert 'collector_job_skipped_total{job="speed_test"} 3' in text
+
+
+def test_timed_counts_failures():
+    registry = Registry()
+    try:
+        with registry.timed('probe'):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    text = registry.render()
+    assert 'collector_stage_failures_total{stage="probe"} 1' in text
+    assert 'collector_stage_seconds_count{stage="probe"} 1' in text
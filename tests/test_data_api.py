@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+import network_api
+import rollup_worker
+from conftest import TEST_NODE
+
+PROBES = f'/api/network/panels/probes?minutes=60&node={TEST_NODE}&format=rows'
+
+
+def epoch_ms(ts):
+    return int(ts.replace(tzinfo=pytz.UTC).timestamp() * 1000)
+
+
+def add_cycles(db, *timestamps, rtt=10):
+    with db.cursor() as cur:
+        for ts in timestamps:
+            cur.execute("INSERT INTO probe_cycles (timestamp, node_id, ping_rtt, ping_loss, ping_status) "
+                        "VALUES (%s, %s, %s, 0, 'OK')", (ts, TEST_NODE, rtt))
+        cur.execute("SELECT bump_ingest_watermark(%s)", ([TEST_NODE],))
+    db.commit()
+
+
+@pytest.fixture
+def cycles(db):
+    now = datetime.utcnow().replace(microsecond=0)
+    timestamps = [now - timedelta(minutes=m) for m in (3, 2, 1)]
+    add_cycles(db, *timestamps)
+    return timestamps
+
+
+@pytest.fixture
+def client(db):
+    return network_api.app.test_client()
+
+
+def test_since_returns_only_newer_rows(client, cycles):
+    full = client.get(PROBES).json
+    assert full['delta'] is False
+    assert [t['ping'] for t in full['tests']] == [10, 10, 10]
+
+    delta = client.get(f'{PROBES}&since={epoch_ms(cycles[1])}').json
+    assert delta['delta'] is True
+    assert len(delta['tests']) == 1
+
+
+def test_unchanged_data_is_not_modified(client, db, cycles):
+    etag = client.get(PROBES).headers['ETag']
+    assert client.get(PROBES, headers={'If-None-Match': etag}).status_code == 304
+
+    add_cycles(db, cycles[-1] + timedelta(seconds=30))
+    response = client.get(PROBES, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.json['tests']) == 4
+
+
+def test_default_node_is_looked_up_once_per_ttl(monkeypatch):
+    walks = []
+    monkeypatch.setattr(network_api, 'list_nodes', lambda conn: walks.append(conn) or ['a', 'b'])
+    monkeypatch.setattr(network_api, 'default_node_cache', {})
+    assert network_api.default_node(None) == network_api.default_node(None) == 'a'
+    assert len(walks) == 1
+
+    monkeypatch.setattr(network_api, 'DEFAULT_NODE_TTL', 0)
+    network_api.default_node_cache.clear()
+    network_api.default_node(None)
+    network_api.default_node(None)
+    assert len(walks) == 3
+
+
+@pytest.mark.parametrize('width', [1000, 1200, 1400])
+def test_a_day_is_drawn_from_raw_rows(width):
+    assert network_api.pick_resolution(24 * 3600, 2 * width) == 'raw'
+
+
+@pytest.mark.parametrize('days, points, resolution', [(7, 2000, '1m'), (30, 2000, '15m'), (365, 2000, '1h')])
+def test_long_ranges_read_the_rollups(days, points, resolution):
+    assert network_api.pick_resolution(days * 86400, points) == resolution
+
+
+def test_the_default_range_streams_deltas():
+    since = epoch_ms(datetime.utcnow())
+    r = network_api.DataRange(minutes=1440, node=TEST_NODE, since=since, points=2400)
+    assert (r.resolution, r.delta) == ('raw', True)
+    assert network_api.DataRange(minutes=7 * 1440, node=TEST_NODE, since=since, points=2400).delta is False
+
+
+def test_rollup_buckets_keep_their_latency_spike(client, db):
+    minute = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(hours=2)
+    add_cycles(db, minute + timedelta(seconds=5), minute + timedelta(seconds=10))
+    add_cycles(db, minute + timedelta(seconds=15), rtt=900)
+    rollup_worker.refresh_all(db)
+
+    payload = client.get(f'/api/network/panels/probes?minutes={7 * 1440}&node={TEST_NODE}&format=rows').json
+    assert payload['resolution'] == '1m'
+    assert [t['ping'] for t in payload['tests']] == [10, 900]
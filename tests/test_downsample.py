@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import downsample
+
+N = 10000
+POINTS = 400
+SPIKE, DIP, LOSS, FAILED, GAP, KEEP = 1234, 4321, 5555, 7000, 8000, 9001
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(1)
+    t = np.arange(N, dtype=np.int64) * 30000
+    t[GAP + 1:] += 2 * downsample.GAP_MS
+    y = 20 + rng.normal(0, 1, N)
+    y[SPIKE] = 900.0
+    y[DIP] = 1.0
+    y[FAILED] = np.nan
+    severity = np.zeros(N)
+    severity[LOSS] = 10.0
+    severity[FAILED] = 100.0
+    keep = np.zeros(N, dtype=bool)
+    keep[KEEP] = True
+    return t, y, severity, keep
+
+
+def test_short_series_are_returned_whole():
+    t = np.arange(10, dtype=np.int64)
+    assert downsample.select(t, np.ones(10), np.zeros(10), 10).tolist() == list(range(10))
+
+
+@pytest.mark.parametrize('mode', downsample.MODES)
+def test_outages_and_marked_rows_survive(series, mode):
+    t, y, severity, keep = series
+    picked = downsample.select(t, y, severity, POINTS, mode, keep)
+    assert set(picked) >= {0, N - 1, LOSS, FAILED, GAP, GAP + 1, KEEP}
+    assert (np.diff(picked) > 0).all()
+
+
+@pytest.mark.parametrize('mode', downsample.MODES)
+def test_output_stays_near_points(series, mode):
+    t, y, severity, keep = series
+    picked = downsample.select(t, y, severity, POINTS, mode, keep)
+    # Drawn rows plus at most one loss row per bucket, the gap edges, kept rows and the ends
+    assert POINTS // 2 <= len(picked) <= POINTS + POINTS // 2 + 5
+
+
+def test_minmax_keeps_the_extremes(series):
+    t, y, severity, keep = series
+    picked = downsample.select(t, y, severity, POINTS, 'minmax')
+    assert {SPIKE, DIP} <= set(picked)
+
+
+def test_lttb_keeps_the_spike(series):
+    t, y, severity, keep = series
+    assert SPIKE in downsample.select(t, y, severity, POINTS, 'lttb')
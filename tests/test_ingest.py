@@ -0,0 +1,89 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+import pytz
+
+import network_api
+import sample_writer
+from conftest import TEST_NODE
+
+MOUNTAIN_TZ = pytz.timezone('America/Denver')
+RESTART_COLUMNS = ('timestamp', 'detected_at', 'uptime_seconds')
+
+
+def restart_batch(when):
+    return {('modem_restarts', RESTART_COLUMNS): [(when, when, 10)]}
+
+
+def body(payload):
+    return gzip.compress(json.dumps(payload).encode())
+
+
+@pytest.mark.parametrize('local, utc', [
+    (datetime(2026, 7, 1, 12, 0), datetime(2026, 7, 1, 18, 0)),   # MDT, UTC-6
+    (datetime(2026, 1, 15, 12, 0), datetime(2026, 1, 15, 19, 0)),  # MST, UTC-7
+])
+def test_every_datetime_column_decodes_to_naive_utc(local, utc):
+    encoded = sample_writer.encode_batch('b1', 'node', restart_batch(MOUNTAIN_TZ.localize(local)))
+    batch_id, node_id, batch = sample_writer.decode_batch(encoded)
+    assert (batch_id, node_id) == ('b1', 'node')
+    assert batch == {('modem_restarts', RESTART_COLUMNS): [(utc, utc, 10)]}
+
+
+def test_null_datetimes_stay_null():
+    rows = [(MOUNTAIN_TZ.localize(datetime(2026, 7, 1, 12)), None, 10)]
+    _, _, batch = sample_writer.decode_batch(sample_writer.encode_batch('b', 'n', {('modem_restarts', RESTART_COLUMNS): rows}))
+    assert batch[('modem_restarts', RESTART_COLUMNS)][0][1] is None
+
+
+@pytest.mark.parametrize('row', [[1], [1, 2, 3]])
+def test_rows_must_match_their_columns(row):
+    payload = {'batch_id': 'b', 'node_id': 'n', 'tables': [
+        {'table': 'speed_tests', 'columns': ['download', 'upload'], 'datetime_columns': [], 'rows': [row]}]}
+    with pytest.raises(ValueError):
+        sample_writer.decode_batch(body(payload))
+
+
+def test_datetime_columns_are_required():
+    payload = {'batch_id': 'b', 'node_id': 'n', 'tables': [
+        {'table': 'speed_tests', 'columns': ['download', 'upload'], 'rows': [[1, 2]]}]}
+    with pytest.raises(KeyError):
+        sample_writer.decode_batch(body(payload))
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(network_api, 'INGEST_TOKEN', 'secret')
+    return network_api.app.test_client()
+
+
+def post(client, data):
+    return client.post('/api/network/ingest', data=data, headers={'Authorization': 'Bearer secret'})
+
+
+def test_ingest_stores_utc_and_skips_duplicates(client, db):
+    when = MOUNTAIN_TZ.localize(datetime(2026, 7, 1, 12, 0))
+    encoded = sample_writer.encode_batch('pytest-b1', TEST_NODE, restart_batch(when))
+    assert post(client, encoded).json == {'batch_id': 'pytest-b1', 'rows': 1, 'duplicate': False}
+    assert post(client, encoded).json['duplicate'] is True
+    with db.cursor() as cur:
+        cur.execute("SELECT timestamp, detected_at FROM modem_restarts WHERE node_id = %s", (TEST_NODE,))
+        assert cur.fetchall() == [(datetime(2026, 7, 1, 18, 0), datetime(2026, 7, 1, 18, 0))]
+
+
+def test_malformed_rows_are_a_client_error(client):
+    payload = {'batch_id': 'pytest-b2', 'node_id': TEST_NODE, 'tables': [
+        {'table': 'speed_tests', 'columns': ['download', 'upload'], 'datetime_columns': [], 'rows': [[1, 2, 3]]}]}
+    assert post(client, body(payload)).status_code == 400
+
+
+def test_rows_the_database_refuses_are_rejected_not_retried(client, db):
+    when = MOUNTAIN_TZ.localize(datetime(2026, 7, 1, 12, 0))
+    batch = {('probe_cycles', ('timestamp', 'ping_samples')): [(when, 70000)]}  # smallint overflow
+    response = post(client, sample_writer.encode_batch('pytest-b3', TEST_NODE, batch))
+    assert response.status_code == 422
+    with db.cursor() as cur:
+        cur.execute("SELECT 1 FROM ingest_batches WHERE batch_id = 'pytest-b3'")
+        assert cur.fetchone() is None
@@ -0,0 +1,44 @@
+import math
+import random
+
+import pytest
+
+import latency_sketch
+
+
+def merge(*sketches):
+    counts = {}
+    for keys, key_counts in sketches:
+        for k, count in zip(keys, key_counts):
+            counts[k] = counts.get(k, 0) + count
+    keys = sorted(counts)
+    return keys, [counts[k] for k in keys]
+
+
+@pytest.fixture
+def rtts():
+    rng = random.Random(1)
+    return [rng.lognormvariate(3, 0.8) for _ in range(5000)]
+
+
+@pytest.mark.parametrize('q', [0, 0.5, 0.9, 0.99, 0.999, 1])
+def test_quantiles_are_within_alpha(rtts, q):
+    keys, counts = latency_sketch.sketch(rtts)
+    exact = sorted(rtts)[math.floor(q * (len(rtts) - 1))]
+    assert abs(latency_sketch.quantile(keys, counts, q) - exact) <= latency_sketch.SKETCH_ALPHA * exact
+
+
+def test_merging_adds_counts(rtts):
+    half = len(rtts) // 2
+    assert merge(latency_sketch.sketch(rtts[:half]), latency_sketch.sketch(rtts[half:])) == latency_sketch.sketch(rtts)
+
+
+def test_lost_replies_are_not_counted():
+    assert latency_sketch.sketch([None, 0, None]) == (None, None)
+    assert latency_sketch.sketch([None, 12.0]) == latency_sketch.sketch([12.0])
+
+
+def test_cdf_reaches_one(rtts):
+    points = latency_sketch.cdf(*latency_sketch.sketch(rtts))
+    assert points[-1][1] == 1
+    assert all(a[0] < b[0] and a[1] < b[1] for a, b in zip(points, points[1:]))
@@ -0,0 +1,40 @@
+import os
+
+import modem_scraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+
+def read_fixture():
+    with open(os.path.join(FIXTURES, 'xb8_network_setup.html')) as f:
+        return f.read()
+
+
+def parse_fixture():
+    return modem_scraper.parse_network_setup(read_fixture())
+
+
+def test_signal_levels():
+    data = parse_fixture()
+    assert data['downstream_avg_snr'] == 38.6
+    assert data['downstream_min_snr'] == 36.6
+    # 12 of the 32 channels are below 0 dBmV; their sign is kept
+    assert data['downstream_avg_power'] == 1.1
+    assert data['downstream_max_power'] == 5.7
+    assert data['upstream_avg_power'] == 40.3
+
+
+def test_negative_power_keeps_its_sign():
+    rows, _ = modem_scraper.tokenize(read_fixture())
+    assert modem_scraper.numbers(['-3.0 dBmV', '5.1 dBmV']) == [-3.0, 5.1]
+    assert min(modem_scraper.numbers(rows['Downstream']['Power Level'])) < 0
+
+
+def test_codewords_and_uptime():
+    data = parse_fixture()
+    assert data['correctable_codewords'] == 1230012362
+    assert data['uncorrectable_codewords'] == 59841999
+    assert (data['worst_channel_id'], data['worst_channel_correctable'], data['worst_channel_uncorrectable']) == (7, 89009361, 644481)
+    assert len(data['channel_data']) == 32
+    assert data['channel_data'][0] == (1, 55958000, 2781716)
+    assert data['uptime_seconds'] == 1049141
@@ -0,0 +1,24 @@
+import pytest
+
+import network_monitor
+
+
+@pytest.mark.parametrize('interval', [0.75, 1, 1.15, 2, 3, 5, 6, 10, 60])
+def test_lossy_cycle_fits_interval(interval):
+    count, spacing, timeout = network_monitor.probe_timing(interval)
+    assert (count - 1) * spacing + timeout <= interval - network_monitor.CYCLE_MARGIN + 1e-9
+    assert spacing >= network_monitor.MIN_PROBE_SPACING
+    assert timeout >= network_monitor.MIN_PROBE_TIMEOUT
+
+
+def test_default_interval_keeps_five_requests_and_full_timeout():
+    assert network_monitor.probe_timing(5) == (5, 0.6875, 2.0)
+
+
+def test_long_interval_uses_ping_spacing():
+    assert network_monitor.probe_timing(60) == (5, 1.0, 2.0)
+
+
+def test_short_interval_sends_fewer_requests():
+    count, _, _ = network_monitor.probe_timing(1)
+    assert 1 <= count < network_monitor.PROBE_COUNT
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import psycopg2
+
+import rollup_worker
+from conftest import TEST_NODE, db_config
+
+
+def insert_cycle(conn, when, rtt):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO probe_cycles (timestamp, node_id, ping_rtt, ping_loss, ping_status) "
+                    "VALUES (%s, %s, %s, 0, 'OK')", (when, TEST_NODE, rtt))
+
+
+def hourly_samples(conn, hour):
+    with conn.cursor() as cur:
+        cur.execute("SELECT samples FROM probe_rollup_1h WHERE node_id = %s AND target = 'ping' AND bucket = %s",
+                    (TEST_NODE, hour))
+        row = cur.fetchone()
+    conn.commit()
+    return row[0] if row else 0
+
+
+def test_rows_committed_during_a_pass_are_rolled_up(db):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    insert_cycle(db, hour + timedelta(minutes=1), 10.0)
+    db.commit()
+
+    # A second writer adds a row to the same, already dirty hour but has not committed yet
+    late = psycopg2.connect(connect_timeout=3, **db_config())
+    try:
+        insert_cycle(late, hour + timedelta(minutes=2), 20.0)
+        rollup_worker.refresh_all(db)
+        late.commit()
+    finally:
+        late.close()
+
+    rollup_worker.refresh_all(db)
+    assert hourly_samples(db, hour) == 2
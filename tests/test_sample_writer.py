@@ -0,0 +1,154 @@
+import os
+import types
+
+import psycopg2
+import pytest
+import requests
+
+import sample_writer
+from sample_writer import RECORD_HEADER, RECORD_MAGIC, SampleWriter, Spool
+
+BATCH = {('speed_tests', ('timestamp', 'download', 'upload')): [(1, 2.0, 3.0)]}
+
+
+def other(n):
+    return {('speed_tests', ('timestamp', 'download', 'upload')): [(n, 2.0, 3.0)]}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(str(tmp_path / 'collector.spool'))
+
+
+class FakeIngest:
+    """IngestClient stand-in: raises `errors` in turn, then accepts"""
+    url = 'http://central/api/network/ingest'
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send(self, batch_id, batch):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(batch_id)
+        return {'rows': sum(len(r) for r in batch.values())}
+
+
+def test_records_round_trip(spool):
+    spool.append(BATCH, 'a')
+    spool.append(other(2), 'b')
+    assert spool.records() == [('a', BATCH), ('b', other(2))]
+
+
+def test_torn_record_is_skipped_and_later_records_survive(spool):
+    spool.append(BATCH, 'a')
+    # A crash mid-append leaves a header promising more bytes than were written
+    with open(spool.path, 'ab') as f:
+        f.write(RECORD_HEADER.pack(RECORD_MAGIC, 500, 0) + b'partial')
+    spool.append(other(2), 'b')
+    assert [batch_id for batch_id, _ in spool.records()] == ['a', 'b']
+
+
+def test_corrupt_payload_is_skipped(spool):
+    spool.append(BATCH, 'a')
+    spool.append(other(2), 'b')
+    with open(spool.path, 'r+b') as f:
+        f.seek(RECORD_HEADER.size + 3)
+        f.write(b'\xff')
+    assert [batch_id for batch_id, _ in spool.records()] == ['b']
+
+
+def test_take_moves_spool_aside(spool):
+    spool.append(BATCH, 'a')
+    assert spool.take() == [('a', BATCH)]
+    spool.append(other(2), 'b')  # Spooled during the replay
+    assert spool.records() == [('b', other(2))]
+    # An interrupted replay is resumed from the same file
+    assert spool.take() == [('a', BATCH)]
+    spool.replayed()
+    assert spool.take() == [('b', other(2))]
+
+
+def test_rejected_batches_go_to_their_own_file(spool):
+    spool.reject(BATCH, 'bad')
+    assert len(spool) == 0
+    assert spool.records(spool.rejected_path) == [('bad', BATCH)]
+
+
+def writer(spool, ingest):
+    return SampleWriter({}, spool=spool, ingest=ingest)
+
+
+def test_unreachable_endpoint_spools_and_replays(spool):
+    ingest = FakeIngest(requests.ConnectionError('down'))
+    w = writer(spool, ingest)
+    w.add('speed_tests', ('timestamp', 'download', 'upload'), (1, 2.0, 3.0))
+    assert w.flush() == 0
+    assert len(spool.records()) == 1
+    w.retry_at = 0
+    w.add('speed_tests', ('timestamp', 'download', 'upload'), (2, 2.0, 3.0))
+    assert w.flush() == 2
+    assert len(spool) == 0
+    assert len(ingest.sent) == 2
+
+
+def test_rejected_batch_is_dead_lettered_not_retried(spool):
+    w = writer(spool, FakeIngest(sample_writer.BatchRejected('HTTP 422')))
+    w.add('speed_tests', ('timestamp', 'download', 'upload'), (1, 2.0, 3.0))
+    assert w.flush() == 0
+    assert len(spool) == 0
+    assert len(spool.records(spool.rejected_path)) == 1
+
+
+def test_bad_spooled_batch_does_not_block_the_rest(spool):
+    spool.append(BATCH, 'bad')
+    spool.append(other(2), 'good')
+    ingest = FakeIngest(psycopg2.DataError('smallint out of range'))
+    w = writer(spool, ingest)
+    assert w.flush() == 1
+    assert ingest.sent == ['good']
+    assert [batch_id for batch_id, _ in spool.records(spool.rejected_path)] == ['bad']
+    assert not os.path.exists(spool.replay_path)
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (psycopg2.OperationalError(), True),
+    (psycopg2.InterfaceError(), True),
+    (requests.Timeout(), True),
+    (sample_writer.IngestError('HTTP 503'), True),
+    (psycopg2.DataError(), False),
+    (psycopg2.IntegrityError(), False),
+    (sample_writer.BatchRejected('HTTP 400'), False),
+])
+def test_is_retryable(error, retryable):
+    assert sample_writer.is_retryable(error) is retryable
+
+
+def test_writer_thread_survives_unexpected_errors(spool, monkeypatch):
+    monkeypatch.setattr(sample_writer, 'SPOOL_RETRY_INTERVAL', 0)
+    w = writer(spool, FakeIngest())
+    w.max_rows = 1
+    calls = []
+
+    def flush():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError('No space left on device')
+        w.stopping = True
+        return 0
+
+    w.flush = flush
+    w.pending_rows = 1
+    w._run()
+    assert len(calls) == 2
+
+
+def test_ingest_client_maps_status_codes():
+    client = sample_writer.IngestClient('http://central')
+    for status, error in ((422, sample_writer.BatchRejected), (401, sample_writer.IngestError),
+                          (503, sample_writer.IngestError)):
+        client.session = types.SimpleNamespace(
+            post=lambda *a, **k: types.SimpleNamespace(status_code=status, text='', json=dict))
+        with pytest.raises(error):
+            client.send('id', BATCH)
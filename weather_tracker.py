@@ -81,7 +81,7 @@ def backfill_historical_data():
     cur = conn.cursor()
     
     # Get earliest network test timestamp
-    cur.execute("SELECT MIN(timestamp) FROM ping_tests")
+    cur.execute("SELECT MIN(timestamp) FROM probe_cycles")
     earliest_test = cur.fetchone()[0]
     
     # Get latest weather data timestamp